@@ -0,0 +1,98 @@
+"""Compare one-shot questions with questions sent to a warm agent server.
+
+One-shot: build the StockBroker agent and its workflow for every question, like each run of
+`stockbroker.py` does (the interpreter start and imports, see bench_startup.py, come on top).
+Server: build it once in an AgentServer and send the questions from concurrent clients over
+a Unix socket. The LLM is a fake one answering after a fixed latency, so the figures show the
+overhead and the concurrency of the agent, not the speed of a model.
+
+    python benchmarks/bench_agent_server.py
+    python benchmarks/bench_agent_server.py -q 200 -c 16 --latency 0.5
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core.embeddings import MockEmbedding  # noqa: E402
+
+from alfred.server import AgentServer  # noqa: E402
+from alfred.utils.agent_client import ask_server  # noqa: E402
+from alfred.utils.common import register_embedding, register_llm  # noqa: E402
+from tests.fake_llm import FakeLLM  # noqa: E402
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "alfred")
+
+
+def report(label, elapsed, latencies):
+    latencies = sorted(latencies)
+    print(
+        f"{label:<10} {len(latencies) / elapsed:8.1f} questions/s   "
+        f"median {statistics.median(latencies) * 1000:7.1f} ms   p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms"
+    )
+
+
+async def one_shot(questions):
+    from alfred.stockbroker import StockBroker
+
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        workflow = StockBroker("fake").prepare_chat()
+        await workflow.run(user_msg=question)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def served(questions, concurrency, address):
+    from alfred.stockbroker import StockBroker
+
+    server = await AgentServer({"stockbroker": StockBroker("fake").prepare_chat()}, concurrency=concurrency).start(address)
+    clients = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def ask(i, question):
+        async with clients:
+            start = time.perf_counter()
+            await ask_server(question, "stockbroker", session=f"client-{i % concurrency}", address=address)
+            latencies.append(time.perf_counter() - start)
+
+    async with server:
+        await asyncio.gather(*(ask(i, q) for i, q in enumerate(questions)))
+    return latencies
+
+
+@click.command()
+@click.option("-q", "--questions", help="Questions asked", type=int, default=50)
+@click.option("-c", "--concurrency", help="Concurrent clients of the server", type=int, default=8)
+@click.option("--latency", help="Seconds the fake LLM takes to answer", type=float, default=0.2)
+@click.option("--one-shot-questions", help="Questions asked one-shot, they are slow", type=int, default=10)
+def bench(questions: int, concurrency: int, latency: float, one_shot_questions: int):
+    logging.basicConfig(level=logging.WARNING)
+    os.chdir(AGENT_DIR)
+    os.environ["embed_provider"] = "fake"
+    register_embedding("fake", lambda: (MockEmbedding(embed_dim=64), 64))
+    register_llm("fake", lambda name: FakeLLM(latency=latency))
+
+    asked = [f"What is the price of stock number {i}?" for i in range(questions)]
+
+    start = time.perf_counter()
+    latencies = asyncio.run(one_shot(asked[:one_shot_questions]))
+    report("one-shot", time.perf_counter() - start, latencies)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        latencies = asyncio.run(served(asked, concurrency, os.path.join(directory, "agents.sock")))
+        report("server", time.perf_counter() - start, latencies)
+
+
+if __name__ == "__main__":
+    bench()
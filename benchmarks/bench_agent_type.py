@@ -0,0 +1,140 @@
+"""Compare the react and function agent types on a fixed question set: LLM steps, tokens and latency.
+
+Each question is answered by the agent workflow of BaseAgent (ParallelAgentWorkflow) with
+    react       ReActAgent, the LLM writes Thought/Action/Observation text parsed by the agent
+    function    FunctionAgent, native tool calling, the tool calls of a step asked for at once
+Tokens are counted with the llama_index tokenizer on the messages sent to the LLM at each step
+(for function, plus the JSON schemas of the tools sent along) and on its replies.
+
+By default the LLMs are fake ones answering after a fixed latency with scripted tool calls, so
+the numbers only show the cost of the protocol; a real ReAct model also needs repair steps when
+its text does not parse. With --model the questions go to the stock broker agent and that model
+(needs the provider and the Alpha Vantage key).
+
+    python benchmarks/bench_agent_type.py
+    python benchmarks/bench_agent_type.py --llm-latency 1.0 -n 3
+    python benchmarks/bench_agent_type.py -m llama3.1
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core.agent.workflow import FunctionAgent, ReActAgent  # noqa: E402
+from llama_index.core.agent.workflow.workflow_events import AgentInput, AgentOutput  # noqa: E402
+from llama_index.core.tools import FunctionTool  # noqa: E402
+from llama_index.core.utils import get_tokenizer  # noqa: E402
+
+from alfred.utils.agent_workflow import ParallelAgentWorkflow  # noqa: E402
+from tests.fake_llm import FakeLLM, FakeToolLLM  # noqa: E402
+
+# Question and the tool calls answering it, scripted for the fake LLMs
+QUESTIONS = [
+    ("What is the current stock price of NVIDIA?", [("stock_quote", {"symbol": "NVDA"})]),
+    ("How much is 250 USD in EUR?", [("exchange_rate", {"base": "USD", "target": "EUR"})]),
+    ("What is the price of AMD in EUR?",
+     [("stock_quote", {"symbol": "AMD"}), ("exchange_rate", {"base": "USD", "target": "EUR"})]),
+    ("Compare NVIDIA, AMD and Intel, in CHF.",
+     [("stock_quote", {"symbol": s}) for s in ("NVDA", "AMD", "INTC")] + [("exchange_rate", {"base": "USD", "target": "CHF"})]),
+    ("Hello, what can you do?", []),
+]
+
+SYSTEM_PROMPT = "You are a stock broker. Use the tools to get quotes and exchange rates, then answer."
+
+
+def make_tools(latency):
+    async def stock_quote(symbol: str) -> str:
+        """Current price of a stock, in USD."""
+        await asyncio.sleep(latency)
+        return f"{symbol} 120 USD"
+
+    async def exchange_rate(base: str, target: str) -> str:
+        """Exchange rate between two currencies."""
+        await asyncio.sleep(latency)
+        return f"1 {base} = 0.92 {target}"
+
+    return [FunctionTool.from_defaults(async_fn=stock_quote), FunctionTool.from_defaults(async_fn=exchange_rate)]
+
+
+def fake_workflow(agent_type, tool_calls, llm_latency, tool_latency):
+    tools = make_tools(tool_latency)
+    if agent_type == "react":
+        agent_class, llm = ReActAgent, FakeLLM(tool_calls=tool_calls, latency=llm_latency)
+    else:
+        agent_class, llm = FunctionAgent, FakeToolLLM(tool_calls=tool_calls, latency=llm_latency)
+    agent = agent_class(name="broker", description="Stock broker", system_prompt=SYSTEM_PROMPT, tools=tools, llm=llm)
+    return ParallelAgentWorkflow(agents=[agent], root_agent="broker"), tools
+
+
+def broker_workflow(agent_type, model):
+    from alfred.stockbroker import StockBroker
+
+    broker = StockBroker(model, agent_type)
+    if broker.agent_type != agent_type:
+        raise click.ClickException(f"{model} does not support the {agent_type} agent type")
+    workflow = broker.prepare_chat()
+    return workflow, workflow.agents["broker"].tools
+
+
+async def ask(workflow, tools, agent_type, question):
+    """Answers question, returns the LLM steps, prompt and completion tokens and the seconds taken."""
+    tokenizer = get_tokenizer()
+    # The tool schemas are sent with every function calling step, ReAct has them in its system prompt
+    schemas = sum(len(tokenizer(json.dumps(tool.metadata.to_openai_tool()))) for tool in tools) if agent_type == "function" else 0
+    steps = prompt_tokens = completion_tokens = 0
+    start = time.perf_counter()
+    handler = workflow.run(user_msg=question)
+    async for event in handler.stream_events():
+        if isinstance(event, AgentInput):
+            steps += 1
+            prompt_tokens += schemas + sum(len(tokenizer(str(message.content or ""))) for message in event.input)
+        elif isinstance(event, AgentOutput):
+            calls = json.dumps([[call.tool_name, call.tool_kwargs] for call in event.tool_calls]) if agent_type == "function" else ""
+            completion_tokens += len(tokenizer((event.response.content or "") + calls))
+    await handler
+    return steps, prompt_tokens, completion_tokens, time.perf_counter() - start
+
+
+async def measure(agent_type, model, llm_latency, tool_latency, runs):
+    rows = []
+    for question, tool_calls in QUESTIONS:
+        samples = []
+        for _ in range(runs):
+            if model:
+                workflow, tools = broker_workflow(agent_type, model)
+            else:
+                workflow, tools = fake_workflow(agent_type, tool_calls, llm_latency, tool_latency)
+            samples.append(await ask(workflow, tools, agent_type, question))
+        steps, prompt_tokens, completion_tokens, _ = samples[-1]
+        rows.append((question, steps, prompt_tokens, completion_tokens, statistics.median(s[3] for s in samples)))
+    return rows
+
+
+@click.command()
+@click.option("-m", "--model", help="Ask the stock broker agent with this model instead of the fake LLMs", type=str)
+@click.option("--llm-latency", help="Seconds per step of the fake LLMs", type=float, default=0.5)
+@click.option("--tool-latency", help="Seconds per tool call of the fake tools", type=float, default=0.3)
+@click.option("-n", "--runs", help="Runs per question and agent type", type=int, default=3)
+def bench(model: str, llm_latency: float, tool_latency: float, runs: int):
+    totals = {}
+    for agent_type in ("react", "function"):
+        rows = asyncio.run(measure(agent_type, model, llm_latency, tool_latency, runs))
+        print(f"{agent_type}")
+        for question, steps, prompt_tokens, completion_tokens, elapsed in rows:
+            print(f"  {question[:40]:<40} {steps:3d} steps {prompt_tokens:6d} prompt {completion_tokens:5d} completion "
+                  f"tokens   median {elapsed * 1000:8.1f} ms")
+        totals[agent_type] = [sum(row[i] for row in rows) for i in range(1, 5)]
+    for agent_type, (steps, prompt_tokens, completion_tokens, elapsed) in totals.items():
+        print(f"{agent_type:<10} total {steps:3d} steps {prompt_tokens:6d} prompt {completion_tokens:5d} completion "
+              f"tokens {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    bench()
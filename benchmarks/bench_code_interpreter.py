@@ -0,0 +1,65 @@
+"""Compare cold and warm snippet latency of the code interpreter backends.
+
+Cold: start a sandbox, run one snippet and stop it, like a one-off `docker run`.
+Warm: run a snippet in a sandbox that is already started.
+
+    python benchmarks/bench_code_interpreter.py                    # every backend available here
+    python benchmarks/bench_code_interpreter.py -b local -n 50
+"""
+
+import statistics
+import time
+
+import click
+
+from alfred.tools.sandbox import BACKENDS
+
+SNIPPET = "total = sum(i * i for i in range(10000))\ntotal"
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.95) - 1] * 1000
+
+
+def report(label, samples):
+    median, p95 = percentiles(samples)
+    print(f"{label:<14} median {median:8.1f} ms   p95 {p95:8.1f} ms")
+
+
+@click.command()
+@click.option("-b", "--backend", "backends", help="Backend to measure, repeatable", multiple=True,
+              type=click.Choice(list(BACKENDS)), default=list(BACKENDS))
+@click.option("-n", "--runs", help="Snippets per measure", type=int, default=20)
+def bench(backends, runs: int):
+    for backend in backends:
+        factory = BACKENDS[backend]
+        try:
+            factory().close()
+        except Exception as e:
+            print(f"{backend:<14} skipped, {e}")
+            continue
+
+        cold = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            session = factory()
+            session.execute(SNIPPET)
+            session.close()
+            cold.append(time.perf_counter() - start)
+
+        warm = []
+        session = factory()
+        session.execute("pass")
+        for _ in range(runs):
+            start = time.perf_counter()
+            session.execute(SNIPPET)
+            warm.append(time.perf_counter() - start)
+        session.close()
+
+        report(f"{backend} cold", cold)
+        report(f"{backend} warm", warm)
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,71 @@
+"""Compare per-item and batched embedding latency over the shipped Alpha Vantage function list.
+
+    python benchmarks/bench_embedding_batch.py                 # against the Ollama embedding model
+    python benchmarks/bench_embedding_batch.py --fake 0.05     # against a fake model with 50ms per request
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import click
+from llama_index.core.embeddings import MockEmbedding
+
+from alfred.utils.batch_embedding import embed_texts
+
+FCTS_PATH = os.path.join(os.path.dirname(__file__), "..", "src", "alfred", "tools", "functions.json")
+
+
+class SlowMockEmbedding(MockEmbedding):
+    """Mock embedding paying a fixed latency per request, whatever the batch size."""
+
+    latency: float = 0.05
+
+    def _get_text_embedding(self, text):
+        time.sleep(self.latency)
+        return super()._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts):
+        time.sleep(self.latency)
+        return [super(SlowMockEmbedding, self)._get_text_embedding(t) for t in texts]
+
+    async def _aget_text_embeddings(self, texts):
+        await asyncio.sleep(self.latency)
+        return [super(SlowMockEmbedding, self)._get_text_embedding(t) for t in texts]
+
+
+@click.command()
+@click.option("-f", "--fcts-path", help="Path of the functions json file", type=str, default=FCTS_PATH)
+@click.option("--fake", help="Use a fake model with this latency (seconds) per request", type=float, default=None)
+@click.option("-b", "--batch-size", help="Texts per embedding request", type=int, default=16)
+@click.option("-c", "--concurrency", help="Embedding requests in flight", type=int, default=4)
+def bench(fcts_path: str, fake: float, batch_size: int, concurrency: int):
+    with open(fcts_path, "r") as file:
+        documents = [fct["description"] for fct in json.load(file)]
+
+    if fake is not None:
+        embedding_model = SlowMockEmbedding(embed_dim=1024, latency=fake)
+    else:
+        from alfred.utils.common import get_embedding, load_environment_variables
+
+        load_environment_variables()
+        embedding_model, _ = get_embedding("ollama")
+
+    start = time.perf_counter()
+    for document in documents:
+        embedding_model.get_text_embedding(document)
+    per_item = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embed_texts(embedding_model, documents, batch_size=batch_size, concurrency=concurrency)
+    batched = time.perf_counter() - start
+
+    print(f"{len(documents)} descriptions")
+    print(f"per-item: {per_item:8.3f}s ({per_item / len(documents) * 1000:.1f} ms/item)")
+    print(f"batched:  {batched:8.3f}s ({batched / len(documents) * 1000:.1f} ms/item), batch={batch_size}, concurrency={concurrency}")
+    print(f"speedup:  {per_item / batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    bench()
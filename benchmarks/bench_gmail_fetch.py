@@ -0,0 +1,46 @@
+"""Compare per-message and batched Gmail fetches against the local fake Gmail server.
+
+    python benchmarks/bench_gmail_fetch.py                          # 500 messages, 20ms per round trip
+    python benchmarks/bench_gmail_fetch.py -n 5000 --latency 0.05
+"""
+
+import os
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from alfred.tools.gmail_reader import GmailReader  # noqa: E402
+from tests.fake_gmail import FakeGmail, make_message  # noqa: E402
+
+
+@click.command()
+@click.option("-n", "--messages", "count", help="Messages in the fake mailbox", type=int, default=500)
+@click.option("--latency", help="Seconds per HTTP round trip", type=float, default=0.02)
+@click.option("-b", "--batch-size", help="Messages per batch request", type=int, default=50)
+def bench(count: int, latency: float, batch_size: int):
+    messages = [make_message(f"m{i:06d}", text=f"Message number {i}") for i in range(count)]
+
+    with FakeGmail(messages, latency=latency) as gmail:
+        reader = GmailReader(service=gmail.service(), query="", batch_size=batch_size)
+        ids = [message["id"] for message in messages]
+
+        start = time.perf_counter()
+        sequential = [reader.get_message_data({"id": message_id}) for message_id in ids]
+        per_message = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = [reader.parse_message_data(message) for message in reader.fetch_messages(ids)]
+        in_batches = time.perf_counter() - start
+
+    assert [m["id"] for m in sequential] == [m["id"] for m in batched]
+    print(f"{count} messages, {latency * 1000:.0f} ms per round trip")
+    print(f"per-message: {per_message:8.3f}s ({count / per_message:.0f} msg/s)")
+    print(f"batched:     {in_batches:8.3f}s ({count / in_batches:.0f} msg/s), batch={batch_size}")
+    print(f"speedup:     {per_message / in_batches:8.1f}x")
+
+
+if __name__ == "__main__":
+    bench()
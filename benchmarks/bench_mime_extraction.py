@@ -0,0 +1,103 @@
+"""Compare the Gmail body extractors over a corpus of messages.
+
+    python benchmarks/bench_mime_extraction.py                      # synthetic corpus of 2000 messages
+    python benchmarks/bench_mime_extraction.py --corpus ~/mail      # every .eml file of a directory
+    python benchmarks/bench_mime_extraction.py --processes 8
+"""
+
+import base64
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.message import EmailMessage
+
+import click
+
+from alfred.tools.gmail_reader import GmailReader
+from alfred.tools.mime_text import extract_message_texts
+
+PARAGRAPH = "Quarterly numbers are in, revenue grew while costs stayed flat across regions. "
+
+
+def synthetic_message(index, rng):
+    mime = EmailMessage()
+    mime["Subject"] = f"Message {index}"
+    mime["From"] = "sender@example.com"
+    text = PARAGRAPH * rng.randint(2, 40)
+    html = "<html><head><style>td {padding: 2px}</style></head><body>" + "".join(
+        f"<table><tr><td><p>{PARAGRAPH}</p></td><td><a href='https://example.com/{i}'>link</a></td></tr></table>"
+        for i in range(rng.randint(20, 200))
+    ) + "</body></html>"
+    kind = rng.random()
+    if kind < 0.3:
+        mime.set_content(text)
+    elif kind < 0.7:
+        mime.set_content(text)
+        mime.add_alternative(html, subtype="html")
+    else:
+        # Newsletter style, HTML only
+        mime.add_alternative(html, subtype="html")
+    if rng.random() < 0.3:
+        mime.add_attachment(rng.randbytes(rng.randint(50_000, 500_000)), maintype="application",
+                            subtype="pdf", filename="report.pdf")
+    return mime.as_bytes()
+
+
+def load_corpus(corpus, count, seed):
+    if corpus:
+        paths = sorted(os.path.join(corpus, name) for name in os.listdir(corpus) if name.endswith(".eml"))
+        raws = []
+        for path in paths[:count]:
+            with open(path, "rb") as file:
+                raws.append(file.read())
+    else:
+        rng = random.Random(seed)
+        raws = [synthetic_message(i, rng) for i in range(count)]
+    return [{"id": str(i), "raw": base64.urlsafe_b64encode(raw).decode("ascii")} for i, raw in enumerate(raws)]
+
+
+def timed(label, extract, messages, total_mb):
+    start = time.perf_counter()
+    extract(messages)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed:8.3f}s {len(messages) / elapsed:9.0f} msg/s {total_mb / elapsed:8.1f} MB/s")
+
+
+@click.command()
+@click.option("--corpus", help="Directory of .eml files, a synthetic corpus is generated otherwise", type=str, default=None)
+@click.option("-n", "--count", help="Messages in the corpus", type=int, default=2000)
+@click.option("-p", "--processes", help="Processes of the parallel run", type=int, default=os.cpu_count())
+@click.option("--seed", help="Seed of the synthetic corpus", type=int, default=0)
+def bench(corpus: str, count: int, processes: int, seed: int):
+    messages = load_corpus(corpus, count, seed)
+    total_mb = sum(len(m["raw"]) for m in messages) * 3 / 4 / 1e6
+    print(f"{len(messages)} messages, {total_mb:.1f} MB")
+
+    reader = GmailReader()
+
+    def each(extract):
+        def run(batch):
+            for message in batch:
+                try:
+                    extract(message)
+                except Exception:
+                    pass
+        return run
+
+    try:
+        import bs4  # noqa: F401
+
+        timed("beautifulsoup", each(reader.extract_message_body), messages, total_mb)
+    except ImportError:
+        print("beautifulsoup          skipped, bs4 is not installed")
+    timed("iterative", each(reader.extract_message_body_iterative), messages, total_mb)
+    timed("single pass", extract_message_texts, messages, total_mb)
+    with ProcessPoolExecutor(processes) as pool:
+        # Start the workers before timing
+        extract_message_texts(messages[:processes], pool)
+        timed(f"single pass, {processes} procs", lambda batch: extract_message_texts(batch, pool), messages, total_mb)
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,77 @@
+"""Measure the import time of the agent modules, and the startup of a one-shot question.
+
+Each module is imported in a fresh interpreter with `python -X importtime`; the report gives
+the cumulative import time of the module and the slowest packages it pulls in.
+--startup also times `StockBroker(model).prepare_chat()` in a fresh interpreter, which
+needs the provider of the model to be installed (no request is sent to it).
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py -M alfred.stockbroker -n 10 --startup -m llama3.1
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import click
+
+MODULES = ["alfred.utils.common", "alfred.utils.base_agent", "alfred.stockbroker", "alfred.travelassistant"]
+
+
+def import_times(module):
+    """Cumulative import time of a module and of the third-party packages it loads, in seconds."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total, packages = 0.0, defaultdict(float)
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name, seconds = fields[2].strip(), int(fields[1]) / 1e6
+        if name == module:
+            total = seconds
+            continue
+        package = name.split(".")[0]
+        if package != module.split(".")[0] and not package.startswith("_") and package not in sys.stdlib_module_names:
+            # The first import of a package carries its whole cost, nested entries are smaller
+            packages[package] = max(packages[package], seconds)
+    return total, packages
+
+
+@click.command()
+@click.option("-M", "--module", "modules", help="Module to import, repeatable", multiple=True, default=MODULES)
+@click.option("-n", "--runs", help="Imports per module", type=int, default=5)
+@click.option("--startup", help="Also time a StockBroker startup", is_flag=True)
+@click.option("-m", "--model", help="Model of the StockBroker startup", type=str, default="llama3.1")
+@click.option("-t", "--top", help="Slowest packages shown per module", type=int, default=5)
+def bench(modules, runs: int, startup: bool, model: str, top: int):
+    for module in modules:
+        try:
+            samples = [import_times(module) for _ in range(runs)]
+        except RuntimeError as e:
+            print(f"{module:<28} failed, {e}")
+            continue
+        median = statistics.median(total for total, _ in samples)
+        packages = samples[-1][1]
+        slowest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+        print(f"{module:<28} {median * 1000:8.1f} ms   " + ", ".join(f"{name} {t * 1000:.0f} ms" for name, t in slowest))
+
+    if startup:
+        code = f"from alfred.stockbroker import StockBroker; StockBroker({model!r}).prepare_chat()"
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{'startup':<28} failed, {result.stderr.strip().splitlines()[-1]}")
+                return
+            samples.append(time.perf_counter() - start)
+        print(f"{'startup ' + model:<28} {statistics.median(samples) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,83 @@
+"""Compare the steps and wall-clock time of a question needing several independent tools.
+
+The question needs a stock quote per symbol and an exchange rate:
+    react            ReActAgent, one tool call per LLM step, tools run one after the other
+    function         FunctionAgent asking for every tool in one step, AgentWorkflow running 4 at once
+    function-par     FunctionAgent with ParallelAgentWorkflow running `agent_tool_concurrency` at once
+The LLMs are fake ones answering after a fixed latency, the tools sleep like HTTP calls
+(the quotes are async tools, the exchange rate a sync one run in the executor).
+
+    python benchmarks/bench_tool_dispatch.py
+    python benchmarks/bench_tool_dispatch.py -s NVDA -s AMD --llm-latency 1.0 --tool-latency 0.5
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core.agent.workflow import AgentWorkflow, FunctionAgent, ReActAgent  # noqa: E402
+from llama_index.core.tools import FunctionTool  # noqa: E402
+
+from alfred.utils.agent_workflow import ParallelAgentWorkflow  # noqa: E402
+from tests.fake_llm import FakeLLM, FakeToolLLM  # noqa: E402
+
+
+def make_tools(latency):
+    async def stock_quote(symbol: str) -> str:
+        """Current price of a stock."""
+        await asyncio.sleep(latency)
+        return f"{symbol} 120 USD"
+
+    def exchange_rate(base: str, target: str) -> str:
+        """Exchange rate between two currencies."""
+        time.sleep(latency)
+        return f"1 {base} = 0.92 {target}"
+
+    return [FunctionTool.from_defaults(async_fn=stock_quote), FunctionTool.from_defaults(fn=exchange_rate)]
+
+
+def make_workflow(mode, tool_calls, llm_latency, tool_latency):
+    tools = make_tools(tool_latency)
+    if mode == "react":
+        llm = FakeLLM(tool_calls=tool_calls, latency=llm_latency)
+        agent = ReActAgent(name="broker", description="Stock broker", system_prompt="Answer.", tools=tools, llm=llm)
+        return AgentWorkflow(agents=[agent], root_agent="broker"), llm
+    llm = FakeToolLLM(tool_calls=tool_calls, latency=llm_latency)
+    agent = FunctionAgent(name="broker", description="Stock broker", system_prompt="Answer.", tools=tools, llm=llm)
+    workflow_class = ParallelAgentWorkflow if mode == "function-par" else AgentWorkflow
+    return workflow_class(agents=[agent], root_agent="broker"), llm
+
+
+async def measure(mode, tool_calls, llm_latency, tool_latency, runs):
+    samples, steps = [], 0
+    for _ in range(runs):
+        workflow, llm = make_workflow(mode, tool_calls, llm_latency, tool_latency)
+        start = time.perf_counter()
+        await workflow.run(user_msg="What are the prices of the stocks in EUR?")
+        samples.append(time.perf_counter() - start)
+        steps = llm.calls
+    return steps, statistics.median(samples)
+
+
+@click.command()
+@click.option("-s", "--symbol", "symbols", help="Stock quoted, repeatable", multiple=True,
+              default=["NVDA", "AMD", "INTC", "TSM", "ARM"])
+@click.option("--llm-latency", help="Seconds per LLM step", type=float, default=0.5)
+@click.option("--tool-latency", help="Seconds per tool call", type=float, default=0.3)
+@click.option("-n", "--runs", help="Questions per mode", type=int, default=5)
+def bench(symbols, llm_latency: float, tool_latency: float, runs: int):
+    tool_calls = [("stock_quote", {"symbol": s}) for s in symbols] + [("exchange_rate", {"base": "USD", "target": "EUR"})]
+    print(f"{len(tool_calls)} tool calls, LLM step {llm_latency * 1000:.0f} ms, tool call {tool_latency * 1000:.0f} ms")
+    for mode in ("react", "function", "function-par"):
+        steps, elapsed = asyncio.run(measure(mode, tool_calls, llm_latency, tool_latency, runs))
+        print(f"{mode:<16} {steps:3d} LLM steps   median {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    bench()
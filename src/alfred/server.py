@@ -0,0 +1,157 @@
+"""Long-lived agent server.
+
+Keeps the agent workflows, their tools, HTTP clients and LLM connections warm and answers
+the questions of many clients concurrently, over TCP or a Unix socket, with the JSON lines
+protocol of alfred.utils.agent_client. Each session has its own conversation context, kept in
+memory or, with a ConversationStore, shared with the CLIs and kept across restarts; the
+questions of a session are answered in order and at most `concurrency` questions run at once.
+
+    python server.py -m llama3.1                         # every agent, on 127.0.0.1:8765
+    python server.py -a stockbroker --address /tmp/alfred.sock
+    python stockbroker.py "what is the current stock price of NVIDIA?" --server
+"""
+
+import asyncio
+import json
+import logging
+import os
+import stat
+from collections import OrderedDict
+
+import click
+from llama_index.core.workflow import Context
+
+from alfred.utils.agent_client import LINE_LIMIT, is_unix_socket, server_address, tcp_address
+from alfred.utils.common import load_environment_variables
+from alfred.utils.conversation_store import ConversationStore, run_turn
+
+# Defaults of the agent_server_concurrency and agent_server_max_sessions environment variables
+SERVER_CONCURRENCY = 8
+SERVER_MAX_SESSIONS = 100
+
+
+class AgentServer:
+    """Answers questions with warm agent workflows.
+
+    Args:
+        workflows (dict): Agent name -> workflow, built once and shared by every session.
+        concurrency (int): Questions answered at once. Defaults to the `agent_server_concurrency` environment variable.
+        max_sessions (int): Sessions whose context is kept, the least recently used one is dropped beyond.
+            Defaults to the `agent_server_max_sessions` environment variable.
+        store (ConversationStore): Optional store of the conversations of the named sessions, used
+            instead of in-memory contexts.
+        llm: LLM compacting the conversations of the store.
+    """
+
+    def __init__(self, workflows, concurrency=None, max_sessions=None, store=None, llm=None):
+        concurrency = concurrency or int(os.getenv("agent_server_concurrency", SERVER_CONCURRENCY))
+        self.workflows = workflows
+        self.max_sessions = max_sessions or int(os.getenv("agent_server_max_sessions", SERVER_MAX_SESSIONS))
+        self.store = store
+        self.llm = llm
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._sessions = OrderedDict()
+
+    def _session(self, agent, session):
+        if session is None:
+            return Context(self.workflows[agent]), asyncio.Lock()
+        key = (agent, session)
+        if key in self._sessions:
+            self._sessions.move_to_end(key)
+        else:
+            self._sessions[key] = Context(self.workflows[agent]), asyncio.Lock()
+            while len(self._sessions) > self.max_sessions:
+                # A question still running in a dropped session finishes with its context
+                self._sessions.popitem(last=False)
+        return self._sessions[key]
+
+    async def ask(self, agent, question, session=None):
+        """Answer a question in the context of a session, a new context when session is None."""
+        if agent not in self.workflows:
+            raise ValueError(f"Unknown agent {agent}, expected one of {list(self.workflows)}.")
+        ctx, lock = self._session(agent, session)
+        # Wait for the previous question of the session before taking a slot
+        async with lock:
+            async with self._semaphore:
+                if self.store is not None and session is not None:
+                    # Stored per agent, like the contexts: agents may use the same session names
+                    return await run_turn(self.workflows[agent], self.store, f"{agent}/{session}", question, self.llm)
+                return str(await self.workflows[agent].run(ctx=ctx, user_msg=question))
+
+    async def _answer(self, line, writer, write_lock):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            response = await self.ask(request["agent"], request["question"], request.get("session"))
+            reply = {"id": request_id, "response": response}
+        except Exception as e:
+            logging.error(f"Request failed: {e}")
+            reply = {"id": request_id, "error": f"{type(e).__name__}: {e}"}
+        async with write_lock:
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+
+    async def handle(self, reader, writer):
+        """Serve a connection, its requests are answered concurrently, in the order they finish."""
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(self._answer(line, writer, write_lock))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def start(self, address=None):
+        """
+        Listen on address, host:port or a Unix socket path, returns the asyncio server.
+        The address defaults to the `agent_server` environment variable.
+        """
+        address = server_address(address)
+        if is_unix_socket(address):
+            # Left over by a previous server, but never remove anything else at that path
+            if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+                os.remove(address)
+            return await asyncio.start_unix_server(self.handle, address, limit=LINE_LIMIT)
+        return await asyncio.start_server(self.handle, *tcp_address(address), limit=LINE_LIMIT)
+
+    async def serve(self, address=None):
+        address = server_address(address)
+        server = await self.start(address)
+        logging.info(f"Agent server listening on {address} with agents {list(self.workflows)}")
+        async with server:
+            await server.serve_forever()
+
+
+def agent_classes():
+    from alfred.stockbroker import StockBroker
+    from alfred.travelassistant import TravelAssistant
+
+    return {"stockbroker": StockBroker, "travelassistant": TravelAssistant}
+
+
+@click.command()
+@click.option("-a", "--agent", "agents", help="Agent to serve, repeatable", multiple=True,
+              type=click.Choice(["stockbroker", "travelassistant"]), default=["stockbroker", "travelassistant"])
+@click.option("-m", "--model", help="The model name", type=str)
+@click.option("-t", "--agent-type", help="react, function (native tool calling) or auto, default agent_type or auto",
+              type=click.Choice(["react", "function", "auto"]))
+@click.option("--address", help="host:port or Unix socket path to listen on, default agent_server or 127.0.0.1:8765", type=str)
+@click.option("-c", "--concurrency", help="Questions answered at once, default agent_server_concurrency or 8", type=int)
+@click.option("--in-memory", help="Keep the conversations in memory instead of the conversation store", is_flag=True)
+def serve(agents, model: str, agent_type: str, address: str, concurrency: int, in_memory: bool):
+    from llama_index.core import Settings
+
+    load_environment_variables()
+    classes = agent_classes()
+    workflows = {name: classes[name](model, agent_type).prepare_chat() for name in agents}
+    store = None if in_memory else ConversationStore()
+    asyncio.run(AgentServer(workflows, concurrency=concurrency, store=store, llm=Settings.llm).serve(address))
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,24 +1,31 @@
 import click
 import asyncio
 from alfred.tools.alphavantage_retreaver import AlphaVantageToolSpec
+from alfred.tools.code_interpreter import CodeInterpreterToolSpec
 from alfred.tools.exchange_rate import ExchangeRateTool
 from alfred.utils.base_agent import BaseAgent
-from alfred.utils.common import save_context, load_context
+from alfred.utils.common import load_environment_variables
+from alfred.utils.conversation_store import ConversationStore, run_turn
+from llama_index.core import Settings
+from alfred.utils.agent_client import ask_server
 
 # python assistant/stock-broker.py -m "considering the drop in stock price of nvidia this week, do you still recommend buying nvidia shares? explain your analyis, and provide me in the end with a concrete recommendation"
 # python stockbroker.py -s -m llama3.1 "what is the current stock price of NVIDIA?"
 
 
 class StockBroker(BaseAgent):
-    def __init__(self, model_name):
-        super().__init__("prompts/prompt.sys.MD", model_name=model_name)
+    def __init__(self, model_name, agent_type=None):
+        super().__init__("prompts/prompt.sys.MD", model_name=model_name, agent_type=agent_type)
 
     def prepare_chat(self):
         finances_spec = AlphaVantageToolSpec()
         exchange_rate_spec = ExchangeRateTool()
+        # Loads the results the other tools save with save_as
+        code_interpreter_spec = CodeInterpreterToolSpec()
         tools = []
         tools.extend(finances_spec.to_tool_list())
         tools.extend(exchange_rate_spec.to_tool_list())
+        tools.extend(code_interpreter_spec.to_tool_list())
 
         return super().prepare_chat(
             agent_name="broker",
@@ -28,22 +35,22 @@ class StockBroker(BaseAgent):
 
 
 async def run_command(
-    question: str = None, memory: bool = False, model_name: str = "llama3.1"
+    question: str = None, memory: bool = False, model_name: str = "llama3.1", server: str = None,
+    session: str = "stockbroker", agent_type: str = None,
 ):
-    broker = StockBroker(model_name)
-    workflow = broker.prepare_chat()
-    ctx = None
-    CTX_PKL = "ctx_stock_broker.pkl"
-
-    if memory:
-        ctx = load_context(workflow, CTX_PKL)
+    if server is not None:
+        # Memory is the server session of the agent, kept across questions.
+        # --server without a value is the `agent_server` address of .env
+        load_environment_variables()
+        return await ask_server(question, "stockbroker", session=session if memory else None, address=server or None)
 
-    handler = workflow.run(ctx=ctx, user_msg=question)
-    response = await handler
+    broker = StockBroker(model_name, agent_type)
+    workflow = broker.prepare_chat()
 
     if memory:
-        save_context(handler, CTX_PKL)
+        return await run_turn(workflow, ConversationStore(), session, question, llm=Settings.llm)
 
+    response = await workflow.run(user_msg=question)
     return str(response)
 
 
@@ -52,9 +59,16 @@ async def run_command(
 @click.option(
     "-s", "--store", help="Use memory to store context", type=bool, is_flag=True
 )
+@click.option("--session", help="Name of the conversation kept with --store", type=str, default="stockbroker")
 @click.option("-m", "--model", help="The model name", type=str)
-def ask(question: str, store: bool, model: str = "llama3.1"):
-    result = asyncio.run(run_command(question, store, model))
+@click.option("-t", "--agent-type", help="react, function (native tool calling) or auto, default agent_type or auto",
+              type=click.Choice(["react", "function", "auto"]))
+@click.option(
+    "--server", help="Ask the agent server at this address (host:port or socket path) instead",
+    type=str, is_flag=False, flag_value="", default=None,
+)
+def ask(question: str, store: bool, session: str, model: str = "llama3.1", agent_type: str = None, server: str = None):
+    result = asyncio.run(run_command(question, store, model, server, session, agent_type))
     print(result)
 
 
@@ -0,0 +1,155 @@
+"""Local, indexed directory of the Skyscanner airports.
+
+The airport list is downloaded once, persisted as JSON and indexed in memory with a
+prefix trie over codes, names and cities, plus exact name/city maps and a fuzzy
+fallback, so resolving "frankfurt" or "stutgart" to an entity ID needs no request.
+"""
+
+import difflib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+
+AIRPORTS_PATH = os.path.join(os.path.expanduser("~"), ".cache", "alfred", "airports.json")
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation: "Zürich-Flughafen" -> "zurich flughafen"."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def airport_entry(raw):
+    """Reduce an airport record of the API to the fields used by the directory."""
+    location = raw.get("location") or ""
+    parts = [p.strip() for p in location.split(",")] if location else []
+    return {
+        "id": raw.get("id") or raw.get("entityId") or raw.get("skyId") or raw.get("iata"),
+        "code": raw.get("iata") or raw.get("skyId") or raw.get("id"),
+        "name": raw.get("name") or "",
+        "city": raw.get("city") or (parts[0] if parts else ""),
+        "country": raw.get("country") or (parts[-1] if len(parts) > 1 else ""),
+    }
+
+
+class AirportDirectory:
+    """In-memory index over a list of airports."""
+
+    def __init__(self, airports):
+        self.airports = [a for a in airports if a.get("id")]
+        self._trie = {}
+        self._codes = {}
+        self._names = {}
+        self._by_initial = {}
+
+        for index, airport in enumerate(self.airports):
+            if airport.get("code"):
+                self._codes.setdefault(airport["code"].upper(), []).append(index)
+            for field in ("name", "city"):
+                key = normalize(airport.get(field))
+                if key:
+                    self._names.setdefault(key, []).append(index)
+            for token in self._tokens(airport):
+                self._insert(token, index)
+
+        # Fuzzy candidates are bucketed by first letter, typos rarely hit the first one
+        for key in self._names:
+            self._by_initial.setdefault(key[0], []).append(key)
+
+    @staticmethod
+    def _tokens(airport):
+        tokens = {normalize(airport.get("code"))}
+        for field in ("name", "city", "country"):
+            # Every word-aligned suffix, so "charles de" finds "paris charles de gaulle"
+            words = normalize(airport.get(field)).split()
+            tokens.update(" ".join(words[i:]) for i in range(len(words)))
+        tokens.discard("")
+        return tokens
+
+    def _insert(self, token, index):
+        node = self._trie
+        for char in token:
+            node = node.setdefault(char, {})
+        node.setdefault("$", []).append(index)
+
+    def _prefixed(self, prefix, limit):
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        # Shortest completions first, so "par" ranks "paris" before "parma airport"
+        found, level = {}, [node]
+        while level and len(found) < limit:
+            next_level = []
+            for current in level:
+                for key, child in current.items():
+                    if key != "$":
+                        next_level.append(child)
+                        continue
+                    for i in child:
+                        found.setdefault(i)
+                        if len(found) >= limit:
+                            return list(found)
+            level = next_level
+        return list(found)
+
+    def lookup(self, query, limit=5):
+        """Return the best matching airports: exact code, exact name or city, prefix, then fuzzy matches."""
+        key = normalize(query)
+        limit = int(limit)
+        if not key:
+            return []
+
+        # dict keeps the insertion order and drops duplicates
+        matches = dict.fromkeys(self._codes.get(query.strip().upper(), []))
+        matches.update(dict.fromkeys(self._names.get(key, [])))
+        if len(matches) < limit:
+            matches.update(dict.fromkeys(self._prefixed(key, limit)))
+        if len(matches) < limit:
+            candidates = [k for k in self._by_initial.get(key[0], []) if abs(len(k) - len(key)) <= 2]
+            for close in difflib.get_close_matches(key, candidates, n=limit, cutoff=0.75):
+                matches.update(dict.fromkeys(self._names[close]))
+
+        return [self.airports[i] for i in list(matches)[:limit]]
+
+    @classmethod
+    def load(cls, fetch, path=None):
+        """Load the persisted airport list, downloading it with fetch() the first time."""
+        path = path or os.getenv("airports_path", AIRPORTS_PATH)
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                airports = json.load(file)
+            logging.info(f"Loaded {len(airports)} airports from {path}")
+        else:
+            payload = fetch()
+            records = payload.get("data", []) if isinstance(payload, dict) else payload
+            airports = [airport_entry(raw) for raw in records or []]
+            if airports:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                with open(f"{path}.tmp", "w") as file:
+                    json.dump(airports, file)
+                os.replace(f"{path}.tmp", path)
+                logging.info(f"Saved {len(airports)} airports to {path}")
+        return cls(airports)
+
+
+_lock = threading.Lock()
+_directory = None
+
+
+def get_directory(fetch, path=None):
+    """Process-wide airport directory, loaded on first use."""
+    global _directory
+    with _lock:
+        if _directory is not None:
+            return _directory
+        directory = AirportDirectory.load(fetch, path)
+        # Do not keep an empty directory around, a failed download is retried on the next call
+        if directory.airports:
+            _directory = directory
+        return directory
@@ -1,16 +1,135 @@
-import requests
-from llama_index.core.tools.tool_spec.base import BaseToolSpec
+import asyncio
+import datetime
+from alfred.utils.tool_spec import AsyncToolSpec
 import logging
 from dotenv import load_dotenv
 import os
-from alfred.utils.common import perform_search
+import threading
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from alfred.utils.function_catalog import FunctionCatalog
+from alfred.utils.http_client import http_get, ahttp_get
+from alfred.utils.rate_limit import TokenBucket
+from alfred.utils.response_cache import ResponseCache
+from alfred.utils.timeseries_store import TimeSeriesStore, series_key
+from alfred.utils.series_analytics import series_to_columns, summarize
+from alfred.utils.artifacts import save_artifact
 import json
 from llama_index.core import Settings
 
 load_dotenv()
 
+# Seconds a response stays fresh, per function. Quotes and intraday bars change by the
+# minute, daily series by the day and fundamentals by the quarter.
+FUNCTION_TTLS = {
+    "GLOBAL_QUOTE": 60,
+    "TIME_SERIES_INTRADAY": 60,
+    "CURRENCY_EXCHANGE_RATE": 60,
+    "FX_INTRADAY": 60,
+    "CRYPTO_INTRADAY": 60,
+    "NEWS_SENTIMENT": 15 * 60,
+    "TOP_GAINERS_LOSERS": 15 * 60,
+    "TIME_SERIES_DAILY": 60 * 60,
+    "TIME_SERIES_DAILY_ADJUSTED": 60 * 60,
+    "TIME_SERIES_WEEKLY": 6 * 60 * 60,
+    "TIME_SERIES_WEEKLY_ADJUSTED": 6 * 60 * 60,
+    "TIME_SERIES_MONTHLY": 6 * 60 * 60,
+    "TIME_SERIES_MONTHLY_ADJUSTED": 6 * 60 * 60,
+    "OVERVIEW": 24 * 60 * 60,
+    "INCOME_STATEMENT": 24 * 60 * 60,
+    "BALANCE_SHEET": 24 * 60 * 60,
+    "CASH_FLOW": 24 * 60 * 60,
+    "EARNINGS": 24 * 60 * 60,
+    "DIVIDENDS": 24 * 60 * 60,
+    "SPLITS": 24 * 60 * 60,
+    "LISTING_STATUS": 24 * 60 * 60,
+}
+DEFAULT_TTL = 5 * 60
 
-class AlphaVantageToolSpec(BaseToolSpec):
+# Series kept in the local time-series store. Only the daily series accept outputsize=compact,
+# which is what allows fetching just the latest bars once the history is stored.
+STORED_SERIES = ("TIME_SERIES_DAILY", "TIME_SERIES_DAILY_ADJUSTED")
+COMPACT_SIZE = 100
+
+# Series analyze_stock can summarize, intraday bars have no daily returns
+ANALYZED_SERIES = tuple(
+    f"TIME_SERIES_{period}{suffix}" for period in ("DAILY", "WEEKLY", "MONTHLY") for suffix in ("", "_ADJUSTED")
+)
+
+# Shared by every tool instance since the quota belongs to the API key, not to the agent.
+RESPONSE_CACHE = ResponseCache()
+RATE_LIMITER = TokenBucket(float(os.getenv("ALPHA_VANTAGE_RPM", "5")))
+MAX_CONCURRENCY = int(os.getenv("ALPHA_VANTAGE_CONCURRENCY", "4"))
+
+# Columns of the series summaries kept when comparing several symbols
+COMPARE_SERIES_FIELDS = (
+    "last_date",
+    "last_close",
+    "total_return_pct",
+    "change_1w_pct",
+    "change_1m_pct",
+    "change_3m_pct",
+    "annualized_volatility_pct",
+    "max_drawdown_pct",
+)
+
+
+def is_valid_response(data):
+    """ Alpha Vantage reports errors and quota notes with a 200 status, they must not be cached. """
+    return bool(data) and not any(key in data for key in ("Note", "Information", "Error Message"))
+
+
+def is_stored_series(function, parameters):
+    """ Whether a call is served from the local time-series store. """
+    return (
+        function in STORED_SERIES
+        and "symbol" in parameters
+        and set(parameters) <= {"symbol", "outputsize", "datatype"}
+        and parameters.get("datatype", "json") == "json"
+    )
+
+
+def normalize_parameters(parameters):
+    """ Canonical form of the request parameters, so equivalent calls share a cache entry. """
+    normalized = {}
+    for key, value in (parameters or {}).items():
+        key = key.strip().lower()
+        if key in ("apikey", "function") or value is None:
+            continue
+        value = str(value).strip()
+        normalized[key] = value.upper() if key in ("symbol", "symbols") else value
+    return normalized
+
+
+def save_result(name, data):
+    """ Save a response as an artifact and return its summary, time series as columns (date, open, close...) ready for a DataFrame. """
+    if not is_valid_response(data):
+        return data
+    if series_key(data) is not None:
+        try:
+            dates, columns = series_to_columns(data)
+        except (ValueError, TypeError):
+            pass
+        else:
+            dates = dates.astype(str).tolist()
+            columns = {"date": dates, **{label: column.tolist() for label, column in columns.items()}}
+            return {**save_artifact(name, columns), "rows": len(dates), "first_date": dates[0], "last_date": dates[-1]}
+    return save_artifact(name, data)
+
+
+def compact_fields(data):
+    """ Flatten a single-record response (e.g. GLOBAL_QUOTE, OVERVIEW) into its scalar fields. """
+    if len(data) == 1 and isinstance(next(iter(data.values())), dict):
+        data = next(iter(data.values()))
+    # "05. price" -> "price"
+    return {
+        key.split(". ", 1)[-1].replace(" ", "_"): value
+        for key, value in data.items()
+        if not isinstance(value, (dict, list))
+    }
+
+
+class AlphaVantageToolSpec(AsyncToolSpec):
     """
     AlphaVantageToolSpec is a tool specification class for interacting with the Alpha Vantage API. 
     It provides methods to retrieve available functions and execute them using the API. 
@@ -18,12 +137,19 @@ class AlphaVantageToolSpec(BaseToolSpec):
     Based on the description of the function, select the appropriate parameters and pass them as a dictionary to the `execute_function` method to get the desired data from the API.
     You do not need to pass the apikey as it is automatically included in the request.
     Once you the available function, you can use the `execute_function` method to get the data from the API.
+    To compare several stocks at once, use the `compare_stocks` method with the list of symbols instead of calling `execute_function` once per symbol.
+    To analyze the price history of a stock (returns, moving averages, volatility, drawdown, changes over a period), prefer the `analyze_stock` method,
+    which returns a compact summary instead of the full price series.
+    To process the data with the code interpreter, pass `save_as` to `execute_function` or `compare_stocks`: the full result is saved under that name,
+    only a summary is returned, and the code loads the data with load_artifact(name).
 
     """
 
     spec_functions = [
-        "get_relevant_functions",
-        "execute_function",
+        ("get_relevant_functions", "aget_relevant_functions"),
+        ("execute_function", "aexecute_function"),
+        ("analyze_stock", "aanalyze_stock"),
+        ("compare_stocks", "acompare_stocks"),
     ]
 
     def __init__(self):
@@ -34,6 +160,10 @@ class AlphaVantageToolSpec(BaseToolSpec):
         logging.info(f"API URL: {self.api_url}")
         logging.info(f"API_KEY: {self.apikey}")
 
+        self._catalog = None
+        self._timeseries = None
+        self._timeseries_lock = threading.Lock()
+
     def get_apikey(self):
         """
         Retrieve the API key used to access the Alpha Vantage API.
@@ -55,31 +185,267 @@ class AlphaVantageToolSpec(BaseToolSpec):
             logging.error(f"An error occurred while reading functions.json: {e}") 
             return []
 
+    def function_catalog(self):
+        """ Load the compiled function catalog, compiling it on first use. """
+        if self._catalog is None:
+            self._catalog = FunctionCatalog.load(os.getenv("fcts_path"), Settings.embed_model)
+        return self._catalog
+
+    def timeseries_store(self):
+        """ Open the local time-series store on first use. """
+        # compare_stocks calls it from several threads, they must share one store
+        with self._timeseries_lock:
+            if self._timeseries is None:
+                self._timeseries = TimeSeriesStore()
+            return self._timeseries
+
     def get_relevant_functions(self, query):
         """
         Retrieve the relevant function related to query along with the description, parameters and example calls.
         """
         logging.info(f"Retrieving relevant functions for query: {query}")
-        result = perform_search(embedding_model=Settings.embed_model, available_fcts=self.available_functions() , query=query)
+        query_embedding = Settings.embed_model.get_query_embedding(query)
+        return self._match_function(query_embedding)
+
+    async def aget_relevant_functions(self, query):
+        logging.info(f"Retrieving relevant functions for query: {query}")
+        query_embedding = await Settings.embed_model.aget_query_embedding(query)
+        return self._match_function(query_embedding)
+
+    def _match_function(self, query_embedding):
+        match = self.function_catalog().search(query_embedding, k=1)[0]
+        result = {key: match[key] for key in ("function", "documentation", "parameters")}
         logging.info(f"Relevant functions: {result}")
         return result
 
     def execute_function(
-        self, function: str, parameters: dict = None
+        self, function: str, parameters: dict = None, save_as: str = None
     ):
         """
         Retrieve information from Alpha Vantage server. No need to pass the apikey as it is automatically included in the request.
         :param function: The function name to be executed. The function can be selected from the list of functions in the json extracted from the get_available_functions method, based on the description of the function.
         :param parameters: A JSON object of parameters of key-value pair format, where the key if the parameter name. The list of parameters can be found in the Alpha Vantage json extracted from the read_functions_json method.
+        :param save_as: Optional artifact name. The response is saved under this name for the code interpreter, which loads it with load_artifact(name), and only a summary of it is returned.
         :return: The response data from Alpha Vantage.
         """
-        base_url = self.api_url
-        
+        function = function.strip().upper()
+        parameters = normalize_parameters(parameters)
+        if is_stored_series(function, parameters):
+            data = self._stored_series(function, parameters["symbol"], parameters.get("outputsize", "compact"))
+        else:
+            data = self._fetch(function, parameters)
+        return save_result(save_as, data) if save_as else data
+
+    async def aexecute_function(self, function: str, parameters: dict = None, save_as: str = None):
+        function = function.strip().upper()
+        parameters = normalize_parameters(parameters)
+        if is_stored_series(function, parameters):
+            # The local store is SQLite backed, keep it off the event loop
+            data = await asyncio.to_thread(
+                self._stored_series, function, parameters["symbol"], parameters.get("outputsize", "compact")
+            )
+        else:
+            data = await self._afetch(function, parameters)
+        return await asyncio.to_thread(save_result, save_as, data) if save_as else data
+
+    def analyze_stock(
+        self,
+        symbol: str,
+        function: str = "TIME_SERIES_DAILY",
+        start_date: str = None,
+        end_date: str = None,
+        window: int = 20,
+    ):
+        """
+        Analyze the price history of a stock and return a compact numeric summary: first and last close, period high and low,
+        total return, last change, mean/best/worst return, annualized volatility, maximum drawdown, simple moving averages
+        and the price change over the last week, month, 3 months, 6 months and year (all percentages are in %).
+        :param symbol: The stock symbol, e.g. NVDA.
+        :param function: The Alpha Vantage time series function: TIME_SERIES_DAILY, TIME_SERIES_WEEKLY or TIME_SERIES_MONTHLY (or their _ADJUSTED variants).
+        :param start_date: Optional first date of the analysis (format YYYY-MM-DD).
+        :param end_date: Optional last date of the analysis (format YYYY-MM-DD).
+        :param window: Number of data points of the short moving average. Defaults to 20.
+        :return: The summary of the series.
+        """
+        function = function.strip().upper()
+        if function not in ANALYZED_SERIES:
+            return {"error": f"analyze_stock needs a daily, weekly or monthly time series function, one of {list(ANALYZED_SERIES)}, not {function}."}
+
+        try:
+            window = int(window)
+        except (TypeError, ValueError):
+            return {"error": f"window must be a number of data points, not {window!r}."}
+        if window < 1:
+            return {"error": f"window must be at least 1, not {window}."}
+        for date in (start_date, end_date):
+            try:
+                if date:
+                    datetime.date.fromisoformat(date)
+            except (TypeError, ValueError):
+                return {"error": f"Invalid date {date!r}, the format is YYYY-MM-DD."}
+
+        parameters = {"symbol": symbol}
+        if start_date or end_date:
+            # The compact output only covers the last 100 data points
+            parameters["outputsize"] = "full"
+        data = self.execute_function(function, parameters)
+        if not is_valid_response(data):
+            return data
+
+        dates, columns = series_to_columns(data)
+        try:
+            summary = summarize(dates, columns, window, start_date, end_date)
+        except ValueError as e:
+            return {"error": f"{e} ({start_date or 'start'} to {end_date or 'end'} for {symbol.upper()})"}
+        return {"symbol": symbol.upper(), "function": function, **summary}
+
+    async def aanalyze_stock(
+        self,
+        symbol: str,
+        function: str = "TIME_SERIES_DAILY",
+        start_date: str = None,
+        end_date: str = None,
+        window: int = 20,
+    ):
+        return await asyncio.to_thread(self.analyze_stock, symbol, function, start_date, end_date, window)
+
+    def compare_stocks(
+        self,
+        symbols: List[str],
+        function: str = "GLOBAL_QUOTE",
+        parameters: dict = None,
+        start_date: str = None,
+        end_date: str = None,
+        save_as: str = None,
+    ):
+        """
+        Fetch the same Alpha Vantage function for several stock symbols at once and return one compact table, with one row per symbol.
+        For time series functions (e.g. TIME_SERIES_DAILY) each row summarizes the period: last close, total return, changes over 1 week,
+        1 month and 3 months, annualized volatility and maximum drawdown (percentages are in %).
+        :param symbols: The list of stock symbols, e.g. ["NVDA", "AMD", "INTC"].
+        :param function: The Alpha Vantage function, e.g. GLOBAL_QUOTE, OVERVIEW or TIME_SERIES_DAILY. Defaults to GLOBAL_QUOTE.
+        :param parameters: Optional extra parameters of the function, without the symbol. Not supported for time series functions, use start_date and end_date.
+        :param start_date: Optional first date of the period for time series functions (format YYYY-MM-DD).
+        :param end_date: Optional last date of the period for time series functions (format YYYY-MM-DD).
+        :param save_as: Optional artifact name. The table is saved under this name for the code interpreter, which loads it with load_artifact(name), and only a summary of it is returned.
+        :return: A table with the list of columns and one row of values per symbol.
+        """
+        if isinstance(symbols, str):
+            symbols = [s for s in symbols.replace(";", ",").split(",")]
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+        function = function.strip().upper()
+        is_series = function.startswith("TIME_SERIES") and function != "TIME_SERIES_INTRADAY"
+        extra = {key: value for key, value in normalize_parameters(parameters).items() if key != "symbol"}
+        if is_series and extra:
+            return {"error": f"parameters {sorted(extra)} are not supported for {function}, the period is set with start_date and end_date."}
+
+        def fetch_row(symbol):
+            try:
+                if is_series:
+                    summary = self.analyze_stock(symbol, function, start_date, end_date)
+                    if "last_close" not in summary:
+                        return {"error": json.dumps(summary)}
+                    return {field: summary.get(field) for field in COMPARE_SERIES_FIELDS}
+                data = self.execute_function(function, {**extra, "symbol": symbol})
+                if not is_valid_response(data):
+                    return {"error": json.dumps(data) if data else "no data"}
+                return compact_fields(data)
+            except Exception as e:
+                logging.error(f"Failed to fetch {function} for {symbol}: {e}")
+                return {"error": str(e)}
+
+        # The shared rate limiter keeps the fan-out within the API quota
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENCY, len(symbols)))) as pool:
+            rows = list(pool.map(fetch_row, symbols))
+
+        columns = list(dict.fromkeys(column for row in rows for column in row if column != "symbol"))
+        table = {
+            "function": function,
+            "columns": ["symbol", *columns],
+            "rows": [[symbol, *(row.get(column) for column in columns)] for symbol, row in zip(symbols, rows)],
+        }
+        if save_as:
+            return {**save_artifact(save_as, table), "symbols": symbols}
+        return table
+
+    async def acompare_stocks(
+        self,
+        symbols: List[str],
+        function: str = "GLOBAL_QUOTE",
+        parameters: dict = None,
+        start_date: str = None,
+        end_date: str = None,
+        save_as: str = None,
+    ):
+        return await asyncio.to_thread(self.compare_stocks, symbols, function, parameters, start_date, end_date, save_as)
+
+    def _fetch(self, function, parameters):
+        key = (function, json.dumps(parameters, sort_keys=True))
+        ttl = FUNCTION_TTLS.get(function, DEFAULT_TTL)
+
+        return RESPONSE_CACHE.get_or_fetch(
+            key, ttl, lambda: self._request(function, parameters), cacheable=is_valid_response
+        )
+
+    async def _afetch(self, function, parameters):
+        key = (function, json.dumps(parameters, sort_keys=True))
+        ttl = FUNCTION_TTLS.get(function, DEFAULT_TTL)
+
+        return await RESPONSE_CACHE.aget_or_fetch(
+            key, ttl, lambda: self._arequest(function, parameters), cacheable=is_valid_response
+        )
+
+    def _stored_series(self, function, symbol, outputsize):
+        """ Serve a daily series from the local store, fetching only the bars added since the last call. """
+        store = self.timeseries_store()
+        latest = store.latest_date(function, symbol)
+        full = outputsize == "full"
+
+        replace = False
+        if latest is None or (full and not store.has_full_history(function, symbol)):
+            data = self._fetch(function, {"symbol": symbol, "outputsize": outputsize})
+        else:
+            data = self._fetch(function, {"symbol": symbol, "outputsize": "compact"})
+            key = series_key(data) if is_valid_response(data) else None
+            if key and min(data[key]) > latest:
+                # More than a compact window has passed since the last update, close the gap
+                logging.info(f"Stored {function} for {symbol} is older than {COMPACT_SIZE} bars, fetching full history")
+                data = self._fetch(function, {"symbol": symbol, "outputsize": "full"})
+                full = True
+            elif key and store.is_revised(function, symbol, data):
+                # A split or a dividend adjusted the past prices, the stored ones are stale
+                logging.info(f"Stored {function} for {symbol} was revised, fetching full history")
+                data = self._fetch(function, {"symbol": symbol, "outputsize": "full"})
+                full = replace = is_valid_response(data)
+
+        if is_valid_response(data):
+            added = store.upsert(function, symbol, data, full=full, replace=replace)
+            logging.info(f"Stored {added} new {function} bars for {symbol}")
+        elif latest is None:
+            return data
+        else:
+            logging.warning(f"Failed to refresh {function} for {symbol}, serving stored bars")
+
+        return store.load(function, symbol, limit=None if outputsize == "full" else COMPACT_SIZE)
+
+    def _request(self, function, parameters):
         # Add the apikey and function to the parameters
-        parameters = parameters or {}
-        parameters.update({"apikey": self.apikey}, {"function":function})
-        logging.info(f"Executing function with URL: {base_url}, and Request parameters: {parameters}")
-        response = requests.get(base_url, params=parameters)
+        parameters = {**parameters, "apikey": self.apikey, "function": function}
+        waited = RATE_LIMITER.acquire()
+        if waited:
+            logging.info(f"Alpha Vantage quota reached, waited {waited:.1f}s")
+        logging.info(f"Executing function with URL: {self.api_url}, and Request parameters: {parameters}")
+        return self._handle_response(http_get(self.api_url, params=parameters))
+
+    async def _arequest(self, function, parameters):
+        parameters = {**parameters, "apikey": self.apikey, "function": function}
+        waited = await RATE_LIMITER.acquire_async()
+        if waited:
+            logging.info(f"Alpha Vantage quota reached, waited {waited:.1f}s")
+        logging.info(f"Executing function with URL: {self.api_url}, and Request parameters: {parameters}")
+        return self._handle_response(await ahttp_get(self.api_url, params=parameters))
+
+    def _handle_response(self, response):
         if response.status_code == 200:
             return response.json()
         else:
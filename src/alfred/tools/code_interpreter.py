@@ -1,15 +1,26 @@
 """Code Interpreter tool spec."""
 
+import uuid
 from llama_index.core.tools.tool_spec.base import BaseToolSpec
-import tempfile
-import os
-import docker
+from alfred.tools.sandbox import format_result, get_pool
 
 class CodeInterpreterToolSpec(BaseToolSpec):
-    """Code Interpreter tool spec."""
+    """Code Interpreter tool spec.
+
+    Snippets run in a warm sandbox kept for the lifetime of the tool spec, so variables and
+    imports survive from one call to the next.
+
+    Args:
+        session_id (str): Sandbox session, defaults to a new session per tool spec.
+        timeout (float): Seconds a snippet may run. Defaults to the `code_interpreter_timeout` environment variable.
+    """
 
     spec_functions = ["code_interpreter"]
 
+    def __init__(self, session_id=None, timeout=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.timeout = timeout
+
     def code_interpreter(self, code: str):
         """
         A function to execute python code, and return the stdout and stderr.
@@ -18,7 +29,12 @@ class CodeInterpreterToolSpec(BaseToolSpec):
         You should import any libraries that you wish to use. You have access to any libraries the user has installed.
 
 
-        The code passed to this functuon is executed in isolation. It should be complete at the time it is passed to this function.
+        The code passed to this function runs in a persistent Python session: variables, functions and imports
+        defined by previous calls are still available. The value of a final expression is printed.
+
+
+        Data saved by other tools with their save_as parameter is loaded with load_artifact(name), e.g.
+        prices = load_artifact("nvda_daily"), without copying it into the code; list_artifacts() lists the saved names.
 
 
         You should interpret the output and errors returned from this function, and attempt to fix any problems.
@@ -27,20 +43,7 @@ class CodeInterpreterToolSpec(BaseToolSpec):
 
         It is not possible to return graphics or other complicated data from this function. If the user cannot see the output, save it to a file and tell the user.
         """
-        with tempfile.NamedTemporaryFile(suffix=".py", delete=True) as temp_file:
-            temp_file.write(code.encode())
-            temp_file.flush()
-            temp_file_path = temp_file.name
-
-            try:
-                client = docker.from_env()
-                result = client.containers.run(
-                    "python:3.10-alpine",
-                    command=["python", os.path.basename(temp_file_path).split('/')[-1]],
-                    volumes={os.path.dirname(temp_file_path):{"bind":"/usr/src/mycode"}},
-                    working_dir="/usr/src/mycode",
-                    remove=True
-                )
-                return result
-            except Exception as e:
-                return f"Error: {e}"
\ No newline at end of file
+        try:
+            return format_result(get_pool().run(self.session_id, code, self.timeout))
+        except Exception as e:
+            return f"Error: {e}"
@@ -1,31 +1,108 @@
-import requests
-from llama_index.core.tools.tool_spec.base import BaseToolSpec
+import os
+from typing import List
+import httpx
+import numpy as np
+from alfred.utils.tool_spec import AsyncToolSpec
+from alfred.utils.http_client import http_get, ahttp_get
+from alfred.utils.response_cache import ResponseCache
 
-class ExchangeRateTool(BaseToolSpec):
+# A single table is downloaded for the base currency, every other pair is a cross rate
+BASE_CURRENCY = "USD"
+# Default of the exchange_rates_ttl environment variable, seconds the table is kept
+RATES_TTL = 3600
+RATES_CACHE = ResponseCache(max_entries=1)
+
+
+def rates_ttl():
+    """Seconds a downloaded table is kept, read each time one is stored."""
+    return int(os.getenv("exchange_rates_ttl", RATES_TTL))
+
+
+class ExchangeRateError(RuntimeError):
+    """The exchange rate table could not be downloaded."""
+
+
+def parse_rates(response):
+    """The rate table of a download, raises ExchangeRateError when there is none."""
+    if response.status_code != 200:
+        raise ExchangeRateError(f"Can't download the exchange rates, the service answered with status {response.status_code}.")
+    rates = response.json().get('rates')
+    if not rates:
+        raise ExchangeRateError("Can't download the exchange rates, the service answered without rates.")
+    return rates
+
+
+class ExchangeRateTool(AsyncToolSpec):
     """
     Exchange Rate tool spec."""
 
-    spec_functions = ["get_exchange_rates", "convert"]
+    spec_functions = [
+        ("get_exchange_rates", "aget_exchange_rates"),
+        ("convert", "aconvert"),
+        ("convert_many", "aconvert_many"),
+    ]
 
     def __init__(self):
         self.api_url = "https://api.exchangerate-api.com/v4/latest/"
 
+    def _base_rates(self):
+        return RATES_CACHE.get_or_fetch((self.api_url, BASE_CURRENCY), rates_ttl(), self._fetch_base_rates)
+
+    async def _abase_rates(self):
+        return await RATES_CACHE.aget_or_fetch((self.api_url, BASE_CURRENCY), rates_ttl(), self._afetch_base_rates)
+
+    def _fetch_base_rates(self):
+        try:
+            return parse_rates(http_get(f'{self.api_url}{BASE_CURRENCY}'))
+        except (httpx.HTTPError, ValueError) as e:
+            raise ExchangeRateError(f"Can't download the exchange rates: {e}") from e
+
+    async def _afetch_base_rates(self):
+        try:
+            return parse_rates(await ahttp_get(f'{self.api_url}{BASE_CURRENCY}'))
+        except (httpx.HTTPError, ValueError) as e:
+            raise ExchangeRateError(f"Can't download the exchange rates: {e}") from e
+
     def get_exchange_rates(self, from_currency='USD'):
         """
         Get exchange rates for a given currency."""
 
-        response = requests.get(f'{self.api_url}{from_currency}')
-        if response.status_code == 200:
-            return response.json().get('rates', {})
-        else:
-            return {}
+        return self._cross_rates(self._base_rates(), from_currency)
+
+    async def aget_exchange_rates(self, from_currency='USD'):
+        return self._cross_rates(await self._abase_rates(), from_currency)
 
     def convert(self, amount, from_currency="USD", to_currency="EUR"):
         """
-        Convert an amount from one currency to another."""
+        Convert an amount from one currency to another, rounded to 2 decimals."""
+
+        return round(float(amount) * self._rate(self._base_rates(), from_currency, to_currency), 2)
+
+    async def aconvert(self, amount, from_currency="USD", to_currency="EUR"):
+        return round(float(amount) * self._rate(await self._abase_rates(), from_currency, to_currency), 2)
+
+    def convert_many(self, amounts: List[float], from_currency="USD", to_currency="EUR"):
+        """
+        Convert a list of amounts from one currency to another, e.g. all the prices of a flight search.
+        Returns the converted amounts in the same order, rounded to 2 decimals."""
+
+        rate = self._rate(self._base_rates(), from_currency, to_currency)
+        return (np.asarray(amounts, dtype=float) * rate).round(2).tolist()
+
+    async def aconvert_many(self, amounts: List[float], from_currency="USD", to_currency="EUR"):
+        rate = self._rate(await self._abase_rates(), from_currency, to_currency)
+        return (np.asarray(amounts, dtype=float) * rate).round(2).tolist()
+
+    def _cross_rates(self, base_rates, from_currency):
+        from_currency = from_currency.upper()
+        if from_currency not in base_rates:
+            return {}
+        base = base_rates[from_currency]
+        return {currency: rate / base for currency, rate in base_rates.items()}
 
-        rates = self.get_exchange_rates(from_currency)
-        if to_currency in rates:
-            return amount * rates[to_currency]
-        else:
-            raise ValueError(f"Currency {to_currency} not supported.")
\ No newline at end of file
+    def _rate(self, base_rates, from_currency, to_currency):
+        from_currency, to_currency = from_currency.upper(), to_currency.upper()
+        for currency in (from_currency, to_currency):
+            if currency not in base_rates:
+                raise ValueError(f"Currency {currency} not supported.")
+        return base_rates[to_currency] / base_rates[from_currency]
@@ -1,21 +1,36 @@
-from llama_index.core.tools.tool_spec.base import BaseToolSpec
-import requests
+from alfred.utils.tool_spec import AsyncToolSpec
+from alfred.utils.http_client import http_get, ahttp_get, http_stream, ahttp_stream
+from alfred.tools.flight_parsing import (
+    month_range,
+    iter_calendar_prices,
+    cheapest_itineraries,
+    acheapest_itineraries,
+)
+from alfred.tools.airport_directory import get_directory
+from alfred.utils.artifacts import save_artifact
+from llama_index.core.async_utils import asyncio_run
+from typing import List
+import asyncio
+import heapq
 import logging
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+FLIGHTS_CONCURRENCY = int(os.getenv("flights_concurrency", "4"))
 
-class FlightAssistantTool(BaseToolSpec):
+
+class FlightAssistantTool(AsyncToolSpec):
     """Flight Assistant tool spec."""
 
     spec_functions = [
-        "oneway_flights_month",
-        "twoway_flights_month",
-        "airports_information",
-        "one_way_flight",
-        "round_trip_flight",
+        ("oneway_flights_month", "aoneway_flights_month"),
+        ("twoway_flights_month", "atwoway_flights_month"),
+        ("resolve_airport", "aresolve_airport"),
+        ("one_way_flight", "aone_way_flight"),
+        ("round_trip_flight", "around_trip_flight"),
+        ("cheapest_flexible_flights", "acheapest_flexible_flights"),
     ]
 
     def __init__(self):
@@ -33,6 +48,14 @@ class FlightAssistantTool(BaseToolSpec):
         A usefull function that takes as input the source airport code, destination airport code, and the month of the year (format YYYY-MM) 
         and returns the flights data in json format. This function is useful to get flights for a specific month.
         """
+        return self._get(*self._oneway_month_request(from_airport_code, to_airport_code, year_month))
+
+    async def aoneway_flights_month(
+        self, from_airport_code="FRA", to_airport_code="STR", year_month="2025-03"
+    ):
+        return await self._aget(*self._oneway_month_request(from_airport_code, to_airport_code, year_month))
+
+    def _oneway_month_request(self, from_airport_code, to_airport_code, year_month):
         logging.debug(
             f"Searching flights from {from_airport_code} to {to_airport_code} for the month {year_month}"
         )
@@ -43,10 +66,7 @@ class FlightAssistantTool(BaseToolSpec):
             "yearMonth": year_month,
             "currency": "EUR",
         }
-        response = requests.get(
-            f"{self.url}price-calendar-web", headers=self.headers, params=querystring
-        )
-        return response.json()
+        return "price-calendar-web", querystring
 
     def twoway_flights_month(
         self,
@@ -59,6 +79,22 @@ class FlightAssistantTool(BaseToolSpec):
         A usefull function that takes as input the source airport code, destination airport code, and the month of the year (format YYYY-MM) 
         and returns the flights data in json format. This function is useful to get flights for a specific departure month and returning month.
         """
+        return self._get(
+            *self._twoway_month_request(from_airport_code, to_airport_code, year_month, return_year_month)
+        )
+
+    async def atwoway_flights_month(
+        self,
+        from_airport_code="FRA",
+        to_airport_code="STR",
+        year_month="2025-03",
+        return_year_month="2025-04",
+    ):
+        return await self._aget(
+            *self._twoway_month_request(from_airport_code, to_airport_code, year_month, return_year_month)
+        )
+
+    def _twoway_month_request(self, from_airport_code, to_airport_code, year_month, return_year_month):
         logging.debug(
             f"Searching flights from {from_airport_code} to {to_airport_code} for the month {year_month}, and returning on {return_year_month}"
         )
@@ -70,24 +106,101 @@ class FlightAssistantTool(BaseToolSpec):
             "yearMonthReturn": return_year_month,
             "currency": "EUR",
         }
-        response = requests.get(
-            f"{self.url}price-calendar-web-return",
-            headers=self.headers,
-            params=querystring,
+        return "price-calendar-web-return", querystring
+
+    def cheapest_flexible_flights(
+        self,
+        from_airport_codes: List[str],
+        to_airport_codes: List[str],
+        from_month: str,
+        to_month: str,
+        limit: int = 10,
+        save_as: str = None,
+    ):
+        """
+        A usefull function to find the cheapest one way flights when the dates or the airports are flexible. It takes as input
+        a list of source airport codes, a list of destination airport codes, and a range of months (format YYYY-MM, both included),
+        searches every combination at once and returns the `limit` cheapest options sorted by price, each with its date, price,
+        source and destination airport codes. Prefer this function over calling oneway_flights_month several times.
+        save_as can be set to a name to save the options for the code interpreter, which loads them with load_artifact(name);
+        only a summary is returned then.
+        """
+        return asyncio_run(
+            self.acheapest_flexible_flights(from_airport_codes, to_airport_codes, from_month, to_month, limit, save_as)
         )
-        return response.json()
+
+    async def acheapest_flexible_flights(
+        self,
+        from_airport_codes: List[str],
+        to_airport_codes: List[str],
+        from_month: str,
+        to_month: str,
+        limit: int = 10,
+        save_as: str = None,
+    ):
+        if isinstance(from_airport_codes, str):
+            from_airport_codes = from_airport_codes.split(",")
+        if isinstance(to_airport_codes, str):
+            to_airport_codes = to_airport_codes.split(",")
+        try:
+            months = month_range(from_month, to_month)
+        except (AttributeError, ValueError):
+            months = []
+        if not months:
+            return {"error": f"No month between {from_month} and {to_month}, the months are YYYY-MM and from_month is not after to_month."}
+        searches = [
+            (origin.strip(), destination.strip(), month)
+            for origin in from_airport_codes
+            for destination in to_airport_codes
+            for month in months
+            if origin.strip() != destination.strip()
+        ]
+        semaphore = asyncio.Semaphore(FLIGHTS_CONCURRENCY)
+
+        async def search(origin, destination, month):
+            async with semaphore:
+                try:
+                    payload = await self._aget(*self._oneway_month_request(origin, destination, month))
+                except Exception as e:
+                    logging.error(f"Calendar search {origin}-{destination} {month} failed: {e}")
+                    return []
+            # A price without a date can't be booked
+            return [
+                (price, date, origin, destination, direct)
+                for date, price, direct in iter_calendar_prices(payload, month)
+                if date is not None
+            ]
+
+        logging.debug(f"Running {len(searches)} calendar searches")
+        results = await asyncio.gather(*(search(*s) for s in searches))
+        cheapest = heapq.nsmallest(int(limit), (option for options in results for option in options), key=lambda o: o[0])
+
+        options = [
+            {"date": date, "price": price, "from": origin, "to": destination, "direct": direct, "currency": "EUR"}
+            for price, date, origin, destination, direct in cheapest
+        ]
+        return await asyncio.to_thread(save_artifact, save_as, options) if save_as else options
 
     def airports_information(self):
         """
         A usefull function that returns the list of airports and their information in json format.
+        The list is downloaded once and then served from the local copy.
         """
         logging.debug(f"Searching for airports information")
+        return get_directory(lambda: self._get("airports", {})).airports
 
-        querystring = {}
-        response = requests.get(
-            f"{self.url}airports", headers=self.headers, params=querystring
-        )
-        return response.json()
+    def resolve_airport(self, query: str, limit: int = 5):
+        """
+        A usefull function that finds airports by code, name, city or country, and tolerates typos and partial names.
+        It takes as input the text to search for (e.g. "FRA", "frankfurt", "stutgart") and the maximum number of results,
+        and returns the matching airports with their entity id (to use as airport code in the flight searches), code, name, city and country.
+        """
+        logging.debug(f"Resolving airport {query}")
+        return get_directory(lambda: self._get("airports", {})).lookup(query, limit)
+
+    async def aresolve_airport(self, query: str, limit: int = 5):
+        # Only the first call downloads the list, keep it off the event loop
+        return await asyncio.to_thread(self.resolve_airport, query, limit)
 
     def one_way_flight(
         self,
@@ -101,7 +214,10 @@ class FlightAssistantTool(BaseToolSpec):
         adults="2",
         includeOriginNearbyAirports="false",
         includeDestinationNearbyAirports="false",
-        airlines=None
+        airlines=None,
+        limit: int = 10,
+        raw: bool = False,
+        save_as: str = None,
     ):
         """
         A usefull function that searches for one way flights for a specific date based on multiple parameters and returns the flights data in json format.
@@ -110,8 +226,42 @@ class FlightAssistantTool(BaseToolSpec):
         - stops can take one or more of the following values: direct, 1stop, 2stops
         - airlines can be retrieved from response this endpoint(data->filterStats->carriers->id), and It can input multiple values, and the values should be separated by commas. Ex: -32753,-32695,-32677
         - includeOriginNearbyAirports and includeDestinationNearbyAirports can take the values: true, false
+        - limit is the number of cheapest itineraries returned, each with its price, departure and arrival times, stops, carriers and duration
+        - raw can be set to true to get the complete, unprocessed response instead (much larger)
+        - save_as can be set to a name to save the result for the code interpreter, which loads it with load_artifact(name); only a summary is returned then
         """
 
+        return self._search(*self._one_way_request(
+            from_airport_code, to_airport_code, depart_date, stops, children, infants, cabinClass, adults,
+            includeOriginNearbyAirports, includeDestinationNearbyAirports, airlines,
+        ), limit, raw, save_as)
+
+    async def aone_way_flight(
+        self,
+        from_airport_code="FRA",
+        to_airport_code="STR",
+        depart_date="2025-02-14",
+        stops="direct",
+        children="0",
+        infants="0",
+        cabinClass="economy",
+        adults="2",
+        includeOriginNearbyAirports="false",
+        includeDestinationNearbyAirports="false",
+        airlines=None,
+        limit: int = 10,
+        raw: bool = False,
+        save_as: str = None,
+    ):
+        return await self._asearch(*self._one_way_request(
+            from_airport_code, to_airport_code, depart_date, stops, children, infants, cabinClass, adults,
+            includeOriginNearbyAirports, includeDestinationNearbyAirports, airlines,
+        ), limit, raw, save_as)
+
+    def _one_way_request(
+        self, from_airport_code, to_airport_code, depart_date, stops, children, infants, cabinClass, adults,
+        includeOriginNearbyAirports, includeDestinationNearbyAirports, airlines,
+    ):
         logging.debug(
             f"Searching for one way flights from {from_airport_code} to {to_airport_code} for the depart date {depart_date}"
         )
@@ -131,12 +281,7 @@ class FlightAssistantTool(BaseToolSpec):
             "sort": "cheapest_first",
             "airlines": airlines,
         }
-        response = requests.get(
-            f"{self.url}search-one-way",
-            headers=self.headers,
-            params=querystring,
-        )
-        return response.json()
+        return "search-one-way", querystring
 
     def round_trip_flight(
         self,
@@ -151,7 +296,10 @@ class FlightAssistantTool(BaseToolSpec):
         adults="2",
         includeOriginNearbyAirports="false",
         includeDestinationNearbyAirports="false",
-        airlines=None
+        airlines=None,
+        limit: int = 10,
+        raw: bool = False,
+        save_as: str = None,
     ):
         """
         A usefull function that searches for round trip flights for specific dates based on multiple parameters and returns the flights data in json format.
@@ -160,8 +308,43 @@ class FlightAssistantTool(BaseToolSpec):
         - stops can take one or more of the following values: direct, 1stop, 2stops
         - airlines can be retrieved from response this endpoint(data->filterStats->carriers->id), and It can input multiple values, and the values should be separated by commas. Ex: -32753,-32695,-32677
         - includeOriginNearbyAirports and includeDestinationNearbyAirports can take the values: true, false
+        - limit is the number of cheapest itineraries returned, each with its price, departure and arrival times, stops, carriers and duration
+        - raw can be set to true to get the complete, unprocessed response instead (much larger)
+        - save_as can be set to a name to save the result for the code interpreter, which loads it with load_artifact(name); only a summary is returned then
         """
 
+        return self._search(*self._round_trip_request(
+            from_airport_code, to_airport_code, depart_date, return_date, stops, children, infants, cabinClass,
+            adults, includeOriginNearbyAirports, includeDestinationNearbyAirports, airlines,
+        ), limit, raw, save_as)
+
+    async def around_trip_flight(
+        self,
+        from_airport_code="FRA",
+        to_airport_code="STR",
+        depart_date="2025-02-14",
+        return_date="2025-03-14",
+        stops="direct",
+        children="0",
+        infants="0",
+        cabinClass="economy",
+        adults="2",
+        includeOriginNearbyAirports="false",
+        includeDestinationNearbyAirports="false",
+        airlines=None,
+        limit: int = 10,
+        raw: bool = False,
+        save_as: str = None,
+    ):
+        return await self._asearch(*self._round_trip_request(
+            from_airport_code, to_airport_code, depart_date, return_date, stops, children, infants, cabinClass,
+            adults, includeOriginNearbyAirports, includeDestinationNearbyAirports, airlines,
+        ), limit, raw, save_as)
+
+    def _round_trip_request(
+        self, from_airport_code, to_airport_code, depart_date, return_date, stops, children, infants, cabinClass,
+        adults, includeOriginNearbyAirports, includeDestinationNearbyAirports, airlines,
+    ):
         logging.debug(
             f"Searching for round trip flights from {from_airport_code} to {to_airport_code} for the depart date {depart_date} and returning on {return_date}"
         )
@@ -182,9 +365,32 @@ class FlightAssistantTool(BaseToolSpec):
             "sort": "cheapest_first",
             "airlines": airlines,
         }
-        response = requests.get(
-            f"{self.url}search-roundtrip",
-            headers=self.headers,
-            params=querystring,
-        )
+        return "search-roundtrip", querystring
+
+    def _get(self, endpoint, querystring):
+        response = http_get(f"{self.url}{endpoint}", headers=self.headers, params=querystring)
+        return response.json()
+
+    async def _aget(self, endpoint, querystring):
+        response = await ahttp_get(f"{self.url}{endpoint}", headers=self.headers, params=querystring)
         return response.json()
+
+    def _search(self, endpoint, querystring, limit=10, raw=False, save_as=None):
+        """
+        Run a flight search, projecting the response down to the cheapest itineraries unless raw is requested,
+        and save the result as an artifact when save_as is given.
+        """
+        if str(raw).lower() == "true":
+            result = self._get(endpoint, querystring)
+        else:
+            with http_stream(f"{self.url}{endpoint}", headers=self.headers, params=querystring) as response:
+                result = cheapest_itineraries(response.iter_bytes(), int(limit))
+        return save_artifact(save_as, result) if save_as else result
+
+    async def _asearch(self, endpoint, querystring, limit=10, raw=False, save_as=None):
+        if str(raw).lower() == "true":
+            result = await self._aget(endpoint, querystring)
+        else:
+            async with ahttp_stream(f"{self.url}{endpoint}", headers=self.headers, params=querystring) as response:
+                result = await acheapest_itineraries(response.aiter_bytes(), int(limit))
+        return await asyncio.to_thread(save_artifact, save_as, result) if save_as else result
@@ -0,0 +1,202 @@
+"""Helpers reducing Skyscanner responses to the few fields the agents need."""
+
+import heapq
+import json
+import logging
+
+
+def month_range(from_month, to_month):
+    """All months between two YYYY-MM months, both included. Raises ValueError for a malformed month."""
+    year, month = map(int, from_month.split("-")[:2])
+    end_year, end_month = map(int, to_month.split("-")[:2])
+    if not (1 <= month <= 12 and 1 <= end_month <= 12):
+        raise ValueError(f"Invalid month in {from_month} to {to_month}.")
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _cell_price(cell):
+    """Cheapest price of a price grid cell, and whether it is a direct flight."""
+    best = None
+    for key, direct in (("DirectOutbound", True), ("Direct", True), ("IndirectOutbound", False), ("Indirect", False)):
+        price = (cell.get(key) or {}).get("Price")
+        if price is not None and (best is None or price < best[0]):
+            best = (price, direct)
+    return best
+
+
+def iter_calendar_prices(payload, year_month):
+    """
+    Yield (date, price, direct) for every day with a price in a price calendar response.
+    Both the day list (data.flights.days) and the price grid (data.PriceGrids.Grid) layouts are supported.
+    """
+    data = (payload or {}).get("data") or {}
+
+    for day in (data.get("flights") or {}).get("days") or []:
+        if day.get("price") is not None:
+            yield day.get("day"), day["price"], None
+
+    grid = (data.get("PriceGrids") or {}).get("Grid") or []
+    for row in grid:
+        for index, cell in enumerate(row):
+            best = _cell_price(cell or {})
+            if best:
+                yield f"{year_month}-{index + 1:02d}", best[0], best[1]
+
+
+# Error payloads are tiny, a response larger than this is never parsed as a whole
+HEAD_LIMIT = 64 * 1024
+ITINERARIES_PATH = "data.itineraries.item"
+
+
+def project_itinerary(itinerary):
+    """Keep only the fields of an itinerary that matter to the traveller."""
+    price = itinerary.get("price") or {}
+    legs = []
+    for leg in itinerary.get("legs") or []:
+        carriers = (leg.get("carriers") or {}).get("marketing") or []
+        legs.append(
+            {
+                "from": (leg.get("origin") or {}).get("displayCode") or (leg.get("origin") or {}).get("id"),
+                "to": (leg.get("destination") or {}).get("displayCode") or (leg.get("destination") or {}).get("id"),
+                "departure": leg.get("departure"),
+                "arrival": leg.get("arrival"),
+                "duration_minutes": leg.get("durationInMinutes"),
+                "stops": leg.get("stopCount"),
+                "carriers": [carrier.get("name") for carrier in carriers],
+            }
+        )
+    return {"id": itinerary.get("id"), "price": price.get("raw"), "formatted_price": price.get("formatted"), "legs": legs}
+
+
+class TopItineraries:
+    """Bounded max-heap keeping the `limit` cheapest itineraries seen so far."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.seen = 0
+        self._heap = []
+
+    def add(self, itinerary):
+        self.seen += 1
+        price = (itinerary.get("price") or {}).get("raw")
+        if price is None:
+            return
+        entry = (-float(price), -self.seen, itinerary)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def result(self):
+        return [project_itinerary(itinerary) for _, _, itinerary in sorted(self._heap, reverse=True)]
+
+
+class _ChunkReader:
+    """File-like view over an iterator of byte chunks, remembering the head of the stream."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self.head = bytearray()
+
+    def _remember(self, chunk):
+        if len(self.head) <= HEAD_LIMIT:
+            self.head += chunk
+
+    def read(self, size=-1):
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._remember(chunk)
+            parts.append(chunk)
+            length += len(chunk)
+        return self._take(b"".join(parts), size)
+
+    def _take(self, data, size):
+        if size < 0:
+            self._buffer = b""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+class _AsyncChunkReader(_ChunkReader):
+    """Asynchronous file-like view over an async iterator of byte chunks."""
+
+    def __init__(self, chunks):
+        super().__init__(())
+        self._achunks = chunks.__aiter__()
+
+    async def read(self, size=-1):
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            try:
+                chunk = await self._achunks.__anext__()
+            except StopAsyncIteration:
+                break
+            self._remember(chunk)
+            parts.append(chunk)
+            length += len(chunk)
+        return self._take(b"".join(parts), size)
+
+
+def _finish(top, head):
+    if top.seen or len(head) > HEAD_LIMIT:
+        return {"itineraries": top.result(), "total_itineraries": top.seen}
+    # No itinerary in a small response: most likely an error message, pass it on
+    try:
+        payload = json.loads(bytes(head) or b"{}")
+    except ValueError:
+        payload = {}
+    return {"itineraries": [], "total_itineraries": 0, **{k: v for k, v in payload.items() if k != "data"}}
+
+
+def _without_ijson():
+    logging.warning("ijson is not installed, the flight search response is parsed as a whole")
+
+
+def cheapest_itineraries(chunks, limit=10):
+    """
+    Parse a flight search response from its byte chunks and return the `limit` cheapest itineraries.
+    The response is parsed incrementally with ijson, one itinerary at a time, or as a whole without it.
+    """
+    top = TopItineraries(limit)
+    reader = _ChunkReader(chunks)
+    try:
+        import ijson
+    except ImportError:
+        _without_ijson()
+        payload = json.loads(reader.read() or b"{}")
+        for itinerary in ((payload.get("data") or {}).get("itineraries") or []):
+            top.add(itinerary)
+        return _finish(top, reader.head)
+
+    for itinerary in ijson.items(reader, ITINERARIES_PATH, use_float=True):
+        top.add(itinerary)
+    return _finish(top, reader.head)
+
+
+async def acheapest_itineraries(chunks, limit=10):
+    """Asynchronous `cheapest_itineraries` over an async iterator of byte chunks."""
+    top = TopItineraries(limit)
+    reader = _AsyncChunkReader(chunks)
+    try:
+        import ijson
+    except ImportError:
+        _without_ijson()
+        payload = json.loads(await reader.read() or b"{}")
+        for itinerary in ((payload.get("data") or {}).get("itineraries") or []):
+            top.add(itinerary)
+        return _finish(top, reader.head)
+
+    async for itinerary in ijson.items_async(reader, ITINERARIES_PATH, use_float=True):
+        top.add(itinerary)
+    return _finish(top, reader.head)
@@ -3,17 +3,44 @@
 """
 import base64
 import email
-from typing import Any, List, Optional
+import queue
+import random
+import threading
+import time
+from typing import Any, Iterable, List, Optional
 
 from llama_index.core.readers.base import BaseReader
 from llama_index.core.schema import Document
 from pydantic import BaseModel
 import logging
 from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor
+from alfred.tools.mime_text import extract_message_text, extract_message_texts
 
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly",
           "https://www.googleapis.com/auth/gmail.compose",]
 
+# Gmail accepts up to 100 calls per batch request, but throttles batches above 50
+MAX_BATCH_SIZE = 100
+MAX_PAGE_SIZE = 500
+RETRIABLE_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+# Changes replayed by a sync, and the labels messages.list leaves out
+HISTORY_TYPES = ("messageAdded", "messageDeleted", "labelAdded", "labelRemoved")
+HIDDEN_LABELS = {"SPAM", "TRASH"}
+
+
+def is_retriable(exception):
+    """ Whether a failed Gmail call should be retried later: quota and transient server errors. """
+    from googleapiclient.errors import HttpError
+
+    if not isinstance(exception, HttpError):
+        return False
+    status = exception.resp.status
+    if status in RETRIABLE_STATUSES:
+        return True
+    return status == 403 and any(reason in str(exception.content) for reason in RATE_LIMIT_REASONS)
+
 
 class GmailReader(BaseReader, BaseModel):
     """Gmail reader.
@@ -26,33 +53,51 @@ class GmailReader(BaseReader, BaseModel):
         service (Any): Gmail service. Defaults to None.
         results_per_page (Optional[int]): Max number of results per page. Defaults to 10.
         use_iterative_parser (bool): Use iterative parser. Defaults to False.
+        fast_parser (bool): Extract the text/plain part, or the text of the text/html part, in a
+            single pass over the MIME parts, instead of the BeautifulSoup parser. Defaults to True.
+        parse_processes (int): Processes parsing the fetched messages, 0 or 1 parses them inline.
+            Defaults to 0.
+        batch_size (int): Number of messages fetched per batch request (at most 100). Defaults to 50.
+        max_retries (int): Retries of a message failing with a quota or server error. Defaults to 5.
+        sync (bool): Keep the messages in a local store and only fetch the changes since the last
+            load through the Gmail history API. Defaults to False.
+        max_in_flight (int): Fetched messages waiting to be parsed by lazy_load_data. Defaults to 200.
+        store_path (Optional[str]): Local message store, defaults to the `gmail_store` environment variable.
     """
 
     query: str = None
     use_iterative_parser: bool = False
+    fast_parser: bool = True
+    parse_processes: int = 0
     service: Any = None
     max_results: Optional[int] = None
     results_per_page: Optional[int] = None
+    batch_size: int = 50
+    max_retries: int = 5
+    max_in_flight: int = 200
+    sync: bool = False
+    store_path: Optional[str] = None
 
     def load_data(self) -> List[Document]:
         """Load emails from the user's account"""
+        return list(self.lazy_load_data())
+
+    def lazy_load_data(self) -> Iterable[Document]:
+        """
+        Load emails from the user's account lazily, listing, fetching and parsing them page by
+        page so at most max_in_flight messages are held in memory whatever the mailbox size.
+        """
         from googleapiclient.discovery import build
 
-        credentials = self._get_credentials()
         if not self.service:
-            self.service = build("gmail", "v1", credentials=credentials)
-
-        messsages = self.search_messages()
+            self.service = build("gmail", "v1", credentials=self._get_credentials())
 
-        results = []
-        for message in messsages:
+        messages = self.sync_messages() if self.sync else self.iter_messages()
+        for message in messages:
             text = message.pop("body")
-            extra_info = message
-            document = Document(text=text, extra_info=extra_info or {})
-            document.metadata = extra_info or {}
-            results.append(document)
-
-        return results
+            document = Document(id_=message["id"], text=text, extra_info=message)
+            document.metadata = message
+            yield document
 
     def _get_credentials(self) -> Any:
         """Get valid user credentials from storage.
@@ -89,79 +134,212 @@ class GmailReader(BaseReader, BaseModel):
         return creds
 
     def search_messages(self):
-        query = self.query
-
-        max_results = self.max_results
-        if self.results_per_page:
-            max_results = self.results_per_page
-
-        if(max_results):
-            results = (
-                self.service.users()
-                .messages()
-                .list(userId="me", q=query, maxResults=int(max_results))
-                .execute()
-            )
-            messages = results.get("messages", [])
-
-            if len(messages) < self.max_results:
-                # paginate if there are more results
-                while "nextPageToken" in results:
-                    page_token = results["nextPageToken"]
-                    results = (
-                        self.service.users()
-                        .messages()
-                        .list(
-                            userId="me",
-                            q=query,
-                            pageToken=page_token,
-                            maxResults=int(max_results),
-                        )
-                        .execute()
-                    )
-                    messages.extend(results["messages"])
-                    if len(messages) >= self.max_results:
-                        break
-        else:
-            results = (
-                self.service.users()
-                .messages()
-                .list(userId="me", q=query)
-                .execute()
-            )
-            messages = results.get("messages", [])
-
-            while "nextPageToken" in results:
-                page_token = results["nextPageToken"]
-                results = (
-                    self.service.users()
-                    .messages()
-                    .list(
-                        userId="me",
-                        q=query,
-                        pageToken=page_token
-                    )
-                    .execute()
-                )
-                messages.extend(results["messages"])
-
+        return list(tqdm(self.iter_messages(), unit="msg"))
 
+    def iter_messages(self):
+        """
+        Yield the parsed messages of the query as they are fetched. A background thread lists
+        and fetches the messages in batches while they are parsed here, up to max_in_flight
+        fetched messages waiting to be parsed. With parse_processes > 1, each batch is parsed
+        across a process pool.
+        """
+        batch_size = max(1, min(self.batch_size, MAX_BATCH_SIZE))
+        window = queue.Queue(maxsize=max(1, self.max_in_flight // batch_size))
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    window.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
 
-        result = []
-        logging.info(f"Total number of messages found {len(messages)}")
-        for i in tqdm(range(len(messages))):
-            message = messages[i]
+        def produce():
             try:
-                message_data = self.get_message_data(message)
-                if not message_data:
-                    continue
-                result.append(message_data)
+                for page in self._iter_message_pages(self.query, self.max_results):
+                    for batch in self.fetch_batches(page):
+                        if not put(("batch", batch)):
+                            return
+                put(("done", None))
             except Exception as e:
-                #logging.error(msg=f"Can't get message data {str(e)}, for message with id {message['id']}")
-                continue
+                put(("error", e))
 
+        pool = None
+        if self.parse_processes > 1 and self.fast_parser and not self.use_iterative_parser:
+            pool = ProcessPoolExecutor(self.parse_processes)
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                kind, item = window.get()
+                if kind == "done":
+                    break
+                if kind == "error":
+                    raise item
+                yield from self.parse_messages(item, pool)
+        finally:
+            stop.set()
+            producer.join()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    def _iter_message_pages(self, query, max_results=None):
+        """ Yield the message ids of the query one listing page at a time, up to max_results. """
+        kwargs = {"userId": "me", "q": query}
+        page_size = self.results_per_page or max_results
+        if page_size:
+            kwargs["maxResults"] = min(int(page_size), MAX_PAGE_SIZE)
+
+        remaining = max_results
+        request = self.service.users().messages().list(**kwargs)
+        while request is not None:
+            results = request.execute()
+            ids = [message["id"] for message in results.get("messages", [])]
+            if remaining is not None:
+                ids = ids[:remaining]
+                remaining -= len(ids)
+            if ids:
+                logging.info(f"Listed {len(ids)} messages")
+                yield ids
+            if remaining == 0:
+                break
+            request = self.service.users().messages().list_next(request, results)
+
+    def _fetch_parsed(self, message_ids):
+        result = []
+        with tqdm(total=len(message_ids)) as progress:
+            for batch in self.fetch_batches(message_ids, progress):
+                result.extend(self.parse_messages(batch))
         return result
 
+    def _list_ids(self, query):
+        for page in self._iter_message_pages(query):
+            yield from page
+
+    def sync_messages(self):
+        """
+        Bring the local store of the query up to date, then return an iterator over its
+        messages. The first sync downloads every message and writes them batch by batch, the
+        next ones replay the mailbox history since the stored historyId. Gmail keeps about a
+        week of history, an expired historyId (404) falls back to a full sync.
+        """
+        from googleapiclient.errors import HttpError
+        from alfred.tools.gmail_store import GmailStore
+
+        store = GmailStore(self.store_path)
+        query = self.query or ""
+        history_id, _ = store.state(query)
+        if history_id is not None:
+            try:
+                self._sync_history(store, query, history_id)
+                return store.messages(query)
+            except HttpError as e:
+                if e.resp.status != 404:
+                    raise
+                logging.info(f"History {history_id} expired, full sync of '{query}'")
+
+        # Taken before listing, changes made while downloading are replayed by the next sync
+        history_id = self.service.users().getProfile(userId="me").execute()["historyId"]
+        store.replace(query, tqdm(self.iter_messages(), unit="msg"), history_id)
+        return store.messages(query)
+
+    def _sync_history(self, store, query, history_id):
+        added, deleted, labels = {}, set(), {}
+        request = self.service.users().history().list(
+            userId="me", startHistoryId=history_id, historyTypes=list(HISTORY_TYPES)
+        )
+        while request is not None:
+            results = request.execute()
+            for record in results.get("history", []):
+                for kind in ("messagesAdded", "labelsAdded", "labelsRemoved"):
+                    for item in record.get(kind, []):
+                        message_id = item["message"]["id"]
+                        if kind == "messagesAdded":
+                            added[message_id] = None
+                        deleted.discard(message_id)
+                        labels[message_id] = item["message"].get("labelIds", [])
+                for item in record.get("messagesDeleted", []):
+                    added.pop(item["message"]["id"], None)
+                    labels.pop(item["message"]["id"], None)
+                    deleted.add(item["message"]["id"])
+            history_id = results.get("historyId", history_id)
+            request = self.service.users().history().list_next(request, results)
+
+        # The history is not filtered by query: a message added, trashed or relabeled since the
+        # last sync is kept when it matches the query now, and dropped from the store otherwise.
+        # Like messages.list, the whole mailbox leaves out SPAM and TRASH.
+        if query and labels:
+            matching = set(self._list_ids(query))
+        else:
+            matching = {message_id for message_id, ids in labels.items() if not HIDDEN_LABELS & set(ids)}
+        deleted |= set(labels) - matching
+        stored = store.stored_ids(query, matching)
+        fetch = [message_id for message_id in labels if message_id in matching and (message_id in added or message_id not in stored)]
+
+        logging.info(f"Sync of '{query}': {len(fetch)} added, {len(deleted)} deleted messages")
+        store.apply(query, self._fetch_parsed(fetch), deleted, history_id)
+
+    def fetch_messages(self, message_ids, progress=None):
+        """
+        Fetch raw messages through Gmail batch requests, retrying the messages failing with
+        a quota or server error with exponential backoff. Yields the messages of each batch
+        once it has completed.
+        """
+        for batch in self.fetch_batches(message_ids, progress):
+            yield from batch
+
+    def fetch_batches(self, message_ids, progress=None):
+        """ Same as fetch_messages, yielding the list of messages of each batch. """
+        batch_size = max(1, min(self.batch_size, MAX_BATCH_SIZE))
+        for start in range(0, len(message_ids), batch_size):
+            chunk = message_ids[start:start + batch_size]
+            fetched = self._execute_batch(chunk)
+            if progress is not None:
+                progress.update(len(chunk))
+            yield [fetched[message_id] for message_id in chunk if message_id in fetched]
+
+    def _execute_batch(self, message_ids):
+        fetched = {}
+        pending = list(message_ids)
+
+        for attempt in range(self.max_retries + 1):
+            retry = []
+
+            def callback(request_id, response, exception):
+                if exception is None:
+                    fetched[request_id] = response
+                elif is_retriable(exception):
+                    retry.append(request_id)
+                else:
+                    logging.warning(f"Can't get message {request_id}: {exception}")
+
+            batch = self.service.new_batch_http_request(callback=callback)
+            for message_id in pending:
+                batch.add(
+                    self.service.users().messages().get(format="raw", userId="me", id=message_id),
+                    request_id=message_id,
+                )
+            try:
+                batch.execute()
+            except Exception as e:
+                if not is_retriable(e):
+                    raise
+                retry = [message_id for message_id in pending if message_id not in fetched]
+
+            if not retry:
+                break
+            if attempt == self.max_retries:
+                logging.error(f"Giving up on {len(retry)} messages after {self.max_retries} retries")
+                break
+            delay = min(2 ** attempt, 32) + random.random()
+            logging.info(f"Gmail throttled {len(retry)} messages, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            pending = retry
+
+        return fetched
+
     def get_message_data(self, message):
         message_id = message["id"]
         message_data = (
@@ -170,10 +348,27 @@ class GmailReader(BaseReader, BaseModel):
             .get(format="raw", userId="me", id=message_id)
             .execute()
         )
-        if self.use_iterative_parser:
-            body = self.extract_message_body_iterative(message_data)
-        else:
-            body = self.extract_message_body(message_data)
+        return self.parse_message_data(message_data)
+
+    def parse_messages(self, messages_data, pool=None):
+        """ Parse a batch of fetched messages, across the processes of `pool` with the fast parser. """
+        if pool is None:
+            return [m for m in map(self.parse_message_data, messages_data) if m]
+        bodies = extract_message_texts(messages_data, pool)
+        return [m for m in map(self.parse_message_data, messages_data, bodies) if m]
+
+    def parse_message_data(self, message_data, body=None):
+        if body is None:
+            try:
+                if self.use_iterative_parser:
+                    body = self.extract_message_body_iterative(message_data)
+                elif self.fast_parser:
+                    body = extract_message_text(message_data)
+                else:
+                    body = self.extract_message_body(message_data)
+            except Exception as e:
+                logging.debug(f"Can't parse message {message_data.get('id')}: {e}")
+                return None
 
         if not body:
             return None
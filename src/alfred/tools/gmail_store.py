@@ -0,0 +1,129 @@
+"""Local store of synced Gmail messages.
+
+Parsed messages are kept per query in SQLite together with the mailbox historyId they
+are current as of, so the next sync only has to replay the Gmail history since then.
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+GMAIL_STORE = os.path.join(os.path.expanduser("~"), ".cache", "alfred", "gmail.sqlite")
+# Messages written or read per statement, bounding the memory of a sync
+PAGE_SIZE = 500
+
+
+class GmailStore:
+    """SQLite backed store of parsed Gmail messages.
+
+    Args:
+        path (str): Database file. Defaults to the `gmail_store` environment variable.
+    """
+
+    def __init__(self, path=None):
+        path = path or os.getenv("gmail_store", GMAIL_STORE)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                query TEXT NOT NULL, id TEXT NOT NULL, internal_date INTEGER NOT NULL, message TEXT NOT NULL,
+                PRIMARY KEY (query, id)
+            );
+            CREATE TABLE IF NOT EXISTS sync (
+                query TEXT PRIMARY KEY, history_id TEXT NOT NULL, synced REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def state(self, query):
+        """Return the (history_id, synced timestamp) of the last sync of a query, or (None, None)."""
+        with self._lock:
+            row = self._conn.execute("SELECT history_id, synced FROM sync WHERE query = ?", (query,)).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def _put(self, query, messages):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO messages (query, id, internal_date, message) VALUES (?, ?, ?, ?)",
+            [(query, m["id"], int(m.get("internalDate") or 0), json.dumps(m)) for m in messages],
+        )
+
+    def _mark(self, query, history_id):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sync (query, history_id, synced) VALUES (?, ?, ?)",
+            (query, str(history_id), time.time()),
+        )
+
+    def replace(self, query, messages, history_id):
+        """Replace every stored message of a query after a full sync.
+
+        The messages are consumed and written PAGE_SIZE at a time, in a single transaction
+        committed once they are all written.
+        """
+        messages = iter(messages)
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE query = ?", (query,))
+        try:
+            while page := list(itertools.islice(messages, PAGE_SIZE)):
+                with self._lock:
+                    self._put(query, page)
+        except BaseException:
+            with self._lock:
+                self._conn.rollback()
+            raise
+        with self._lock:
+            self._mark(query, history_id)
+            self._conn.commit()
+
+    def apply(self, query, added, deleted, history_id):
+        """Apply the changes of an incremental sync, in a single transaction."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM messages WHERE query = ? AND id = ?", [(query, i) for i in deleted]
+            )
+            self._put(query, added)
+            self._mark(query, history_id)
+            self._conn.commit()
+
+    def stored_ids(self, query, ids):
+        """The ids of `ids` already stored for a query."""
+        ids = list(ids)
+        stored = set()
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT id FROM messages WHERE query = ? AND id IN ({', '.join('?' * len(chunk))})",
+                    (query, *chunk),
+                )
+                stored.update(row[0] for row in rows)
+        return stored
+
+    def messages(self, query):
+        """Yield the stored messages of a query, most recent first like messages.list.
+
+        Rows are read PAGE_SIZE at a time, keyed on the last (internal_date, id) read.
+        """
+        sql = "SELECT internal_date, id, message FROM messages WHERE query = ?"
+        params = (query,)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"{sql} ORDER BY internal_date DESC, id DESC LIMIT {PAGE_SIZE}", params
+                ).fetchall()
+            yield from (json.loads(row[2]) for row in rows)
+            if len(rows) < PAGE_SIZE:
+                return
+            internal_date, message_id = rows[-1][:2]
+            sql = "SELECT internal_date, id, message FROM messages WHERE query = ? AND (internal_date, id) < (?, ?)"
+            params = (query, internal_date, message_id)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
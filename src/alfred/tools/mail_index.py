@@ -0,0 +1,261 @@
+"""Vector index of Gmail messages.
+
+Messages read by GmailReader are split into chunks, embedded in batches and added to a
+Chroma or Milvus collection. The content hash of every indexed message is kept in
+SQLite, so re-ingesting a mailbox only embeds the messages that are new or changed. The
+hashes are kept per vector store, collection and embedding model, so switching any of them
+indexes the mailbox again into the new target.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import List
+
+import click
+from llama_index.core import Settings
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from alfred.utils.batch_embedding import embed_texts
+from alfred.utils.tool_spec import AsyncToolSpec
+
+MAIL_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "alfred", "mail_index")
+MAIL_COLLECTION = "gmail"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def index_scope(vector_store, embed_model):
+    """Key of the content hashes: the messages indexed in one collection with one embedding model."""
+    collection = getattr(vector_store, "collection_name", None) or MAIL_COLLECTION
+    return f"{vector_store.class_name()}/{collection}/{embed_model.model_name}"
+
+
+def mail_vector_store(backend=None, index_dir=None, dimension=1024):
+    """
+    Vector store of the mail index: a persistent Chroma collection, or a Milvus collection
+    (Milvus Lite file unless `milvus_uri` points at a server).
+    """
+    backend = backend or os.getenv("mail_vector_store", "chroma")
+    index_dir = index_dir or os.getenv("mail_index_dir", MAIL_INDEX_DIR)
+    os.makedirs(index_dir, exist_ok=True)
+
+    if backend == "chroma":
+        import chromadb
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        client = chromadb.PersistentClient(path=os.path.join(index_dir, "chroma"))
+        return ChromaVectorStore(chroma_collection=client.get_or_create_collection(MAIL_COLLECTION))
+    if backend == "milvus":
+        from llama_index.vector_stores.milvus import MilvusVectorStore
+
+        uri = os.getenv("milvus_uri", os.path.join(index_dir, "milvus.db"))
+        return MilvusVectorStore(uri=uri, collection_name=MAIL_COLLECTION, dim=dimension, overwrite=False)
+    raise ValueError(f"Unknown mail vector store {backend}, expected chroma or milvus.")
+
+
+class MailIndex:
+    """Incrementally updated vector index of Gmail Documents.
+
+    Args:
+        vector_store: Vector store holding the chunks, e.g. from mail_vector_store().
+        embed_model: Embedding model. Defaults to Settings.embed_model.
+        index_dir (str): Directory of the content hash database. Defaults to the `mail_index_dir`
+            environment variable.
+        scope (str): Key of the content hashes. Defaults to index_scope(vector_store, embed_model).
+        chunk_size (int): Tokens per chunk. Defaults to 512.
+        chunk_overlap (int): Tokens shared by consecutive chunks. Defaults to 64.
+    """
+
+    def __init__(self, vector_store, embed_model=None, index_dir=None, chunk_size=512, chunk_overlap=64, scope=None):
+        self.vector_store = vector_store
+        self.embed_model = embed_model or Settings.embed_model
+        self.scope = scope or index_scope(self.vector_store, self.embed_model)
+        self.splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+        index_dir = index_dir or os.getenv("mail_index_dir", MAIL_INDEX_DIR)
+        os.makedirs(index_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(index_dir, "messages.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS indexed_messages (scope TEXT NOT NULL, id TEXT NOT NULL, hash TEXT NOT NULL, "
+            "chunks INTEGER NOT NULL, updated REAL NOT NULL, PRIMARY KEY (scope, id))"
+        )
+        self._conn.commit()
+
+    def _hashes(self, message_ids):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, hash FROM indexed_messages WHERE scope = ? AND id IN ({','.join('?' * len(message_ids))})",
+                [self.scope, *message_ids],
+            ).fetchall()
+        return dict(rows)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM indexed_messages WHERE scope = ?", (self.scope,)).fetchone()[0]
+
+    def ingest(self, documents, batch_size=256):
+        """
+        Index GmailReader Documents, e.g. `GmailReader(...).lazy_load_data()`, keyed by message id.
+        Unchanged messages are skipped, changed ones have their previous chunks replaced.
+        Returns the number of added, updated and unchanged messages and of embedded chunks.
+        """
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "chunks": 0}
+        documents = iter(documents)
+        while batch := list(islice(documents, batch_size)):
+            self._ingest_batch(batch, stats)
+        logging.info(f"Mail index: {stats}")
+        return stats
+
+    def _ingest_batch(self, documents, stats):
+        # The last version of a message wins when it appears twice
+        latest = {document.doc_id: document for document in documents}
+        known = self._hashes(list(latest))
+
+        changed = []
+        for message_id, document in latest.items():
+            digest = content_hash(document.text)
+            if known.get(message_id) == digest:
+                stats["unchanged"] += 1
+                continue
+            if message_id in known:
+                self.vector_store.delete(ref_doc_id=message_id)
+                stats["updated"] += 1
+            else:
+                stats["added"] += 1
+            # Only the body is embedded, the ids and dates are kept as metadata
+            document.excluded_embed_metadata_keys = list(document.metadata)
+            document.excluded_llm_metadata_keys = ["id", "threadId", "internalDate"]
+            changed.append((document, digest))
+        if not changed:
+            return
+
+        nodes = self.splitter.get_nodes_from_documents([document for document, _ in changed])
+        embeddings = embed_texts(self.embed_model, [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes])
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        if nodes:
+            self.vector_store.add(nodes)
+        stats["chunks"] += len(nodes)
+
+        chunks = {}
+        for node in nodes:
+            chunks[node.ref_doc_id] = chunks.get(node.ref_doc_id, 0) + 1
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO indexed_messages (scope, id, hash, chunks, updated) VALUES (?, ?, ?, ?, ?)",
+                [(self.scope, d.doc_id, digest, chunks.get(d.doc_id, 0), time.time()) for d, digest in changed],
+            )
+            self._conn.commit()
+
+    def remove(self, message_ids):
+        """Drop messages from the index, e.g. the ones deleted from the mailbox."""
+        for message_id in message_ids:
+            self.vector_store.delete(ref_doc_id=message_id)
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM indexed_messages WHERE scope = ? AND id = ?", [(self.scope, i) for i in message_ids]
+            )
+            self._conn.commit()
+
+    def search(self, query, k=5):
+        """Return the k messages with the chunks closest to the query, best first."""
+        embedding = self.embed_model.get_query_embedding(query)
+        return self._matches(self.vector_store.query(self._query(embedding, k)), k)
+
+    async def asearch(self, query, k=5):
+        embedding = await self.embed_model.aget_query_embedding(query)
+        return self._matches(await self.vector_store.aquery(self._query(embedding, k)), k)
+
+    @staticmethod
+    def _query(embedding, k):
+        # Several chunks of a message may rank first, ask for more to still return k messages
+        return VectorStoreQuery(query_embedding=embedding, similarity_top_k=k * 3)
+
+    @staticmethod
+    def _matches(result, k):
+        matches = {}
+        for node, score in zip(result.nodes or [], result.similarities or []):
+            message_id = node.ref_doc_id or node.metadata.get("id")
+            if message_id in matches:
+                continue
+            internal_date = node.metadata.get("internalDate")
+            matches[message_id] = {
+                "id": message_id,
+                "threadId": node.metadata.get("threadId"),
+                "date": datetime.fromtimestamp(int(internal_date) / 1000, tz=timezone.utc).isoformat()
+                if internal_date
+                else None,
+                "score": round(float(score), 4),
+                "text": node.get_content(),
+            }
+            if len(matches) == k:
+                break
+        return list(matches.values())
+
+
+def default_mail_index(backend=None):
+    """
+    Mail index of the `mail_vector_store` backend, embedded with the `embed_provider` model
+    through the embedding cache, in a collection of the dimension of that model.
+    """
+    from alfred.utils.common import get_embedding
+    from alfred.utils.embedding_cache import cache_embeddings
+
+    embed_model, dimension = get_embedding()
+    return MailIndex(mail_vector_store(backend, dimension=dimension), cache_embeddings(embed_model, dimension))
+
+
+class MailSearchToolSpec(AsyncToolSpec):
+    """Semantic search over the indexed Gmail messages."""
+
+    spec_functions = [("search_mail", "asearch_mail")]
+
+    def __init__(self, index: MailIndex = None):
+        self._index = index
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = default_mail_index()
+        return self._index
+
+    def search_mail(self, query: str, k: int = 5) -> List[dict]:
+        """
+        Search the user's emails. Returns the k most relevant messages with their id, thread id,
+        date, relevance score and the matching excerpt.
+        """
+        return self.index.search(query, int(k))
+
+    async def asearch_mail(self, query: str, k: int = 5) -> List[dict]:
+        return await self.index.asearch(query, int(k))
+
+
+@click.command()
+@click.option("-q", "--query", help="Gmail query of the messages to index", type=str, default="")
+@click.option("-b", "--backend", help="Vector store", type=click.Choice(["chroma", "milvus"]), default=None)
+@click.option("--sync", help="Read the mailbox through the local Gmail store", is_flag=True)
+def ingest(query: str, backend: str, sync: bool):
+    from alfred.tools.gmail_reader import GmailReader
+    from alfred.utils.common import configure_logging, load_environment_variables
+
+    configure_logging(level=logging.INFO)
+    load_environment_variables()
+    index = default_mail_index(backend)
+    stats = index.ingest(GmailReader(query=query, sync=sync).lazy_load_data())
+    print(f"Indexed {stats['added']} new and {stats['updated']} changed messages, {stats['unchanged']} unchanged.")
+
+
+if __name__ == "__main__":
+    ingest()
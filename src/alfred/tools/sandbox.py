@@ -0,0 +1,397 @@
+"""Pool of warm sandboxes for the code interpreter.
+
+Each sandbox runs sandbox_runner.py, a Python process that executes the snippets it
+receives on its stdin and keeps their state, either in a container (docker backend) or
+as a resource limited local process in a temporary directory (local backend). Sandboxes
+are started ahead of time, a conversation keeps the same one across calls, and a sandbox
+is replaced after `max_runs` snippets, a timeout or a crash. Both backends can read the
+artifacts directory, where the tools save the results the snippets load by name.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import select
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from alfred.utils.artifacts import artifacts_dir
+
+RUNNER_PATH = os.path.join(os.path.dirname(__file__), "sandbox_runner.py")
+# Defaults of the code_interpreter_* environment variables, read when the pools and
+# sandboxes are created so that the values of .env apply
+SANDBOX_BACKEND = "docker"
+SANDBOX_IMAGE = "python:3.10-alpine"
+POOL_SIZE = 2
+MAX_RUNS = 50
+MAX_SESSIONS = 8
+RUN_TIMEOUT = 30.0
+MEMORY_MB = 2048
+# Characters of output handed back to the agent
+MAX_OUTPUT = 20000
+
+
+def _setting(name, default):
+    """The code_interpreter_<name> environment variable, of the type of its default."""
+    return type(default)(os.getenv(f"code_interpreter_{name}", default))
+
+
+class SandboxError(RuntimeError):
+    """The sandbox died or stopped answering, its state is lost."""
+
+
+class RunnerSession:
+    """
+    A sandbox_runner.py process. Subclasses provide the transport: _send() writes bytes
+    to the runner stdin, _read() returns the next bytes of its stdout, or b"" at the end.
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self._pending = b""
+
+    def _send(self, data):
+        raise NotImplementedError
+
+    def _read(self, timeout):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def _readline(self, deadline):
+        while b"\n" not in self._pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            data = self._read(remaining)
+            if not data:
+                raise SandboxError("The sandbox exited.")
+            self._pending += data
+        line, self._pending = self._pending.split(b"\n", 1)
+        return line
+
+    def execute(self, code, timeout=None, on_output=None):
+        """
+        Run a snippet, returns {"stdout", "stderr", "error", "timed_out"}. on_output(stream, text)
+        is called with the output as it is produced. The timeout defaults to `code_interpreter_timeout`.
+        """
+        timeout = timeout or _setting("timeout", RUN_TIMEOUT)
+        self.runs += 1
+        request_id = uuid.uuid4().hex
+        self._send((json.dumps({"id": request_id, "code": code}) + "\n").encode())
+
+        result = {"stdout": [], "stderr": [], "error": None, "timed_out": False}
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                event = json.loads(self._readline(deadline))
+                if event.get("id") != request_id:
+                    continue
+                if event.get("done"):
+                    result["error"] = event.get("error")
+                    break
+                result[event["stream"]].append(event["text"])
+                if on_output is not None:
+                    on_output(event["stream"], event["text"])
+        except TimeoutError:
+            result["timed_out"] = True
+        result["stdout"] = "".join(result["stdout"])
+        result["stderr"] = "".join(result["stderr"])
+        return result
+
+
+class DockerSession(RunnerSession):
+    """A runner in a container, reached through the attached stdin and stdout of the container."""
+
+    def __init__(self, client=None, image=None, memory_mb=None):
+        import docker
+
+        super().__init__()
+        image = image or _setting("image", SANDBOX_IMAGE)
+        memory_mb = memory_mb or _setting("memory_mb", MEMORY_MB)
+        client = client or docker.from_env()
+        self.container = client.containers.run(
+            image,
+            command=["python", "-u", "-c", runner_source()],
+            stdin_open=True,
+            detach=True,
+            auto_remove=True,
+            working_dir="/tmp",
+            mem_limit=f"{memory_mb}m",
+            volumes={artifacts_dir(): {"bind": "/artifacts", "mode": "ro"}},
+            environment={"artifacts_dir": "/artifacts"},
+        )
+        attached = self.container.attach_socket(params={"stdin": 1, "stdout": 1, "stream": 1})
+        self._socket = getattr(attached, "_sock", attached)
+        self._frame = b""
+
+    def _send(self, data):
+        self._socket.sendall(data)
+
+    def _recv_exact(self, size, timeout):
+        self._socket.settimeout(timeout)
+        while len(self._frame) < size:
+            try:
+                chunk = self._socket.recv(max(size - len(self._frame), 65536))
+            except socket.timeout:
+                raise TimeoutError
+            if not chunk:
+                return b""
+            self._frame += chunk
+        data, self._frame = self._frame[:size], self._frame[size:]
+        return data
+
+    def _read(self, timeout):
+        # Without a tty the attached streams are multiplexed: an 8 bytes header
+        # (stream, 0, 0, 0, big endian size) precedes every frame
+        header = self._recv_exact(8, timeout)
+        if not header:
+            return b""
+        _, size = struct.unpack(">BxxxL", header)
+        return self._recv_exact(size, timeout)
+
+    def close(self):
+        try:
+            self._socket.close()
+            self.container.kill()
+        except Exception as e:
+            logging.debug(f"Can't stop sandbox {self.container.short_id}: {e}")
+
+
+class LocalSession(RunnerSession):
+    """
+    A runner in a local process, for hosts without Docker. It is not isolated from the host
+    like a container: it runs in a temporary working directory, removed when the session
+    closes, with limits on its memory, file sizes and open files.
+    """
+
+    def __init__(self, memory_mb=None, max_file_mb=100, max_files=256):
+        super().__init__()
+        self.memory_mb = memory_mb or _setting("memory_mb", MEMORY_MB)
+        self.max_file_mb = max_file_mb
+        self.max_files = max_files
+        self.workdir = tempfile.mkdtemp(prefix="alfred-sandbox-")
+        # The limits are set by the runner itself before it reads any snippet: a preexec_fn
+        # is not safe in a process with threads, like the agent server
+        limits = (self.memory_mb * 1024 * 1024, self.max_file_mb * 1024 * 1024, self.max_files, 0)
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", "-c", LIMITS_SOURCE + runner_source(), *map(str, limits)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=self.workdir,
+            env=self._environment(),
+            # Own process group, so the programs started by a snippet are stopped with it
+            start_new_session=True,
+        )
+
+    def _environment(self):
+        # Only what Python needs: the snippets are written by the LLM and must not see the
+        # API keys and OAuth paths loaded from .env into os.environ
+        return {
+            "PATH": os.environ.get("PATH", os.defpath),
+            "HOME": self.workdir,
+            "TMPDIR": self.workdir,
+            "LANG": os.environ.get("LANG", "C.UTF-8"),
+            "artifacts_dir": artifacts_dir(),
+        }
+
+    def _send(self, data):
+        try:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            raise SandboxError("The sandbox exited.")
+
+    def _read(self, timeout):
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            raise TimeoutError
+        return os.read(self.process.stdout.fileno(), 65536)
+
+    def close(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+BACKENDS = {"docker": DockerSession, "local": LocalSession}
+
+
+# Prepended to the runner of a LocalSession, sets the limits passed as its arguments:
+# address space, file size, open files and core size
+LIMITS_SOURCE = """import resource, sys
+for _limit, _value in zip(
+    (resource.RLIMIT_AS, resource.RLIMIT_FSIZE, resource.RLIMIT_NOFILE, resource.RLIMIT_CORE), map(int, sys.argv[1:5])
+):
+    resource.setrlimit(_limit, (_value, _value))
+del _limit, _value, sys.argv[1:5]
+"""
+
+
+def runner_source():
+    with open(RUNNER_PATH, "r") as file:
+        return file.read()
+
+
+class SandboxPool:
+    """Warm sandboxes, assigned to sessions on their first run.
+
+    Args:
+        factory (callable): Starts a new RunnerSession. Defaults to the session class of the
+            `code_interpreter_backend` environment variable, docker or local.
+        size (int): Idle sandboxes kept ready. Defaults to the `code_interpreter_pool_size` environment variable.
+        max_runs (int): Snippets run by a sandbox before it is replaced. Defaults to `code_interpreter_max_runs`.
+        max_sessions (int): Sessions kept alive, the least recently used one is closed beyond.
+            Defaults to `code_interpreter_max_sessions`.
+    """
+
+    def __init__(self, factory=None, size=None, max_runs=None, max_sessions=None):
+        if factory is None:
+            backend = _setting("backend", SANDBOX_BACKEND)
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown code interpreter backend {backend}, expected one of {list(BACKENDS)}.")
+            factory = BACKENDS[backend]
+        self.factory = factory
+        self.size = _setting("pool_size", POOL_SIZE) if size is None else size
+        self.max_runs = max_runs or _setting("max_runs", MAX_RUNS)
+        self.max_sessions = max_sessions or _setting("max_sessions", MAX_SESSIONS)
+        self._idle = queue.Queue()
+        self._starting = 0
+        self._sessions = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._starter = ThreadPoolExecutor(max_workers=max(1, self.size), thread_name_prefix="sandbox")
+        self._refill()
+
+    def _start(self):
+        try:
+            self._idle.put(self.factory())
+        except Exception as e:
+            logging.error(f"Can't start a sandbox: {e}")
+        finally:
+            with self._lock:
+                self._starting -= 1
+
+    def _refill(self):
+        with self._lock:
+            missing = self.size - self._idle.qsize() - self._starting
+            self._starting += max(0, missing)
+        for _ in range(missing):
+            self._starter.submit(self._start)
+
+    def _acquire(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions.move_to_end(session_id)
+                return self._sessions[session_id], self._locks[session_id]
+        try:
+            sandbox = self._idle.get_nowait()
+        except queue.Empty:
+            sandbox = self.factory()
+        self._refill()
+
+        evicted = []
+        with self._lock:
+            if session_id in self._sessions:
+                # Another thread started this session meanwhile, keep the sandbox for the next one
+                self._idle.put(sandbox)
+                return self._sessions[session_id], self._locks[session_id]
+            self._sessions[session_id] = sandbox
+            lock = self._locks[session_id] = threading.Lock()
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._drop(next(iter(self._sessions))))
+        for old in evicted:
+            old.close()
+        return sandbox, lock
+
+    def _drop(self, session_id):
+        self._locks.pop(session_id, None)
+        return self._sessions.pop(session_id)
+
+    def run(self, session_id, code, timeout=None, on_output=None):
+        """
+        Run a snippet in the sandbox of a session, returns {"stdout", "stderr", "error", "timed_out",
+        "restarted"}, `restarted` telling that the sandbox was replaced and its state is lost.
+        """
+        sandbox, lock = self._acquire(session_id)
+        with lock:
+            try:
+                result = sandbox.execute(code, timeout, on_output)
+            except SandboxError as e:
+                result = {"stdout": "", "stderr": "", "error": str(e), "timed_out": False}
+                result["restarted"] = True
+            else:
+                result["restarted"] = result["timed_out"] or sandbox.runs >= self.max_runs
+
+        if result["restarted"]:
+            with self._lock:
+                if self._sessions.get(session_id) is sandbox:
+                    self._drop(session_id)
+            sandbox.close()
+        return result
+
+    def close_session(self, session_id):
+        with self._lock:
+            sandbox = self._drop(session_id) if session_id in self._sessions else None
+        if sandbox is not None:
+            sandbox.close()
+
+    def close(self):
+        """Stop every sandbox, idle or in use."""
+        self._starter.shutdown(wait=True)
+        with self._lock:
+            sandboxes = list(self._sessions.values())
+            self._sessions.clear()
+            self._locks.clear()
+        while not self._idle.empty():
+            sandboxes.append(self._idle.get_nowait())
+        for sandbox in sandboxes:
+            sandbox.close()
+
+
+def format_result(result):
+    """Render a run result as the text handed back to the agent."""
+    output = result["stdout"]
+    if result["stderr"]:
+        output += f"\n[stderr]\n{result['stderr']}"
+    if result["error"]:
+        output += f"\n{result['error']}"
+    if result["timed_out"]:
+        output += "\nError: the code did not finish in time and was stopped."
+    if result.get("restarted"):
+        output += "\n(The interpreter was restarted, variables and imports of previous runs are gone.)"
+    if len(output) > MAX_OUTPUT:
+        output = output[:MAX_OUTPUT] + f"\n... {len(output) - MAX_OUTPUT} more characters truncated"
+    return output.strip()
+
+
+_lock = threading.Lock()
+_pool = None
+
+
+def get_pool():
+    """Process-wide sandbox pool, started on first use."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = SandboxPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,132 @@
+"""Long-lived Python process running the code interpreter snippets of one session.
+
+Reads one JSON request per line on stdin, {"id": ..., "code": ...}, runs the code in a
+namespace kept from one request to the next and writes JSON events, one per line, on
+stdout: {"id": ..., "stream": "stdout" | "stderr", "text": ...} while the code runs, then
+{"id": ..., "done": true, "error": <traceback or null>}. When the last statement is an
+expression its value is printed, like in a REPL.
+
+The snippets can call load_artifact(name) and list_artifacts() to read the artifacts the
+tools saved in the directory of the `artifacts_dir` environment variable.
+
+It runs inside the sandbox, so it only uses the standard library.
+"""
+
+import ast
+import io
+import json
+import os
+import sys
+import traceback
+
+FLUSH_SIZE = 4096
+ARTIFACT_FORMATS = ("json", "npz")
+
+
+class _Stream(io.TextIOBase):
+    """Forwards what the snippet prints as events, a line at a time."""
+
+    def __init__(self, emit, name):
+        self.emit = emit
+        self.name = name
+        self.buffer_ = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text:
+            self.buffer_.append(text)
+            self.size += len(text)
+            if "\n" in text or self.size >= FLUSH_SIZE:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.buffer_:
+            self.emit({"stream": self.name, "text": "".join(self.buffer_)})
+            self.buffer_, self.size = [], 0
+
+
+def list_artifacts():
+    """Names of the artifacts saved by the tools."""
+    directory = os.environ.get("artifacts_dir")
+    if not directory or not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.splitext(entry)[0]
+        for entry in os.listdir(directory)
+        if not entry.startswith(".") and entry.rsplit(".", 1)[-1] in ARTIFACT_FORMATS
+    )
+
+
+def load_artifact(name):
+    """Load an artifact saved by a tool: JSON data, or a dict of NumPy arrays (a single array) for .npz files."""
+    path = os.path.join(os.environ.get("artifacts_dir", ""), os.path.basename(str(name)))
+    if os.path.exists(f"{path}.npz"):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError(f"Artifact {name} is a NumPy file, install numpy to load it.")
+        with numpy.load(f"{path}.npz", allow_pickle=False) as arrays:
+            if list(arrays.keys()) == ["array"]:
+                return arrays["array"]
+            return {key: arrays[key] for key in arrays.keys()}
+    try:
+        with open(f"{path}.json", "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        raise KeyError(f"No artifact named {name}, available: {list_artifacts()}") from None
+
+
+def run(code, namespace, emit):
+    stdout, stderr = _Stream(emit, "stdout"), _Stream(emit, "stderr")
+    sys.stdout, sys.stderr, sys.stdin = stdout, stderr, io.StringIO()
+    error = None
+    try:
+        tree = ast.parse(code, "<cell>", "exec")
+        last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+        exec(compile(tree, "<cell>", "exec"), namespace)
+        if last is not None:
+            value = eval(compile(ast.Expression(last.value), "<cell>", "eval"), namespace)
+            if value is not None:
+                print(repr(value))
+    except BaseException as e:
+        if isinstance(e, SystemExit) and e.code in (None, 0):
+            pass
+        else:
+            # Drop the frame of this function from the traceback
+            error = "".join(traceback.format_exception(type(e), e, e.__traceback__.tb_next))
+    finally:
+        stdout.flush()
+        stderr.flush()
+        sys.stdout, sys.stderr, sys.stdin = sys.__stdout__, sys.__stderr__, sys.__stdin__
+    return error
+
+
+def main():
+    # The protocol keeps private copies of stdin and stdout, the snippets (and the programs
+    # they start) read an empty stdin and anything they write on file descriptor 1 goes to stderr
+    requests = os.fdopen(os.dup(0), "r")
+    events = os.fdopen(os.dup(1), "w", buffering=1)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(2, 1)
+
+    namespace = {"__name__": "__main__", "load_artifact": load_artifact, "list_artifacts": list_artifacts}
+    for line in requests:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+
+        def emit(event):
+            event["id"] = request["id"]
+            events.write(json.dumps(event) + "\n")
+
+        error = run(request["code"], namespace, emit)
+        emit({"done": True, "error": error})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,28 @@
-import pickle
 import click
 import asyncio
 from alfred.tools.flight_assistant import FlightAssistantTool
+from alfred.tools.code_interpreter import CodeInterpreterToolSpec
 from alfred.tools.exchange_rate import ExchangeRateTool
 from alfred.utils.base_agent import BaseAgent
-from alfred.utils.common import save_context, load_context
+from alfred.utils.common import load_environment_variables
+from alfred.utils.agent_client import ask_server
+from alfred.utils.conversation_store import ConversationStore, run_turn
 
-from llama_index.core.workflow import (
-    Context,
-    JsonSerializer,
-    JsonPickleSerializer,
-)
-
-import os
+from llama_index.core import Settings
 
 class TravelAssistant(BaseAgent):
-    def __init__(self, model_name):
-        super().__init__('prompts/flightassistant_prompt.MD', model_name)
+    def __init__(self, model_name, agent_type=None):
+        super().__init__('prompts/flightassistant_prompt.MD', model_name, agent_type)
 
     def prepare_chat(self):
         flight_tool = FlightAssistantTool()
         exchange_rate_spec = ExchangeRateTool()
+        # Loads the results the other tools save with save_as
+        code_interpreter_spec = CodeInterpreterToolSpec()
         tools = []
         tools.extend(flight_tool.to_tool_list())
         tools.extend(exchange_rate_spec.to_tool_list())
+        tools.extend(code_interpreter_spec.to_tool_list())
 
         return super().prepare_chat(
             agent_name="flightassistant",
@@ -31,21 +30,21 @@ class TravelAssistant(BaseAgent):
             tools=tools
         )
 
-async def run_command(question: str = None, memory: bool = False, model_name: str = 'llama3.1'):
-    broker = TravelAssistant(model_name)
-    workflow = broker.prepare_chat()
-    ctx = None
-    CTX_PKL = 'ctx_travel_assistant.pkl'
+async def run_command(question: str = None, memory: bool = False, model_name: str = 'llama3.1', server: str = None,
+                      session: str = 'travelassistant', agent_type: str = None):
+    if server is not None:
+        # Memory is the server session of the agent, kept across questions.
+        # --server without a value is the `agent_server` address of .env
+        load_environment_variables()
+        return await ask_server(question, 'travelassistant', session=session if memory else None, address=server or None)
 
-    if memory:
-        ctx = load_context(workflow, CTX_PKL)
-
-    handler = workflow.run(ctx=ctx, user_msg=question)
-    response = await handler
+    broker = TravelAssistant(model_name, agent_type)
+    workflow = broker.prepare_chat()
 
     if memory:
-        save_context(handler, CTX_PKL)
+        return await run_turn(workflow, ConversationStore(), session, question, llm=Settings.llm)
 
+    response = await workflow.run(user_msg=question)
     return str(response)
 
 
@@ -53,9 +52,14 @@ async def run_command(question: str = None, memory: bool = False, model_name: st
 @click.command()
 @click.argument('question')
 @click.option('-s', '--store', help='Use memory to store context', type=bool, is_flag=True)
+@click.option('--session', help='Name of the conversation kept with --store', type=str, default='travelassistant')
 @click.option('-m', '--model', help='The model name', type=str)
-def ask(question: str, store: bool, model: str = 'llama3.1'):
-    result = asyncio.run(run_command(question, store, model))
+@click.option('-t', '--agent-type', help='react, function (native tool calling) or auto, default agent_type or auto',
+              type=click.Choice(['react', 'function', 'auto']))
+@click.option('--server', help='Ask the agent server at this address (host:port or socket path) instead',
+              type=str, is_flag=False, flag_value='', default=None)
+def ask(question: str, store: bool, session: str, model: str = 'llama3.1', agent_type: str = None, server: str = None):
+    result = asyncio.run(run_command(question, store, model, server, session, agent_type))
     print(result)
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+"""Client of the agent server, see alfred.server.
+
+The server reads one JSON request per line, {"id": ..., "agent": ..., "session": ..., "question": ...},
+and answers each one with a line {"id": ..., "response": ...} or {"id": ..., "error": ...}.
+Requests with the same session share the conversation context, a null session gets a new one.
+"""
+
+import asyncio
+import json
+import os
+
+# Default of the agent_server environment variable
+SERVER_ADDRESS = "127.0.0.1:8765"
+# Longest line read on either side, the default of asyncio streams (64 KiB) is too short for answers
+LINE_LIMIT = 16 * 1024 * 1024
+
+
+def server_address(address=None):
+    """address, or the `agent_server` environment variable, read on every call so that the value of .env applies."""
+    return address or os.getenv("agent_server", SERVER_ADDRESS)
+
+
+def is_unix_socket(address):
+    """host:port addresses are TCP, anything with a slash or ending in .sock is a Unix socket path."""
+    return "/" in address or address.endswith(".sock")
+
+
+def tcp_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+async def open_connection(address=None):
+    address = server_address(address)
+    if is_unix_socket(address):
+        return await asyncio.open_unix_connection(address, limit=LINE_LIMIT)
+    return await asyncio.open_connection(*tcp_address(address), limit=LINE_LIMIT)
+
+
+async def ask_server(question, agent, session=None, address=None):
+    """
+    Ask a question to an agent of the server, in a session keeping the conversation, returns the answer.
+    The address defaults to the `agent_server` environment variable.
+    """
+    address = server_address(address)
+    reader, writer = await open_connection(address)
+    try:
+        request = {"id": 0, "agent": agent, "session": session, "question": question}
+        writer.write((json.dumps(request) + "\n").encode())
+        await writer.drain()
+        line = await reader.readline()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+    if not line:
+        raise ConnectionError(f"The agent server at {address} closed the connection.")
+    reply = json.loads(line)
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    return reply["response"]
@@ -0,0 +1,63 @@
+"""Agent workflow running the tool calls of a step concurrently.
+
+A function calling agent can ask for several tools in one step, e.g. a stock quote and an
+exchange rate, where a ReAct agent needs one LLM step per tool. AgentWorkflow runs at most
+4 of them at once (the default workers of a step) and waits for the slowest one however
+long it takes; ParallelAgentWorkflow runs up to `agent_tool_concurrency` of them at once,
+each with its own timeout, and the agent gets all the results in its next step. Sync tools
+run in the executor of the event loop (FunctionTool wraps them), so they overlap too.
+"""
+
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+from llama_index.core.agent.workflow import AgentWorkflow
+from llama_index.core.agent.workflow.workflow_events import ToolCall, ToolCallResult
+from llama_index.core.tools import ToolOutput
+from llama_index.core.workflow import Context, step
+
+# The workers of a step are fixed when the class is defined, so agent_tool_concurrency is read
+# at import, after loading .env; set it before importing this module to change it
+load_dotenv()
+TOOL_CONCURRENCY = int(os.getenv("agent_tool_concurrency", "8"))
+# Default of the agent_tool_timeout environment variable, read at every tool call
+TOOL_TIMEOUT = 120.0
+
+
+class ParallelAgentWorkflow(AgentWorkflow):
+    """AgentWorkflow dispatching the tool calls of a step concurrently.
+
+    Args:
+        tool_timeout (float): Seconds a tool call may take, the agent gets an error result beyond.
+            Defaults to the `agent_tool_timeout` environment variable, read at every call.
+        Other arguments are the ones of AgentWorkflow.
+
+    The tool calls run at once are `agent_tool_concurrency` as set when this module is imported.
+    """
+
+    def __init__(self, *args, tool_timeout=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tool_timeout = tool_timeout
+
+    @step(num_workers=TOOL_CONCURRENCY)
+    async def call_tool(self, ctx: Context, ev: ToolCall) -> ToolCallResult:
+        # Each ToolCall event sent by parse_agent_output goes to a free worker of this step,
+        # aggregate_tool_results then waits for all of them before the next agent step
+        return await super().call_tool(ctx, ev)
+
+    async def _call_tool(self, ctx, tool, tool_input):
+        timeout = self.tool_timeout or float(os.getenv("agent_tool_timeout", TOOL_TIMEOUT))
+        try:
+            return await asyncio.wait_for(super()._call_tool(ctx, tool, tool_input), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Tool {tool.metadata.name} timed out after {timeout} seconds")
+            message = f"The tool {tool.metadata.name} did not answer within {timeout} seconds."
+            return ToolOutput(
+                content=message,
+                tool_name=tool.metadata.name,
+                raw_input=tool_input,
+                raw_output=message,
+                is_error=True,
+            )
@@ -0,0 +1,106 @@
+"""Named artifacts shared between the tools and the code interpreter.
+
+A tool saves its full result once under a name, in the artifacts directory, and only hands
+a short summary back to the agent. The sandboxes see the same directory (mounted read-only
+in the containers) and the interpreter code loads the data with `load_artifact(name)`, so
+large results reach the code without being written out by the LLM.
+
+Arrays, or dicts of arrays, are saved as NumPy .npz files, anything else as JSON.
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+
+ARTIFACTS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "alfred", "artifacts")
+FORMATS = ("json", "npz")
+
+
+def artifacts_dir():
+    """The artifacts directory, from the `artifacts_dir` environment variable, created on first use."""
+    path = os.path.abspath(os.getenv("artifacts_dir", ARTIFACTS_DIR))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def artifact_name(name):
+    """Restrict a name to letters, digits, dots, dashes and underscores, so it stays a file of the directory."""
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(name).strip()).strip("._")
+    if not name:
+        raise ValueError("An artifact name needs at least one letter or digit.")
+    return name
+
+
+def _is_arrays(value):
+    return isinstance(value, np.ndarray) or (
+        isinstance(value, dict) and bool(value) and all(isinstance(v, np.ndarray) for v in value.values())
+    )
+
+
+def describe(value):
+    """A short description of a value, what the agent gets back instead of the value itself."""
+    if isinstance(value, np.ndarray):
+        return {"shape": list(value.shape), "dtype": str(value.dtype)}
+    if isinstance(value, dict):
+        if _is_arrays(value):
+            return {"arrays": {key: describe(array) for key, array in value.items()}}
+        keys = list(value)
+        return {"keys": keys[:20], **({"more_keys": len(keys) - 20} if len(keys) > 20 else {})}
+    if isinstance(value, list):
+        summary = {"length": len(value)}
+        if value and isinstance(value[0], dict):
+            summary["item_keys"] = list(value[0])[:20]
+        return summary
+    return {"type": type(value).__name__}
+
+
+def save_artifact(name, value):
+    """
+    Save a value under a name, replacing any artifact with the same name, and return
+    {"artifact", "format", "bytes", ...description of the value}.
+    """
+    name = artifact_name(name)
+    directory = artifacts_dir()
+    fmt = "npz" if _is_arrays(value) else "json"
+    path = os.path.join(directory, f"{name}.{fmt}")
+
+    # Write to a temporary file first so a running snippet never reads a partial artifact
+    tmp_path = os.path.join(directory, f".{name}.tmp.{fmt}")
+    if fmt == "npz":
+        np.savez(tmp_path, **(value if isinstance(value, dict) else {"array": value}))
+    else:
+        with open(tmp_path, "w") as file:
+            json.dump(value, file, default=str)
+    os.replace(tmp_path, path)
+    for other in FORMATS:
+        if other != fmt and os.path.exists(os.path.join(directory, f"{name}.{other}")):
+            os.remove(os.path.join(directory, f"{name}.{other}"))
+
+    return {"artifact": name, "format": fmt, "bytes": os.path.getsize(path), **describe(value)}
+
+
+def load_artifact(name):
+    """Load an artifact saved by save_artifact()."""
+    name = artifact_name(name)
+    directory = artifacts_dir()
+    if os.path.exists(os.path.join(directory, f"{name}.npz")):
+        with np.load(os.path.join(directory, f"{name}.npz"), allow_pickle=False) as arrays:
+            if list(arrays.keys()) == ["array"]:
+                return arrays["array"]
+            return {key: arrays[key] for key in arrays.keys()}
+    try:
+        with open(os.path.join(directory, f"{name}.json"), "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        raise KeyError(f"No artifact named {name}, available: {list_artifacts()}")
+
+
+def list_artifacts():
+    """Names of the saved artifacts."""
+    return sorted(
+        os.path.splitext(entry)[0]
+        for entry in os.listdir(artifacts_dir())
+        if not entry.startswith(".") and entry.rsplit(".", 1)[-1] in FORMATS
+    )
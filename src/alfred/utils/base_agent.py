@@ -5,16 +5,57 @@ from alfred.utils.common import (
     configure_logging,
     apply_nest_asyncio,
     load_environment_variables,
-    initialize_azure_services,
-    initialize_ollama_services,
+    get_embedding,
+    get_llm,
+    ollama_supports_tools,
     read_md_file
 )
+from alfred.utils.embedding_cache import cache_embeddings
+from alfred.utils.agent_workflow import ParallelAgentWorkflow
 from llama_index.core.agent.workflow import (
-    AgentWorkflow,
+    FunctionAgent,
     ReActAgent)
 
+# react: the LLM writes Thought/Action/Observation text, one tool call per step
+# function: native tool calling, the tool calls of a step run concurrently
+# auto: function when the LLM supports tool calling, react otherwise
+AGENT_TYPES = {"react": ReActAgent, "function": FunctionAgent}
+
+
+def supports_tool_calling(llm):
+    """Whether llm can call tools. Ollama models are checked on the server, the integration claims it for all of them."""
+    if not llm.metadata.is_function_calling_model:
+        return False
+    if llm.class_name() == "Ollama_llm":
+        return ollama_supports_tools(llm.model, llm.base_url)
+    return True
+
+
+def resolve_agent_type(agent_type, llm):
+    """
+    Agent type used with llm: auto picks function when the LLM supports native tool calling
+    (Azure OpenAI, the Ollama models with tool support), function falls back to react when it does not.
+    """
+    if agent_type not in AGENT_TYPES and agent_type != "auto":
+        raise ValueError(f"Unknown agent type {agent_type}, expected one of {list(AGENT_TYPES) + ['auto']}.")
+    if agent_type == "react":
+        return agent_type
+    if supports_tool_calling(llm):
+        return "function"
+    if agent_type == "function":
+        logging.warning(f"{llm.metadata.model_name} does not support tool calling, using a react agent")
+    return "react"
+
+
 class BaseAgent:
-    def __init__(self, prompt_file, model_name="llama3.1"):
+    """
+    Agent configured for one model. Only the providers of that model are created: the LLM
+    (Azure OpenAI for `azure`, Ollama otherwise, see alfred.utils.common.get_llm) and the
+    embedding model used by the tools, of the `embed_provider` environment variable (ollama by default).
+    The agent type, react, function or auto, defaults to the `agent_type` environment variable (auto).
+    """
+
+    def __init__(self, prompt_file, model_name="llama3.1", agent_type=None):
         # Logging configuration
         configure_logging(level=logging.INFO)
 
@@ -25,16 +66,16 @@ class BaseAgent:
         load_environment_variables()
 
         # Initialize services
-        self.azure_llm, self.azure_embedding, _ = initialize_azure_services()
-        self.ollama_llm, self.ollama_embedding, _ = initialize_ollama_services(model_name)
+        embed_model, embed_dim = get_embedding()
+        Settings.embed_model = cache_embeddings(embed_model, embed_dim)
+        Settings.llm = get_llm(model_name)
 
-        Settings.embed_model = self.ollama_embedding
-        Settings.llm = self.azure_llm if model_name == 'azure' else self.ollama_llm
+        self.agent_type = resolve_agent_type(agent_type or os.getenv("agent_type", "auto"), Settings.llm)
 
         self.prompt = read_md_file(os.path.join(os.getcwd(), prompt_file))
 
     def prepare_chat(self, agent_name, agent_description, tools):
-        agent = ReActAgent(
+        agent = AGENT_TYPES[self.agent_type](
             name=agent_name,
             description=agent_description,
             system_prompt=self.prompt,
@@ -42,4 +83,4 @@ class BaseAgent:
             llm=Settings.llm,
         )
 
-        return AgentWorkflow(agents=[agent], root_agent=agent_name)
+        return ParallelAgentWorkflow(agents=[agent], root_agent=agent_name)
@@ -0,0 +1,39 @@
+"""Batched, concurrent embedding helpers shared by search and ingestion."""
+
+import asyncio
+import os
+
+from llama_index.core.async_utils import asyncio_run
+
+# Defaults of the embed_batch_size and embed_concurrency environment variables,
+# read on every call so that the values of .env apply
+EMBED_BATCH_SIZE = 32
+EMBED_CONCURRENCY = 4
+
+
+def batched(items, batch_size):
+    """Split a sequence into consecutive lists of at most batch_size items."""
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+async def aembed_texts(embedding_model, texts, batch_size=None, concurrency=None):
+    """
+    Embed texts in batches using the batch API of the llama-index embedding model,
+    with at most `concurrency` batches in flight. The order of `texts` is preserved.
+    """
+    batch_size = batch_size or int(os.getenv("embed_batch_size", EMBED_BATCH_SIZE))
+    semaphore = asyncio.Semaphore(concurrency or int(os.getenv("embed_concurrency", EMBED_CONCURRENCY)))
+
+    async def embed_batch(batch):
+        async with semaphore:
+            return await embedding_model.aget_text_embedding_batch(batch)
+
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batched(list(texts), batch_size)))
+    return [embedding for batch in results for embedding in batch]
+
+
+def embed_texts(embedding_model, texts, batch_size=None, concurrency=None):
+    """Synchronous wrapper around `aembed_texts`. Inside a running event loop this relies on nest_asyncio."""
+    if not texts:
+        return []
+    return asyncio_run(aembed_texts(embedding_model, texts, batch_size, concurrency))
@@ -1,22 +1,18 @@
 import os
 import logging
 import sys
+import threading
 import nest_asyncio
 from dotenv import load_dotenv
-from llama_index.llms.ollama import Ollama
-from llama_index.embeddings.ollama import OllamaEmbedding
-from llama_index.llms.azure_openai import AzureOpenAI
-from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
-from llama_index.core import Settings
-from llama_index.core.workflow import (
-    Context,
-    JsonSerializer,
-    JsonPickleSerializer,
-)
-import pickle
 import json 
-from llama_index.embeddings.ollama import OllamaEmbedding
-import chromadb
+
+# llama-index, its provider integrations (Azure OpenAI, Ollama) and chromadb are slow to import,
+# they are imported by the functions using them so that only the providers of the chosen model are loaded
+DEFAULT_MODEL = "llama3.1"  # deepseek-r1:8b, llama3.1, olmo2, mistral, dolphin3
+AZURE_LLM_MODEL = "gpt-4o-mini"
+AZURE_EMBED_MODEL = "text-embedding-ada-002"
+OLLAMA_EMBED_MODEL = "bge-m3"
+OLLAMA_URL = "http://localhost:11434"
 
 # Logging configuration
 def configure_logging(level=logging.INFO):
@@ -33,10 +29,7 @@ def load_environment_variables():
     load_dotenv()
 
 
-# Initialize Azure services
-def initialize_azure_services():
-    AZURE_LLM_MODEL = "gpt-4o-mini"
-    AZURE_EMBED_MODEL = "text-embedding-ada-002"
+def azure_settings():
     api_key = os.getenv("azure_api_key")
     azure_endpoint = os.getenv("azure_endpoint")
     api_version = os.getenv("azure_api_version")
@@ -44,38 +37,115 @@ def initialize_azure_services():
     if not all([api_key, azure_endpoint, api_version]):
         raise EnvironmentError("Missing one or more Azure environment variables")
 
-    azure_llm = AzureOpenAI(
-        model=AZURE_LLM_MODEL,
-        deployment_name=AZURE_LLM_MODEL,
-        api_key=api_key,
-        azure_endpoint=azure_endpoint,
-        api_version=api_version,
-    )
+    return {"api_key": api_key, "azure_endpoint": azure_endpoint, "api_version": api_version}
 
-    azure_embedding = AzureOpenAIEmbedding(
-        model=AZURE_EMBED_MODEL,
-        deployment_name=AZURE_EMBED_MODEL,
-        api_key=api_key,
-        azure_endpoint=azure_endpoint,
-        api_version=api_version,
-    )
 
-    return azure_llm, azure_embedding, 1536
+def azure_llm(model_name):
+    from llama_index.llms.azure_openai import AzureOpenAI
 
+    return AzureOpenAI(model=AZURE_LLM_MODEL, deployment_name=AZURE_LLM_MODEL, **azure_settings())
 
-# Initialize Ollama services
-def initialize_ollama_services(model_name):
-    OLLAMA_URL = os.getenv("ollama_server")
-    MODEL_NAME = "llama3.1" if model_name == 'azure' else model_name # deepseek-r1:8b, llama3.1, olmo2, mistral, dolphin3
-    EMBED_MODEL_NAME = "bge-m3"
 
-    ollama_embedding = OllamaEmbedding(
-        model_name=EMBED_MODEL_NAME, base_url=OLLAMA_URL  # dim 1024
-    )
+def azure_embedding():
+    from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
+
+    return AzureOpenAIEmbedding(model=AZURE_EMBED_MODEL, deployment_name=AZURE_EMBED_MODEL, **azure_settings()), 1536
+
+
+def ollama_llm(model_name):
+    from llama_index.llms.ollama import Ollama
+
+    return Ollama(model=model_name, base_url=os.getenv("ollama_server"), request_timeout=360.0)
+
+
+def ollama_supports_tools(model_name, base_url=None):
+    """
+    Whether an Ollama model can call tools, asked to the server once per model. The Ollama
+    integration reports every model as function calling, deepseek-r1 or olmo2 included.
+    Newer servers list "tools" in the capabilities of the model, older ones only accept tools
+    when the chat template of the model renders them. False when the server can't tell.
+    """
+    from alfred.utils.http_client import get_client
+
+    base_url = (base_url or os.getenv("ollama_server") or OLLAMA_URL).rstrip("/")
+    key = (base_url, model_name)
+    if key not in _tool_support:
+        try:
+            response = get_client().post(f"{base_url}/api/show", json={"model": model_name})
+            response.raise_for_status()
+            info = response.json()
+        except Exception as e:
+            logging.warning(f"Can't get the capabilities of {model_name} from {base_url}: {e}")
+            return False
+        if "capabilities" in info:
+            _tool_support[key] = "tools" in info["capabilities"]
+        else:
+            _tool_support[key] = ".Tools" in info.get("template", "")
+    return _tool_support[key]
+
+
+def ollama_embedding():
+    from llama_index.embeddings.ollama import OllamaEmbedding
+
+    return OllamaEmbedding(model_name=OLLAMA_EMBED_MODEL, base_url=os.getenv("ollama_server")), 1024
+
+
+# Providers keyed by model name, any other model name is an Ollama model
+LLM_PROVIDERS = {"azure": azure_llm}
+EMBEDDING_PROVIDERS = {"ollama": ollama_embedding, "azure": azure_embedding}
 
-    ollama_llm = Ollama(model=MODEL_NAME, base_url=OLLAMA_URL, request_timeout=360.0)
+_lock = threading.Lock()
+_llms = {}
+_embeddings = {}
+_tool_support = {}
 
-    return ollama_llm, ollama_embedding, 1024
+
+def register_llm(model_name, factory):
+    """Serve a model name with factory(model_name), e.g. a local or fake LLM."""
+    with _lock:
+        LLM_PROVIDERS[model_name] = factory
+        _llms.pop(model_name, None)
+
+
+def register_embedding(provider, factory):
+    """Serve an embedding provider with factory(), returning the model and its dimension."""
+    with _lock:
+        EMBEDDING_PROVIDERS[provider] = factory
+        _embeddings.pop(provider, None)
+
+
+def get_llm(model_name=None):
+    """LLM of a model name, created on first use and shared afterwards."""
+    model_name = model_name or DEFAULT_MODEL
+    with _lock:
+        if model_name not in _llms:
+            logging.debug(f"Creating the LLM {model_name}")
+            _llms[model_name] = LLM_PROVIDERS.get(model_name, ollama_llm)(model_name)
+        return _llms[model_name]
+
+
+def get_embedding(provider=None):
+    """
+    Embedding model of a provider and its dimension, created on first use and shared afterwards.
+    The provider defaults to the `embed_provider` environment variable, ollama if it is not set.
+    """
+    provider = provider or os.getenv("embed_provider", "ollama")
+    with _lock:
+        if provider not in _embeddings:
+            if provider not in EMBEDDING_PROVIDERS:
+                raise ValueError(f"Unknown embedding provider {provider}, expected one of {list(EMBEDDING_PROVIDERS)}.")
+            _embeddings[provider] = EMBEDDING_PROVIDERS[provider]()
+        return _embeddings[provider]
+
+
+# Initialize Azure services
+def initialize_azure_services():
+    return (get_llm("azure"), *get_embedding("azure"))
+
+
+# Initialize Ollama services
+def initialize_ollama_services(model_name):
+    return (get_llm(DEFAULT_MODEL if model_name == "azure" else model_name), *get_embedding("ollama"))
 
 
 # Read markdown file
@@ -89,24 +159,10 @@ def read_md_file(file_path):
         return None
 
 
-def save_context(handler, pkl_file):
-    ctx_dict = handler.ctx.to_dict(serializer=JsonPickleSerializer())
-    with open(pkl_file, "wb") as f:
-        pickle.dump(ctx_dict, f)
-
-
-def load_context(workflow, pkl_file):
-    ctx = None
-
-    if os.path.exists(pkl_file):
-        with open(pkl_file, "rb") as f:
-            ctx_dict = pickle.load(f)
-            ctx = Context.from_dict(
-                workflow, data=ctx_dict, serializer=JsonSerializer()
-            )
-    return ctx
-
 def perform_search(embedding_model, available_fcts, query): 
+    import chromadb
+    from alfred.utils.batch_embedding import embed_texts
+
     client = chromadb.HttpClient("khoury")
     try:
         collection = client.get_collection("docs")
@@ -114,13 +170,14 @@ def perform_search(embedding_model, available_fcts, query):
         logging.error(f"Collection not found: {e}")
         collection = client.create_collection("docs", get_or_create=True)
 
-    for i, d,p in available_fcts:
-        embeddings = embedding_model.get_text_embedding(d)
-        collection.add(
-            ids=i,
+    if available_fcts:
+        ids, documents, parameters = zip(*available_fcts)
+        embeddings = embed_texts(embedding_model, list(documents))
+        collection.upsert(
+            ids=list(ids),
             embeddings=embeddings,
-            documents=d,
-            metadatas={"parameters":json.dumps(p)},
+            documents=list(documents),
+            metadatas=[{"parameters": json.dumps(p)} for p in parameters],
         )
 
     # generate an embedding for the input and retrieve the most relevant doc
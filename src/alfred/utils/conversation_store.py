@@ -0,0 +1,179 @@
+"""Persistent conversations of the agents, one per named session.
+
+Every question and answer is appended to SQLite as its own row, so saving a turn costs the
+same whatever the length of the conversation, and several processes can share the store
+(WAL journal, writes in short transactions). Loading a session reads its rows only. Once a
+session grows over the token budget, its oldest turns are folded into a running summary by
+the LLM, so the history handed to the agent stays bounded.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.workflow import Context
+
+CONVERSATION_DB = os.path.join(os.path.expanduser("~"), ".cache", "alfred", "conversations.sqlite")
+# Default of the conversation_token_budget environment variable
+TOKEN_BUDGET = 4000
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below between a user and an assistant in a few sentences. Keep the facts, "
+    "figures, names, dates and decisions that later questions may refer to.\n\n"
+    "Summary of the earlier conversation:\n{summary}\n\nConversation:\n{transcript}\n\nSummary:"
+)
+
+
+def count_tokens(text):
+    """Rough token count, about 4 characters per token, good enough to bound a prompt."""
+    return len(text or "") // 4 + 1
+
+
+def llm_summarizer(llm):
+    """summarize(summary, messages) -> new summary, written by an LLM."""
+
+    def summarize(summary, messages):
+        transcript = "\n".join(f"{message.role.value}: {message.content}" for message in messages)
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", transcript=transcript)
+        return llm.complete(prompt).text.strip()
+
+    return summarize
+
+
+class ConversationStore:
+    """SQLite backed, append-only log of the turns of each session plus the summary of its compacted turns.
+
+    Args:
+        path (str): Database file. Defaults to the `conversation_db` environment variable.
+        token_budget (int): Tokens of history kept per session before compaction. Defaults to
+            the `conversation_token_budget` environment variable.
+    """
+
+    def __init__(self, path=None, token_budget=None):
+        path = path or os.getenv("conversation_db", CONVERSATION_DB)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.token_budget = token_budget or int(os.getenv("conversation_token_budget", TOKEN_BUDGET))
+        self._lock = threading.Lock()
+        # Autocommit, transactions are opened explicitly; wait for the writers of other processes
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS turns (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, session TEXT NOT NULL, role TEXT NOT NULL,
+                content TEXT NOT NULL, tokens INTEGER NOT NULL, created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS turns_session ON turns (session, seq);
+            CREATE TABLE IF NOT EXISTS summaries (
+                session TEXT PRIMARY KEY, summary TEXT NOT NULL, tokens INTEGER NOT NULL, upto INTEGER NOT NULL
+            );
+            """
+        )
+
+    def append(self, session, messages):
+        """Append the messages of a turn, e.g. the question and the answer, to a session."""
+        rows = [
+            (session, MessageRole(m.role).value, m.content or "", count_tokens(m.content), time.time())
+            for m in messages
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT INTO turns (session, role, content, tokens, created) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute("COMMIT")
+
+    def _summary(self, session):
+        return self._conn.execute(
+            "SELECT summary, tokens, upto FROM summaries WHERE session = ?", (session,)
+        ).fetchone() or (None, 0, 0)
+
+    def _turns(self, session):
+        return self._conn.execute(
+            "SELECT seq, role, content, tokens FROM turns WHERE session = ? ORDER BY seq", (session,)
+        ).fetchall()
+
+    def history(self, session):
+        """Chat history of a session: the summary of its compacted turns, if any, then the turns after it."""
+        with self._lock:
+            summary, _, _ = self._summary(session)
+            turns = self._turns(session)
+        messages = [ChatMessage(role=role, content=content) for _, role, content, _ in turns]
+        if summary:
+            messages.insert(0, ChatMessage(role="system", content=f"Summary of the earlier conversation: {summary}"))
+        return messages
+
+    def tokens(self, session):
+        """Tokens of the history of a session."""
+        with self._lock:
+            _, tokens, _ = self._summary(session)
+            return tokens + sum(row[3] for row in self._turns(session))
+
+    def sessions(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT session FROM turns UNION SELECT session FROM summaries").fetchall()
+        return sorted(row[0] for row in rows)
+
+    def clear(self, session):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM turns WHERE session = ?", (session,))
+            self._conn.execute("DELETE FROM summaries WHERE session = ?", (session,))
+            self._conn.execute("COMMIT")
+
+    def compact(self, session, summarize, keep_tokens=None):
+        """
+        When the history of a session is over the token budget, fold its oldest turns into the summary
+        with summarize(summary, messages), keeping the most recent `keep_tokens` (half the budget) as they are.
+        Returns whether the session was compacted.
+        """
+        keep_tokens = self.token_budget // 2 if keep_tokens is None else keep_tokens
+        with self._lock:
+            summary, summary_tokens, upto = self._summary(session)
+            turns = self._turns(session)
+        if summary_tokens + sum(row[3] for row in turns) <= self.token_budget:
+            return False
+
+        # Keep whole turns, at least the last one, from the most recent one and starting with a question
+        questions = [i for i, row in enumerate(turns) if row[1] == "user"]
+        split = questions[-1] if questions else len(turns)
+        for i in reversed(questions[:-1]):
+            if sum(row[3] for row in turns[i:]) > keep_tokens:
+                break
+            split = i
+        if split == 0:
+            return False
+
+        older = [ChatMessage(role=role, content=content) for _, role, content, _ in turns[:split]]
+        # The LLM call is slow, it runs outside of any transaction
+        summary = summarize(summary, older)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            if self._summary(session)[2] != upto:
+                # Another process compacted the session meanwhile
+                self._conn.execute("ROLLBACK")
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (session, summary, tokens, upto) VALUES (?, ?, ?, ?)",
+                (session, summary, count_tokens(summary), turns[split - 1][0]),
+            )
+            self._conn.execute("DELETE FROM turns WHERE session = ? AND seq <= ?", (session, turns[split - 1][0]))
+            self._conn.execute("COMMIT")
+        return True
+
+
+async def run_turn(workflow, store, session, question, llm=None):
+    """
+    Answer a question with the history of a session, then append the question and the answer to
+    the session and, when an LLM is given, compact the session once it is over the token budget.
+    """
+    history = await asyncio.to_thread(store.history, session)
+    response = str(await workflow.run(ctx=Context(workflow), user_msg=question, chat_history=history))
+    turn = [ChatMessage(role="user", content=question), ChatMessage(role="assistant", content=response)]
+    await asyncio.to_thread(store.append, session, turn)
+    if llm is not None:
+        await asyncio.to_thread(store.compact, session, llm_summarizer(llm))
+    return response
@@ -0,0 +1,229 @@
+"""Persistent, content-addressed cache in front of an embedding model.
+
+Embeddings are looked up in an in-memory LRU first, then in an on-disk SQLite store,
+and only computed by the wrapped model on a miss. Entries are keyed by model name,
+dimension, embedding kind (query/text) and a hash of the text.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from pydantic import PrivateAttr
+
+EMBED_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "alfred", "embeddings.sqlite")
+
+
+class EmbeddingStore:
+    """SQLite backed vector store with size-bounded, least-recently-used eviction."""
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, Embedding]:
+        if not keys:
+            return {}
+        with self._lock:
+            found = {}
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                found.update({key: np.frombuffer(blob, dtype=np.float32).tolist() for key, blob in rows})
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+            return found
+
+    def put_many(self, items: Dict[str, Embedding]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that caches every embedding it computes.
+
+    Args:
+        embed_model (BaseEmbedding): The embedding model to wrap.
+        dimension (int): Dimension of the embeddings produced by the model.
+        store (Optional[EmbeddingStore]): On-disk store. Defaults to None (memory only).
+        max_memory_entries (int): Size of the in-memory LRU. Defaults to 10000.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _dimension: int = PrivateAttr()
+    _store: Optional[EmbeddingStore] = PrivateAttr(default=None)
+    _memory: OrderedDict = PrivateAttr()
+    _max_memory_entries: int = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        dimension: int,
+        store: Optional[EmbeddingStore] = None,
+        max_memory_entries: int = 10_000,
+        **kwargs: Any,
+    ):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            callback_manager=embed_model.callback_manager,
+            num_workers=embed_model.num_workers,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._dimension = dimension
+        self._store = store
+        self._memory = OrderedDict()
+        self._max_memory_entries = max_memory_entries
+        self._lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def embed_model(self) -> BaseEmbedding:
+        return self._embed_model
+
+    def cache_info(self) -> Dict[str, int]:
+        """Return the hit/miss counters and the current cache sizes."""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._store) if self._store is not None else 0,
+        }
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{self._dimension}:{kind}:{digest}"
+
+    def _lookup(self, keys: List[str]) -> Dict[str, Embedding]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+        missing = [key for key in keys if key not in found]
+        if missing and self._store is not None:
+            from_disk = self._store.get_many(missing)
+            self._remember(from_disk)
+            found.update(from_disk)
+        return found
+
+    def _remember(self, items: Dict[str, Embedding]):
+        with self._lock:
+            for key, vector in items.items():
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self._max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _store_computed(self, items: Dict[str, Embedding]):
+        self._remember(items)
+        if self._store is not None:
+            self._store.put_many(items)
+
+    def _partition(self, kind: str, texts: List[str]):
+        keys = [self._key(kind, text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(text for key, text in zip(keys, texts) if key not in found))
+        with self._lock:
+            self._hits += len(texts) - len(missing)
+            self._misses += len(missing)
+        return keys, found, missing
+
+    def _merge(self, kind, keys, found, missing, computed):
+        fresh = {self._key(kind, text): vector for text, vector in zip(missing, computed)}
+        self._store_computed(fresh)
+        found.update(fresh)
+        return [found[key] for key in keys]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        keys, found, missing = self._partition("query", [query])
+        computed = [self._embed_model._get_query_embedding(q) for q in missing]
+        return self._merge("query", keys, found, missing, computed)[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        keys, found, missing = self._partition("query", [query])
+        computed = [await self._embed_model._aget_query_embedding(q) for q in missing]
+        return self._merge("query", keys, found, missing, computed)[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, found, missing = self._partition("text", texts)
+        computed = self._embed_model._get_text_embeddings(missing) if missing else []
+        return self._merge("text", keys, found, missing, computed)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, found, missing = self._partition("text", texts)
+        computed = await self._embed_model._aget_text_embeddings(missing) if missing else []
+        return self._merge("text", keys, found, missing, computed)
+
+
+def cache_embeddings(embed_model, dimension, path=None, max_memory_entries=10_000, max_disk_entries=100_000):
+    """
+    Wrap an embedding model returned by `get_embedding`
+    in a memory + disk cache. The disk store defaults to the `embed_cache_path` environment variable.
+    """
+    if isinstance(embed_model, CachedEmbedding):
+        return embed_model
+
+    path = path or os.getenv("embed_cache_path", EMBED_CACHE_PATH)
+    store = EmbeddingStore(path, max_entries=max_disk_entries)
+    return CachedEmbedding(embed_model, dimension, store=store, max_memory_entries=max_memory_entries)
@@ -0,0 +1,166 @@
+"""Precompiled, memory-mapped catalog of the Alpha Vantage functions.
+
+The catalog is compiled once from `fcts_path` into an embedding matrix (.npy) plus
+a metadata file (.json), both keyed by the embedding model and the content hash of
+the functions file. At runtime the matrix is memory-mapped and searched in-process,
+so routing a query costs one query embedding and a matrix multiply.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import click
+import numpy as np
+
+from alfred.utils.batch_embedding import embed_texts
+
+CATALOG_DIR = os.path.join(os.path.expanduser("~"), ".cache", "alfred", "catalog")
+
+
+def embed_model_id(embed_model):
+    """Return a stable identifier for an embedding model."""
+    return getattr(embed_model, "model_name", None) or type(embed_model).__name__
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class FunctionCatalog:
+    """In-process vector index over the Alpha Vantage function descriptions."""
+
+    def __init__(self, ids, documents, parameters, embeddings):
+        self.ids = ids
+        self.documents = documents
+        self.parameters = parameters
+        self.embeddings = embeddings
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def catalog_key(fcts_path, model_id):
+        """Key a compiled catalog by embedding model and functions file content."""
+        digest = hashlib.sha256(model_id.encode("utf-8"))
+        with open(fcts_path, "rb") as file:
+            digest.update(file.read())
+        return digest.hexdigest()[:32]
+
+    @staticmethod
+    def _paths(catalog_dir, key):
+        base = os.path.join(catalog_dir, key)
+        return f"{base}.npy", f"{base}.json"
+
+    @classmethod
+    def build(cls, fcts_path, embed_model, catalog_dir=None, dtype="float16"):
+        """Embed every function description in batch and write the catalog to disk."""
+        catalog_dir = catalog_dir or os.getenv("catalog_dir", CATALOG_DIR)
+        os.makedirs(catalog_dir, exist_ok=True)
+
+        with open(fcts_path, "r") as file:
+            functions = json.load(file)
+
+        ids = [fct["function"] for fct in functions]
+        documents = [fct["description"] for fct in functions]
+        parameters = [fct["parameters"] for fct in functions]
+
+        logging.info(f"Compiling function catalog for {len(ids)} functions.")
+        vectors = np.asarray(embed_texts(embed_model, documents), dtype=np.float32)
+        embeddings = _normalize(vectors).astype(dtype)
+
+        key = cls.catalog_key(fcts_path, embed_model_id(embed_model))
+        npy_path, meta_path = cls._paths(catalog_dir, key)
+
+        # Write to temporary files first so a concurrent reader never sees a partial catalog
+        np.save(f"{npy_path}.tmp.npy", embeddings)
+        os.replace(f"{npy_path}.tmp.npy", npy_path)
+        with open(f"{meta_path}.tmp", "w") as file:
+            json.dump(
+                {
+                    "model": embed_model_id(embed_model),
+                    "dimension": int(embeddings.shape[1]),
+                    "dtype": str(embeddings.dtype),
+                    "ids": ids,
+                    "documents": documents,
+                    "parameters": parameters,
+                },
+                file,
+            )
+        os.replace(f"{meta_path}.tmp", meta_path)
+        logging.info(f"Function catalog written to {npy_path}")
+
+        return cls.load(fcts_path, embed_model, catalog_dir=catalog_dir, build=False)
+
+    @classmethod
+    def load(cls, fcts_path, embed_model, catalog_dir=None, build=True):
+        """Memory-map a compiled catalog, compiling it first if it does not exist yet."""
+        catalog_dir = catalog_dir or os.getenv("catalog_dir", CATALOG_DIR)
+        key = cls.catalog_key(fcts_path, embed_model_id(embed_model))
+        npy_path, meta_path = cls._paths(catalog_dir, key)
+
+        if not (os.path.exists(npy_path) and os.path.exists(meta_path)):
+            if not build:
+                raise FileNotFoundError(f"No compiled function catalog at {npy_path}")
+            return cls.build(fcts_path, embed_model, catalog_dir=catalog_dir)
+
+        with open(meta_path, "r") as file:
+            meta = json.load(file)
+        embeddings = np.load(npy_path, mmap_mode="r")
+        logging.info(f"Function catalog loaded from {npy_path}")
+
+        return cls(meta["ids"], meta["documents"], meta["parameters"], embeddings)
+
+    def search(self, query_embeddings, k=3):
+        """
+        Return the top-k functions for one query embedding, or one list per row when
+        a matrix of query embeddings is given.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = _normalize(np.atleast_2d(queries))
+
+        k = min(k, len(self))
+        scores = queries @ np.asarray(self.embeddings, dtype=np.float32).T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+        results = [
+            [
+                {
+                    "function": self.ids[i],
+                    "documentation": self.documents[i],
+                    "parameters": self.parameters[i],
+                    "score": float(scores[row, i]),
+                }
+                for i in top[row]
+            ]
+            for row in range(len(queries))
+        ]
+        return results[0] if single else results
+
+
+@click.command()
+@click.option("-f", "--fcts-path", help="Path of the functions json file", type=str, default=None)
+@click.option("-d", "--dtype", help="Storage dtype of the embeddings", type=click.Choice(["float16", "float32"]), default="float16")
+def build(fcts_path: str, dtype: str):
+    from alfred.utils.common import (
+        configure_logging,
+        get_embedding,
+        load_environment_variables,
+    )
+
+    configure_logging(level=logging.INFO)
+    load_environment_variables()
+    embed_model, _ = get_embedding()
+    catalog = FunctionCatalog.build(fcts_path or os.getenv("fcts_path"), embed_model, dtype=dtype)
+    print(f"Compiled {len(catalog)} functions.")
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,98 @@
+"""Shared, connection-pooled HTTP clients used by every tool spec.
+
+One `httpx.Client` is shared process-wide and one `httpx.AsyncClient` per event loop, so
+tool calls reuse kept-alive connections instead of paying DNS, TCP and TLS setup on every
+request. HTTP/2 is negotiated when the `h2` package is installed.
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+
+import httpx
+
+# Defaults of the http_pool_size, http_timeout and http_connect_timeout environment
+# variables, read when a client is created so that the values of .env apply
+HTTP_POOL_SIZE = 20
+HTTP_TIMEOUT = 30.0
+HTTP_CONNECT_TIMEOUT = 10.0
+
+_lock = threading.Lock()
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _client_options():
+    pool_size = int(os.getenv("http_pool_size", HTTP_POOL_SIZE))
+    timeout = float(os.getenv("http_timeout", HTTP_TIMEOUT))
+    connect_timeout = float(os.getenv("http_connect_timeout", HTTP_CONNECT_TIMEOUT))
+    return {
+        "http2": importlib.util.find_spec("h2") is not None,
+        "limits": httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        "timeout": httpx.Timeout(timeout, connect=connect_timeout),
+        "follow_redirects": True,
+    }
+
+
+def get_client() -> httpx.Client:
+    """Return the shared synchronous client, creating it on first use."""
+    global _client
+    with _lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(**_client_options())
+        return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the asynchronous client of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**_client_options())
+            _async_clients[loop] = client
+        return client
+
+
+def _drop_none(values):
+    # requests silently dropped None values, httpx would send them as empty strings
+    return {k: v for k, v in (values or {}).items() if v is not None}
+
+
+def http_get(url, params=None, headers=None, **kwargs) -> httpx.Response:
+    """GET through the shared pooled client."""
+    return get_client().get(url, params=_drop_none(params), headers=_drop_none(headers), **kwargs)
+
+
+async def ahttp_get(url, params=None, headers=None, **kwargs) -> httpx.Response:
+    """GET through the pooled client of the running event loop."""
+    return await get_async_client().get(url, params=_drop_none(params), headers=_drop_none(headers), **kwargs)
+
+
+def http_stream(url, params=None, headers=None, **kwargs):
+    """Streaming GET through the shared pooled client, to be used as a context manager."""
+    return get_client().stream("GET", url, params=_drop_none(params), headers=_drop_none(headers), **kwargs)
+
+
+def ahttp_stream(url, params=None, headers=None, **kwargs):
+    """Streaming GET through the pooled client of the running event loop, to be used as an async context manager."""
+    return get_async_client().stream("GET", url, params=_drop_none(params), headers=_drop_none(headers), **kwargs)
+
+
+def close_clients():
+    """Close the shared synchronous client."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose_clients():
+    """Close the asynchronous client of the running event loop."""
+    with _lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,48 @@
+"""Client-side token-bucket rate limiting."""
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket that queues callers instead of failing when the quota is exhausted.
+
+    Each caller reserves a token under the lock; when the bucket is empty the balance goes
+    negative and the caller sleeps until its reserved token has been refilled, so waiting
+    callers are served in arrival order.
+
+    Args:
+        rate_per_minute (float): Sustained number of calls allowed per minute.
+        capacity (int): Maximum burst size. Defaults to rate_per_minute.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, int(rate_per_minute))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token and return how long the caller has to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until a call is allowed. Returns the time spent waiting."""
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a call is allowed."""
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
@@ -0,0 +1,118 @@
+"""In-memory TTL cache for tool responses with coalescing of concurrent identical calls."""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class ResponseCache:
+    """Thread-safe TTL cache.
+
+    Concurrent `get_or_fetch` calls for the same key share a single fetch: the first caller
+    fetches, the others wait for its result.
+
+    Args:
+        max_entries (int): Maximum number of cached responses. Defaults to 1024.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._async_in_flight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._lookup(key)
+
+    def _lookup(self, key):
+        # Called with the lock held
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_fetch(self, key, ttl, fetch, cacheable=bool):
+        """
+        Return the cached value for key, or call fetch() once for all concurrent callers.
+        The result is only stored when cacheable(result) is true.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            # The leader of a fetch may have stored its result since the check above
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = fetch()
+            if cacheable(value):
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def aget_or_fetch(self, key, ttl, fetch, cacheable=bool):
+        """Asynchronous `get_or_fetch`, where fetch() returns an awaitable."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        loop = asyncio.get_running_loop()
+        in_flight_key = (id(loop), key)
+        future = self._async_in_flight.get(in_flight_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = loop.create_future()
+        self._async_in_flight[in_flight_key] = future
+        try:
+            value = await fetch()
+            if cacheable(value):
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Only waiting callers care about the exception
+            future.exception()
+            raise
+        finally:
+            self._async_in_flight.pop(in_flight_key, None)
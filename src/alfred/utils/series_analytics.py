@@ -0,0 +1,116 @@
+"""Vectorized analytics over Alpha Vantage price series.
+
+Turns a series response into NumPy columns and reduces it to a handful of numbers the
+agent can reason about, instead of handing it thousands of raw price points.
+"""
+
+import numpy as np
+
+from alfred.utils.timeseries_store import series_key
+
+# Lookbacks, in calendar days, of the period-over-period changes
+LOOKBACKS = {"1w": 7, "1m": 30, "3m": 91, "6m": 182, "1y": 365}
+
+
+def series_to_columns(payload):
+    """
+    Convert an Alpha Vantage series response into ascending dates and float columns,
+    e.g. {"open": ..., "close": ..., "volume": ...}.
+    """
+    key = series_key(payload)
+    if key is None:
+        raise ValueError("The response does not contain a time series.")
+
+    bars = payload[key]
+    dates = sorted(bars)
+    fields = {}
+    for name in bars[dates[0]]:
+        # "5. adjusted close" -> "adjusted_close"
+        label = name.split(". ", 1)[-1].replace(" ", "_")
+        fields[label] = np.array([float(bars[d].get(name, "nan")) for d in dates])
+
+    return np.array(dates, dtype="datetime64[D]"), fields
+
+
+def price_column(columns):
+    return columns["adjusted_close"] if "adjusted_close" in columns else columns["close"]
+
+
+def periods_per_year(dates):
+    if len(dates) < 2:
+        return 252
+    spacing = np.median(np.diff(dates).astype(np.int64))
+    if spacing >= 28:
+        return 12
+    if spacing >= 7:
+        return 52
+    return 252
+
+
+def max_drawdown(prices):
+    """Largest peak-to-trough decline, and the indices of that peak and trough."""
+    peaks = np.maximum.accumulate(prices)
+    drawdowns = prices / peaks - 1.0
+    trough = int(np.argmin(drawdowns))
+    peak = int(np.argmax(prices[: trough + 1]))
+    return float(drawdowns[trough]), peak, trough
+
+
+def summarize(dates, columns, window=20, start_date=None, end_date=None):
+    """Reduce a price series to returns, moving averages, volatility, drawdown and period changes."""
+    mask = np.ones(len(dates), dtype=bool)
+    if start_date:
+        mask &= dates >= np.datetime64(start_date, "D")
+    if end_date:
+        mask &= dates <= np.datetime64(end_date, "D")
+    dates = dates[mask]
+    columns = {name: values[mask] for name, values in columns.items()}
+    if len(dates) == 0:
+        raise ValueError("No data points in the requested date range.")
+
+    prices = price_column(columns)
+    returns = np.diff(prices) / prices[:-1]
+    annual = periods_per_year(dates)
+    drawdown, peak, trough = max_drawdown(prices)
+
+    summary = {
+        "first_date": str(dates[0]),
+        "last_date": str(dates[-1]),
+        "data_points": int(len(dates)),
+        "first_close": round(float(prices[0]), 4),
+        "last_close": round(float(prices[-1]), 4),
+        "period_high": round(float(columns.get("high", prices).max()), 4),
+        "period_low": round(float(columns.get("low", prices).min()), 4),
+        "total_return_pct": round(float(prices[-1] / prices[0] - 1.0) * 100, 2),
+        "max_drawdown_pct": round(drawdown * 100, 2),
+        "max_drawdown_from": str(dates[peak]),
+        "max_drawdown_to": str(dates[trough]),
+    }
+
+    if len(returns):
+        summary.update(
+            {
+                "last_change_pct": round(float(returns[-1]) * 100, 2),
+                "mean_return_pct": round(float(returns.mean()) * 100, 4),
+                "best_return_pct": round(float(returns.max()) * 100, 2),
+                "worst_return_pct": round(float(returns.min()) * 100, 2),
+                "annualized_volatility_pct": round(float(returns.std(ddof=1) * np.sqrt(annual)) * 100, 2)
+                if len(returns) > 1
+                else None,
+            }
+        )
+
+    for label, days in LOOKBACKS.items():
+        # Last bar at or before the lookback date
+        index = np.searchsorted(dates, dates[-1] - np.timedelta64(days, "D"), side="right") - 1
+        if index >= 0:
+            summary[f"change_{label}_pct"] = round(float(prices[-1] / prices[index] - 1.0) * 100, 2)
+
+    for span in sorted({window, 50, 200}):
+        if len(prices) >= span:
+            summary[f"sma_{span}"] = round(float(prices[-span:].mean()), 4)
+
+    if "volume" in columns:
+        summary["average_volume"] = int(np.nanmean(columns["volume"][-window:]))
+
+    return summary
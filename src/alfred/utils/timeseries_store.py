@@ -0,0 +1,142 @@
+"""Local store of Alpha Vantage price history.
+
+Bars are kept per (function, symbol, date) in SQLite so a series downloaded once only
+needs its latest bars appended afterwards. A split or a dividend changes every past bar of
+the adjusted series, those are detected by `is_revised` and the history downloaded again.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+TIMESERIES_DB = os.path.join(os.path.expanduser("~"), ".cache", "alfred", "timeseries.sqlite")
+
+
+def series_key(payload):
+    """Return the key holding the date -> bar mapping of an Alpha Vantage series response."""
+    for key, value in payload.items():
+        if key != "Meta Data" and isinstance(value, dict):
+            return key
+    return None
+
+
+def is_corporate_action(bar):
+    """Whether a bar of an adjusted series has a split or a dividend, which revises the adjusted prices before it."""
+    split = float(bar.get("8. split coefficient", 1) or 1)
+    dividend = float(bar.get("7. dividend amount", 0) or 0)
+    return split != 1 or dividend != 0
+
+
+class TimeSeriesStore:
+    """SQLite backed store of Alpha Vantage series bars.
+
+    Args:
+        path (str): Database file. Defaults to the `timeseries_db` environment variable.
+    """
+
+    def __init__(self, path=None):
+        path = path or os.getenv("timeseries_db", TIMESERIES_DB)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS bars (
+                function TEXT NOT NULL, symbol TEXT NOT NULL, date TEXT NOT NULL, bar TEXT NOT NULL,
+                PRIMARY KEY (function, symbol, date)
+            );
+            CREATE TABLE IF NOT EXISTS series (
+                function TEXT NOT NULL, symbol TEXT NOT NULL, series_key TEXT NOT NULL,
+                meta TEXT NOT NULL, full INTEGER NOT NULL, updated REAL NOT NULL,
+                PRIMARY KEY (function, symbol)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def latest_date(self, function, symbol):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(date) FROM bars WHERE function = ? AND symbol = ?", (function, symbol)
+            ).fetchone()
+        return row[0]
+
+    def has_full_history(self, function, symbol):
+        """Whether the stored bars go back to the start of the series (outputsize=full)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT full FROM series WHERE function = ? AND symbol = ?", (function, symbol)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def is_revised(self, function, symbol, payload):
+        """
+        Whether a fresh response disagrees with the stored history: a bar of a date both have
+        differs (the latest stored bar aside, it is revised until the session closes), or a new
+        bar has a split or a dividend. The stored bars are then stale and must be replaced.
+        """
+        key = series_key(payload)
+        if key is None:
+            return False
+        fresh = payload[key]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT date, bar FROM bars WHERE function = ? AND symbol = ? AND date IN ({','.join('?' * len(fresh))})",
+                (function, symbol, *fresh),
+            ).fetchall()
+        latest = self.latest_date(function, symbol)
+        if any(date != latest and json.loads(bar) != fresh[date] for date, bar in rows):
+            return True
+        return any(latest is not None and date > latest and is_corporate_action(bar) for date, bar in fresh.items())
+
+    def upsert(self, function, symbol, payload, full=False, replace=False):
+        """
+        Store the bars of a series response, `full` telling whether it holds the whole history,
+        `replace` dropping the stored bars first. Returns the number of bars that were new.
+        """
+        key = series_key(payload)
+        if key is None:
+            return 0
+
+        bars = [(function, symbol, date, json.dumps(bar)) for date, bar in payload[key].items()]
+        full = full or (not replace and self.has_full_history(function, symbol))
+        with self._lock:
+            if replace:
+                self._conn.execute("DELETE FROM bars WHERE function = ? AND symbol = ?", (function, symbol))
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO bars (function, symbol, date, bar) VALUES (?, ?, ?, ?)", bars
+            )
+            added = self._conn.total_changes - before
+            # The latest bar is revised until the session closes, always take the fresh one
+            latest = max(bars, key=lambda bar: bar[2], default=None)
+            if latest:
+                self._conn.execute(
+                    "UPDATE bars SET bar = ? WHERE function = ? AND symbol = ? AND date = ?",
+                    (latest[3], function, symbol, latest[2]),
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO series (function, symbol, series_key, meta, full, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (function, symbol, key, json.dumps(payload.get("Meta Data", {})), int(full), time.time()),
+            )
+            self._conn.commit()
+        return added
+
+    def load(self, function, symbol, limit=None):
+        """Rebuild an Alpha Vantage shaped response from the stored bars, most recent first."""
+        with self._lock:
+            series = self._conn.execute(
+                "SELECT series_key, meta FROM series WHERE function = ? AND symbol = ?", (function, symbol)
+            ).fetchone()
+            if series is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT date, bar FROM bars WHERE function = ? AND symbol = ? ORDER BY date DESC LIMIT ?",
+                (function, symbol, limit if limit else -1),
+            ).fetchall()
+
+        key, meta = series
+        return {"Meta Data": json.loads(meta), key: {date: json.loads(bar) for date, bar in rows}}
@@ -0,0 +1,14 @@
+from llama_index.core.tools.tool_spec.base import BaseToolSpec
+
+
+class AsyncToolSpec(BaseToolSpec):
+    """
+    Tool spec whose spec_functions may list (sync name, async name) pairs.
+    BaseToolSpec.get_fn_schema_from_fn_name only matches plain names, which makes
+    to_tool_list fail on pairs, so the schema is looked up by the sync name.
+    """
+
+    def get_fn_schema_from_fn_name(self, fn_name, spec_functions=None):
+        spec_functions = spec_functions or self.spec_functions
+        names = [fn[0] if isinstance(fn, tuple) else fn for fn in spec_functions]
+        return super().get_fn_schema_from_fn_name(fn_name, spec_functions=names)
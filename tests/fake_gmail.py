@@ -0,0 +1,255 @@
+"""Local stand-in for the Gmail REST API, used by the Gmail tests and benchmarks.
+
+Serves messages.list, messages.get, getProfile, history.list and the multipart batch
+endpoint, with an optional per round trip latency and a set of message ids answered with
+429 on their first request. messages.list understands the after:, label: and is:unread
+terms and leaves out SPAM and TRASH, like Gmail.
+"""
+
+import base64
+import email
+import json
+import threading
+import time
+import uuid
+from email.message import EmailMessage
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import googleapiclient
+import httplib2
+from googleapiclient.discovery import build_from_document
+
+PREFIX = "/gmail/v1/users/me"
+
+
+# history.list types and the record fields they fill
+HISTORY_TYPES = {
+    "messageAdded": "messagesAdded",
+    "messageDeleted": "messagesDeleted",
+    "labelAdded": "labelsAdded",
+    "labelRemoved": "labelsRemoved",
+}
+
+
+def make_message(message_id, subject="Hello", text="Plain text body", html=None, internal_date=None, labels=("INBOX",)):
+    """A Gmail message resource with a base64url encoded raw MIME message."""
+    mime = EmailMessage()
+    mime["Subject"] = subject
+    mime["From"] = "sender@example.com"
+    mime["To"] = "me@example.com"
+    if text is not None:
+        mime.set_content(text)
+        if html is not None:
+            mime.add_alternative(html, subtype="html")
+    else:
+        mime.set_content(html, subtype="html")
+    return {
+        "id": message_id,
+        "threadId": f"thread-{message_id}",
+        "snippet": (text or html)[:100],
+        "internalDate": str(internal_date or 1700000000000),
+        "labelIds": list(labels),
+        "raw": base64.urlsafe_b64encode(mime.as_bytes()).decode("ascii"),
+    }
+
+
+class FakeGmail:
+    """Threaded HTTP server holding an in-memory mailbox.
+
+    Args:
+        messages (list): Message resources, e.g. built with make_message().
+        latency (float): Seconds slept per round trip, a batch request paying it once for all its parts.
+        throttle (set): Message ids answered with 429 the first time they are fetched.
+        page_size (int): Default messages.list page size.
+    """
+
+    def __init__(self, messages, latency=0.0, throttle=(), page_size=100):
+        self.messages = {message["id"]: message for message in messages}
+        self.latency = latency
+        self.throttle = set(throttle)
+        self.page_size = page_size
+        self.calls = {"list": 0, "get": 0, "batch": 0, "history": 0}
+        self.history_id = 1000
+        self.history = []
+        self.oldest_history_id = self.history_id
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def root_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def service(self):
+        """A googleapiclient Gmail service pointed at this server."""
+        path = f"{googleapiclient.__path__[0]}/discovery_cache/documents/gmail.v1.json"
+        with open(path) as file:
+            document = json.load(file)
+        document["rootUrl"] = self.root_url
+        document["baseUrl"] = self.root_url + document["servicePath"]
+        return build_from_document(document, http=httplib2.Http())
+
+    def add_message(self, message):
+        with self._lock:
+            self.messages[message["id"]] = message
+            self.history_id += 1
+            self.history.append((self.history_id, "messagesAdded", message))
+
+    def delete_message(self, message_id):
+        with self._lock:
+            message = self.messages.pop(message_id)
+            self.history_id += 1
+            self.history.append((self.history_id, "messagesDeleted", message))
+
+    def modify_labels(self, message_id, add=(), remove=()):
+        """Add and remove labels of a message, e.g. TRASH when it is moved to the trash."""
+        with self._lock:
+            message = self.messages[message_id]
+            for kind, labels in (("labelsAdded", add), ("labelsRemoved", remove)):
+                if not labels:
+                    continue
+                if kind == "labelsAdded":
+                    message["labelIds"] = [*message["labelIds"], *labels]
+                else:
+                    message["labelIds"] = [label for label in message["labelIds"] if label not in labels]
+                self.history_id += 1
+                self.history.append((self.history_id, kind, {**message, "changed": list(labels)}))
+
+    def matches(self, message, q):
+        """Whether a message is listed for the query q."""
+        labels = set(message.get("labelIds", []))
+        if labels & {"SPAM", "TRASH"}:
+            return False
+        for term in q.replace("(", " ").replace(")", " ").split():
+            if term.startswith("after:") and int(message["internalDate"]) // 1000 <= int(term.split(":", 1)[1]):
+                return False
+            if term.startswith("label:") and term.split(":", 1)[1].upper() not in labels:
+                return False
+            if term == "is:unread" and "UNREAD" not in labels:
+                return False
+        return True
+
+    def expire_history(self):
+        """Drop the recorded history, like Gmail does after about a week."""
+        with self._lock:
+            self.history = []
+            self.oldest_history_id = self.history_id
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def call(self, method, target, wait=True):
+        """Answer a single API call, returns (status, payload)."""
+        url = urlparse(target)
+        multi = parse_qs(url.query)
+        query = {key: values[0] for key, values in multi.items()}
+        if wait and self.latency:
+            time.sleep(self.latency)
+
+        if method == "GET" and url.path == f"{PREFIX}/messages":
+            self._count("list")
+            ids = [i for i in sorted(self.messages) if self.matches(self.messages[i], query.get("q", ""))]
+            start = int(query.get("pageToken", 0))
+            size = int(query.get("maxResults", self.page_size))
+            page = {"messages": [{"id": i, "threadId": self.messages[i]["threadId"]} for i in ids[start:start + size]]}
+            if start + size < len(ids):
+                page["nextPageToken"] = str(start + size)
+            return 200, page
+
+        if method == "GET" and url.path == f"{PREFIX}/profile":
+            return 200, {"emailAddress": "me@example.com", "historyId": str(self.history_id)}
+
+        if method == "GET" and url.path == f"{PREFIX}/history":
+            self._count("history")
+            start = int(query["startHistoryId"])
+            if start < self.oldest_history_id:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            kinds = {HISTORY_TYPES[t] for t in multi.get("historyTypes", HISTORY_TYPES)}
+            records = []
+            for h, kind, m in self.history:
+                if h <= start or kind not in kinds:
+                    continue
+                item = {"message": {"id": m["id"], "threadId": m["threadId"], "labelIds": m.get("labelIds", [])}}
+                if "changed" in m:
+                    item["labelIds"] = m["changed"]
+                records.append({"id": str(h), kind: [item]})
+            return 200, {"history": records, "historyId": str(self.history_id)}
+
+        if method == "GET" and url.path.startswith(f"{PREFIX}/messages/"):
+            self._count("get")
+            message_id = url.path.rsplit("/", 1)[1]
+            with self._lock:
+                throttled = message_id in self.throttle
+                self.throttle.discard(message_id)
+            if throttled:
+                return 429, {"error": {"code": 429, "message": "Too many concurrent requests for user"}}
+            if message_id not in self.messages:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            return 200, self.messages[message_id]
+
+        return 404, {"error": {"code": 404, "message": f"Unknown endpoint {url.path}"}}
+
+    def batch(self, content_type, body):
+        """Answer a multipart/mixed batch request, returns (content_type, body)."""
+        self._count("batch")
+        if self.latency:
+            time.sleep(self.latency)
+        request = email.message_from_bytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in request.get_payload():
+            inner = part.get_payload()
+            method, target, _ = inner.split("\n", 1)[0].strip().split(" ", 2)
+            status, payload = self.call(method, target, wait=False)
+            content_id = part["Content-ID"][1:-1]
+            parts.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        return f"multipart/mixed; boundary={boundary}", ("".join(parts) + f"--{boundary}--\r\n").encode()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                status, payload = fake.call("GET", self.path)
+                self._send(status, "application/json", json.dumps(payload).encode())
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if urlparse(self.path).path == "/batch":
+                    content_type, body = fake.batch(self.headers["Content-Type"], body)
+                    self._send(200, content_type, body)
+                else:
+                    status, payload = fake.call("POST", self.path)
+                    self._send(status, "application/json", json.dumps(payload).encode())
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
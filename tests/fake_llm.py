@@ -0,0 +1,115 @@
+''' Fake LLMs for the agent tests and benchmarks, answering after a fixed latency without blocking the event loop '''
+import asyncio
+import json
+import time
+from typing import List, Tuple
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, CompletionResponse, LLMMetadata
+from llama_index.core.llms import CustomLLM
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+from llama_index.core.llms.llm import ToolSelection
+
+
+class FakeLLM(CustomLLM):
+    '''
+    ReAct LLM calling its scripted tool calls one per step, then answering with their observations,
+    or at once with the number of user messages it was sent when it has no tool calls
+    '''
+    tool_calls: List[Tuple[str, dict]] = []
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def metadata(self):
+        return LLMMetadata(model_name="fake")
+
+    def reply(self, messages):
+        self.calls += 1
+        observations = [m.content for m in messages if (m.content or "").startswith("Observation:")]
+        if len(observations) < len(self.tool_calls):
+            name, tool_kwargs = self.tool_calls[len(observations)]
+            return f"Thought: I need to use a tool to help me answer the question.\nAction: {name}\nAction Input: {json.dumps(tool_kwargs)}"
+        answer = "; ".join(o[len("Observation:"):].strip() for o in observations) if self.tool_calls else sum(m.role == "user" for m in messages)
+        return f"Thought: I can answer without using any more tools. I'll use the user's language to answer\nAnswer: {answer}"
+
+    def complete(self, prompt, formatted=False, **kwargs):
+        time.sleep(self.latency)
+        return CompletionResponse(text=self.reply([ChatMessage(role="user", content=prompt)]))
+
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        yield self.complete(prompt, formatted, **kwargs)
+
+    async def achat(self, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        return ChatResponse(message=ChatMessage(role="assistant", content=self.reply(messages)))
+
+    async def astream_chat(self, messages, **kwargs):
+        response = await self.achat(messages, **kwargs)
+
+        async def gen():
+            yield ChatResponse(message=response.message, delta=response.message.content)
+
+        return gen()
+
+
+class FakeToolLLM(FunctionCallingLLM):
+    ''' Function calling LLM asking for a scripted list of tool calls, all in its first step or one per step, then answering with their results '''
+    tool_calls: List[Tuple[str, dict]] = []
+    parallel: bool = True
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def metadata(self):
+        return LLMMetadata(model_name="fake-tools", is_function_calling_model=True)
+
+    def _prepare_chat_with_tools(self, tools, user_msg=None, chat_history=None, verbose=False, allow_parallel_tool_calls=False, **kwargs):
+        return {"messages": list(chat_history or []) + ([ChatMessage(role="user", content=user_msg)] if isinstance(user_msg, str) else [])}
+
+    def get_tool_calls_from_response(self, response, error_on_no_tool_call=True, **kwargs):
+        return response.message.additional_kwargs.get("tool_calls", [])
+
+    async def achat(self, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.calls += 1
+        results = [message.content for message in messages if message.role == "tool"]
+        pending = self.tool_calls[len(results):]
+        if not pending:
+            return ChatResponse(message=ChatMessage(role="assistant", content="; ".join(results)))
+        selections = [
+            ToolSelection(tool_id=f"call-{len(results) + i}", tool_name=name, tool_kwargs=tool_kwargs)
+            for i, (name, tool_kwargs) in enumerate(pending if self.parallel else pending[:1])
+        ]
+        return ChatResponse(message=ChatMessage(role="assistant", content="", additional_kwargs={"tool_calls": selections}))
+
+    async def astream_chat(self, messages, **kwargs):
+        response = await self.achat(messages, **kwargs)
+
+        async def gen():
+            yield response
+
+        return gen()
+
+    def chat(self, messages, **kwargs):
+        return asyncio_run(self.achat(messages, **kwargs))
+
+    def stream_chat(self, messages, **kwargs):
+        yield self.chat(messages, **kwargs)
+
+    def complete(self, prompt, formatted=False, **kwargs):
+        return CompletionResponse(text=self.chat([ChatMessage(role="user", content=prompt)]).message.content)
+
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        yield self.complete(prompt, formatted, **kwargs)
+
+    async def acomplete(self, prompt, formatted=False, **kwargs):
+        response = await self.achat([ChatMessage(role="user", content=prompt)])
+        return CompletionResponse(text=response.message.content)
+
+    async def astream_complete(self, prompt, formatted=False, **kwargs):
+        response = await self.acomplete(prompt, formatted, **kwargs)
+
+        async def gen():
+            yield response
+
+        return gen()
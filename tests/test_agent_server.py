@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from llama_index.core.agent.workflow import AgentWorkflow, ReActAgent
+from alfred.server import AgentServer
+from alfred.utils.agent_client import ask_server
+from alfred.utils.conversation_store import ConversationStore
+from tests.fake_llm import FakeLLM
+
+
+def workflow(llm):
+    agent = ReActAgent(name="counter", description="Counts the questions", system_prompt="Count the questions.", tools=[], llm=llm)
+    return AgentWorkflow(agents=[agent], root_agent="counter")
+
+
+def test_sessions_keep_their_context(tmp_path):
+    llm = FakeLLM(latency=0.2)
+    address = str(tmp_path / "agents.sock")
+
+    async def scenario():
+        server = await AgentServer({"counter": workflow(llm)}, concurrency=4).start(address)
+        async with server:
+            assert await ask_server("first", "counter", session="a", address=address) == "1"
+            # One question of session a after the other, the others at once
+            start = asyncio.get_running_loop().time()
+            answers = await asyncio.gather(
+                ask_server("second", "counter", session="a", address=address),
+                ask_server("first", "counter", session="b", address=address),
+                *(ask_server("alone", "counter", address=address) for _ in range(2)),
+            )
+            elapsed = asyncio.get_running_loop().time() - start
+            with pytest.raises(RuntimeError, match="Unknown agent"):
+                await ask_server("hello", "missing", address=address)
+        return answers, elapsed
+
+    answers, elapsed = asyncio.run(scenario())
+    assert answers == ["2", "1", "1", "1"]
+    assert elapsed < 0.6
+
+
+def test_settings_come_from_the_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("agent_server", str(tmp_path / "env.sock"))
+    monkeypatch.setenv("agent_server_max_sessions", "1")
+
+    async def scenario():
+        agent_server = AgentServer({"counter": workflow(FakeLLM())})
+        server = await agent_server.start()
+        async with server:
+            assert await ask_server("first", "counter", session="a") == "1"
+            assert await ask_server("first", "counter", session="b") == "1"
+            # Session a was dropped for b
+            assert await ask_server("second", "counter", session="a") == "1"
+        return agent_server.max_sessions
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_stored_sessions_are_kept_per_agent(tmp_path):
+    address = str(tmp_path / "agents.sock")
+    store = ConversationStore(str(tmp_path / "conversations.sqlite"))
+
+    async def scenario():
+        agent_server = AgentServer({"counter": workflow(FakeLLM()), "other": workflow(FakeLLM())}, store=store)
+        server = await agent_server.start(address)
+        async with server:
+            await ask_server("first", "counter", session="a", address=address)
+            await ask_server("second", "counter", session="a", address=address)
+            await ask_server("first", "other", session="a", address=address)
+
+    asyncio.run(scenario())
+    assert len(store.history("counter/a")) == 4
+    assert len(store.history("other/a")) == 2
+    assert store.history("a") == []
+
+
+def test_only_a_stale_socket_is_replaced(tmp_path):
+    path = tmp_path / "agents.sock"
+    path.write_text("not a socket")
+
+    async def scenario():
+        with pytest.raises(OSError):
+            await AgentServer({"counter": workflow(FakeLLM())}).start(str(path))
+
+    asyncio.run(scenario())
+    assert path.read_text() == "not a socket"
+
+
+if __name__ == '__main__':
+    pytest.main()
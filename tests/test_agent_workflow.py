@@ -0,0 +1,70 @@
+import asyncio
+import time
+import pytest
+from llama_index.core.agent.workflow import FunctionAgent
+from llama_index.core.tools import FunctionTool
+from alfred.utils.agent_workflow import ParallelAgentWorkflow
+from tests.fake_llm import FakeToolLLM
+
+
+async def stock_quote(symbol: str) -> str:
+    """Current price of a stock."""
+    await asyncio.sleep(0.3)
+    return f"{symbol} 120 USD"
+
+
+def exchange_rate(base: str, target: str) -> str:
+    """Exchange rate between two currencies."""
+    time.sleep(0.3)
+    return f"1 {base} = 0.92 {target}"
+
+
+async def slow_news(symbol: str) -> str:
+    """News about a stock."""
+    await asyncio.sleep(5)
+    return "too late"
+
+
+def run(tool_calls, tools, **kwargs):
+    llm = FakeToolLLM(tool_calls=tool_calls)
+    agent = FunctionAgent(name="broker", description="Stock broker", system_prompt="Answer.", tools=tools, llm=llm)
+    workflow = ParallelAgentWorkflow(agents=[agent], root_agent="broker", **kwargs)
+
+    async def ask():
+        return await workflow.run(user_msg="Price of NVDA in EUR?")
+
+    start = time.perf_counter()
+    response = asyncio.run(ask())
+    return str(response), time.perf_counter() - start, llm.calls
+
+
+def test_tool_calls_of_a_step_run_concurrently():
+    tools = [FunctionTool.from_defaults(async_fn=stock_quote), FunctionTool.from_defaults(fn=exchange_rate)]
+    tool_calls = [
+        ("stock_quote", {"symbol": "NVDA"}),
+        ("stock_quote", {"symbol": "AMD"}),
+        ("exchange_rate", {"base": "USD", "target": "EUR"}),
+    ]
+    response, elapsed, calls = run(tool_calls, tools)
+    assert "NVDA 120 USD" in response and "AMD 120 USD" in response and "1 USD = 0.92 EUR" in response
+    assert calls == 2
+    assert elapsed < 0.6
+
+
+def test_slow_tools_time_out():
+    tools = [FunctionTool.from_defaults(async_fn=stock_quote), FunctionTool.from_defaults(async_fn=slow_news)]
+    response, elapsed, _ = run([("stock_quote", {"symbol": "NVDA"}), ("slow_news", {"symbol": "NVDA"})], tools, tool_timeout=0.5)
+    assert "NVDA 120 USD" in response and "did not answer within 0.5 seconds" in response
+    assert elapsed < 2
+
+
+def test_tool_timeout_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("agent_tool_timeout", "0.5")
+    tools = [FunctionTool.from_defaults(async_fn=slow_news)]
+    response, elapsed, _ = run([("slow_news", {"symbol": "NVDA"})], tools)
+    assert "did not answer within 0.5 seconds" in response
+    assert elapsed < 2
+
+
+if __name__ == '__main__':
+    pytest.main()
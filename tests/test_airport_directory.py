@@ -0,0 +1,46 @@
+import json
+import pytest
+from alfred.tools.airport_directory import AirportDirectory, airport_entry
+
+AIRPORTS = [
+    {"id": "FRA", "iata": "FRA", "name": "Frankfurt am Main", "location": "Frankfurt, Germany"},
+    {"id": "HHN", "iata": "HHN", "name": "Frankfurt Hahn", "location": "Hahn, Germany"},
+    {"id": "STR", "iata": "STR", "name": "Stuttgart", "location": "Stuttgart, Germany"},
+    {"id": "ZRH", "iata": "ZRH", "name": "Zürich", "location": "Zürich, Switzerland"},
+    {"id": "CDG", "iata": "CDG", "name": "Paris Charles de Gaulle", "location": "Paris, France"},
+]
+
+
+@pytest.fixture
+def directory():
+    return AirportDirectory([airport_entry(a) for a in AIRPORTS])
+
+
+def test_lookup_by_code_name_prefix_and_typo(directory):
+    assert directory.lookup("str")[0]["code"] == "STR"
+    assert {a["code"] for a in directory.lookup("frankfurt")} == {"FRA", "HHN"}
+    assert directory.lookup("charles de")[0]["code"] == "CDG"
+    assert directory.lookup("zurich")[0]["code"] == "ZRH"
+    assert directory.lookup("stutgart")[0]["code"] == "STR"
+    assert directory.lookup("germany", limit=2) and len(directory.lookup("germany", limit=2)) == 2
+    assert len(directory.lookup("germany", limit="1")) == 1
+
+
+def test_airport_list_is_downloaded_once(tmp_path):
+    path = str(tmp_path / "airports.json")
+    downloads = []
+
+    def fetch():
+        downloads.append(1)
+        return {"data": AIRPORTS}
+
+    AirportDirectory.load(fetch, path)
+    directory = AirportDirectory.load(fetch, path)
+
+    assert len(downloads) == 1
+    assert len(directory.airports) == len(AIRPORTS)
+    assert json.load(open(path))[0]["city"] == "Frankfurt"
+
+
+if __name__ == '__main__':
+    pytest.main()
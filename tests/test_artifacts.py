@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from alfred.tools.alphavantage_retreaver import save_result
+from alfred.tools.sandbox import LocalSession
+from alfred.utils.artifacts import list_artifacts, load_artifact, save_artifact
+
+
+@pytest.fixture(autouse=True)
+def directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("artifacts_dir", str(tmp_path))
+    return tmp_path
+
+
+def test_json_and_array_artifacts_round_trip():
+    flights = [{"price": 120.5, "from": "FRA", "to": "LIS"}, {"price": 99.0, "from": "FRA", "to": "OPO"}]
+    summary = save_artifact("../flights fra", flights)
+    assert summary["artifact"] == "flights_fra" and summary["format"] == "json"
+    assert summary["length"] == 2 and summary["item_keys"] == ["price", "from", "to"]
+    assert load_artifact("flights_fra") == flights
+
+    summary = save_artifact("flights_fra", {"price": np.array([120.5, 99.0])})
+    assert summary["format"] == "npz"
+    assert list_artifacts() == ["flights_fra"]
+    np.testing.assert_array_equal(load_artifact("flights_fra")["price"], [120.5, 99.0])
+
+    with pytest.raises(KeyError):
+        load_artifact("missing")
+
+
+def test_series_are_saved_as_columns():
+    payload = {
+        "Meta Data": {"2. Symbol": "NVDA"},
+        "Time Series (Daily)": {
+            "2024-01-03": {"1. open": "2.0", "4. close": "3.0"},
+            "2024-01-02": {"1. open": "1.0", "4. close": "2.0"},
+        },
+    }
+    summary = save_result("nvda", payload)
+    assert summary["rows"] == 2 and summary["last_date"] == "2024-01-03"
+    assert load_artifact("nvda") == {"date": ["2024-01-02", "2024-01-03"], "open": [1.0, 2.0], "close": [2.0, 3.0]}
+
+    assert save_result("quota", {"Note": "Thank you for using Alpha Vantage"}) == {"Note": "Thank you for using Alpha Vantage"}
+    assert list_artifacts() == ["nvda"]
+
+
+def test_sandbox_loads_artifacts_by_name():
+    save_artifact("prices", {"date": ["2024-01-02", "2024-01-03"], "close": [2.0, 3.0]})
+    session = LocalSession(memory_mb=512)
+    try:
+        result = session.execute("data = load_artifact('prices')\nprint(list_artifacts())\nsum(data['close'])")
+        assert result["error"] is None
+        assert result["stdout"] == "['prices']\n5.0\n"
+        assert "KeyError" in session.execute("load_artifact('missing')")["error"]
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    pytest.main()
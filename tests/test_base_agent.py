@@ -0,0 +1,73 @@
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from alfred.utils.base_agent import resolve_agent_type
+from tests.fake_llm import FakeLLM, FakeToolLLM
+
+
+class FakeOllama(FakeToolLLM):
+    ''' Like the Ollama integration, claims native tool calling whatever the model '''
+    model: str
+    base_url: str
+
+    @classmethod
+    def class_name(cls):
+        return "Ollama_llm"
+
+
+class ShowHandler(BaseHTTPRequestHandler):
+    ''' /api/show of an Ollama server, with or without the capabilities field '''
+    MODELS = {
+        "llama3.1": {"capabilities": ["completion", "tools"]},
+        "deepseek-r1": {"capabilities": ["completion"]},
+        "mistral": {"template": "{{- if .Tools }}[AVAILABLE_TOOLS] {{ json .Tools }}[/AVAILABLE_TOOLS]{{- end }}"},
+        "olmo2": {"template": "{{ .Prompt }}"},
+    }
+
+    def do_POST(self):
+        model = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["model"]
+        payload = json.dumps(self.MODELS.get(model, {})).encode()
+        self.send_response(200 if model in self.MODELS else 404)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def ollama():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ShowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_auto_uses_native_tool_calling_when_supported():
+    assert resolve_agent_type("auto", FakeToolLLM()) == "function"
+    assert resolve_agent_type("auto", FakeLLM()) == "react"
+
+
+def test_function_falls_back_to_react():
+    assert resolve_agent_type("function", FakeToolLLM()) == "function"
+    assert resolve_agent_type("function", FakeLLM()) == "react"
+    assert resolve_agent_type("react", FakeToolLLM()) == "react"
+
+
+def test_ollama_models_without_tool_support_use_react(ollama):
+    assert resolve_agent_type("auto", FakeOllama(model="llama3.1", base_url=ollama)) == "function"
+    assert resolve_agent_type("auto", FakeOllama(model="mistral", base_url=ollama)) == "function"
+    assert resolve_agent_type("auto", FakeOllama(model="deepseek-r1", base_url=ollama)) == "react"
+    assert resolve_agent_type("function", FakeOllama(model="olmo2", base_url=ollama)) == "react"
+    assert resolve_agent_type("auto", FakeOllama(model="unknown", base_url=ollama)) == "react"
+
+
+def test_unknown_agent_type():
+    with pytest.raises(ValueError):
+        resolve_agent_type("plan", FakeLLM())
+
+
+if __name__ == '__main__':
+    pytest.main()
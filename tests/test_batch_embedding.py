@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+from alfred.utils.batch_embedding import aembed_texts, batched, embed_texts
+
+
+class SlowEmbedding(MockEmbedding):
+    ''' Mock embedding taking longer for the first batches, recording the batches in flight '''
+    in_flight: int = 0
+    max_in_flight: int = 0
+    embed_batch_size: int = 1000
+
+    async def _aget_text_embeddings(self, texts):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.05 if texts[0] == "0" else 0.01)
+        self.in_flight -= 1
+        return [[float(t)] * self.embed_dim for t in texts]
+
+
+def test_batched():
+    assert batched(list(range(7)), 3) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert batched([], 3) == []
+
+
+def test_order_is_preserved_across_batches():
+    model = SlowEmbedding(embed_dim=2)
+    texts = [str(i) for i in range(23)]
+    embeddings = asyncio.run(aembed_texts(model, texts, batch_size=4, concurrency=3))
+    assert [e[0] for e in embeddings] == [float(i) for i in range(23)]
+    assert model.max_in_flight == 3
+
+
+def test_concurrency_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("embed_batch_size", "2")
+    monkeypatch.setenv("embed_concurrency", "2")
+    model = SlowEmbedding(embed_dim=2)
+    assert len(embed_texts(model, [str(i) for i in range(10)])) == 10
+    assert model.max_in_flight == 2
+
+
+if __name__ == '__main__':
+    pytest.main()
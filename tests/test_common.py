@@ -0,0 +1,25 @@
+import subprocess
+import sys
+import pytest
+from llama_index.core.llms import MockLLM
+from alfred.utils import common
+
+
+def test_llms_are_created_once_per_model_name():
+    created = []
+    common.register_llm("mock", lambda name: created.append(name) or MockLLM())
+    llm = common.get_llm("mock")
+    assert common.get_llm("mock") is llm
+    assert created == ["mock"]
+
+
+def test_importing_common_loads_no_provider():
+    code = (
+        "import sys, alfred.utils.common\n"
+        "print([m for m in ('chromadb', 'llama_index.core', 'llama_index.llms.ollama', 'llama_index.llms.azure_openai') if m in sys.modules])"
+    )
+    assert subprocess.check_output([sys.executable, "-c", code], text=True).strip() == "[]"
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,99 @@
+import threading
+import time
+import pytest
+from alfred.tools import alphavantage_retreaver
+from alfred.tools.alphavantage_retreaver import AlphaVantageToolSpec, compact_fields
+from alfred.utils.timeseries_store import TimeSeriesStore
+
+
+def quote(symbol, price):
+    return {"Global Quote": {"01. symbol": symbol, "05. price": price, "10. change percent": "1.2%"}}
+
+
+def daily(closes):
+    dates = [f"2025-01-{day:02d}" for day in range(2, 2 + len(closes))]
+    return {"Meta Data": {}, "Time Series (Daily)": {d: {"4. close": str(c)} for d, c in zip(dates, closes)}}
+
+
+@pytest.fixture
+def tool(tmp_path, monkeypatch):
+    alphavantage_retreaver.RESPONSE_CACHE.clear()
+    monkeypatch.setenv("timeseries_db", str(tmp_path / "timeseries.sqlite"))
+    tool = AlphaVantageToolSpec()
+    tool.requests = []
+    return tool
+
+
+def test_compact_fields():
+    assert compact_fields(quote("NVDA", "120.5")) == {"symbol": "NVDA", "price": "120.5", "change_percent": "1.2%"}
+    assert compact_fields({"Symbol": "NVDA", "Sector": "TECH", "Officers": [{"name": "x"}]}) == {"Symbol": "NVDA", "Sector": "TECH"}
+
+
+def test_quotes_are_compared_in_one_table(tool, monkeypatch):
+    def request(function, parameters):
+        tool.requests.append((function, parameters))
+        if parameters["symbol"] == "FAIL":
+            return {"Error Message": "Invalid API call"}
+        return quote(parameters["symbol"], "100")
+
+    monkeypatch.setattr(tool, "_request", request)
+    table = tool.compare_stocks("nvda, amd;FAIL, NVDA", parameters={"datatype": "json"})
+
+    assert [row[0] for row in table["rows"]] == ["NVDA", "AMD", "FAIL"]
+    assert table["rows"][0][table["columns"].index("price")] == "100"
+    assert "Invalid API call" in table["rows"][2][table["columns"].index("error")]
+    assert all(parameters["datatype"] == "json" for _, parameters in tool.requests)
+
+
+def test_series_are_summarized_and_reject_parameters(tool, monkeypatch):
+    monkeypatch.setattr(tool, "_request", lambda function, parameters: daily([100, 110, 121]))
+
+    table = tool.compare_stocks(["NVDA", "AMD"], function="TIME_SERIES_DAILY")
+    assert table["columns"] == ["symbol", *alphavantage_retreaver.COMPARE_SERIES_FIELDS]
+    row = dict(zip(table["columns"], table["rows"][0]))
+    assert row["last_close"] == 121 and row["total_return_pct"] == pytest.approx(21)
+
+    error = tool.compare_stocks(["NVDA"], function="TIME_SERIES_DAILY", parameters={"outputsize": "full"})
+    assert "not supported" in error["error"]
+
+
+def test_only_series_can_be_analyzed(tool, monkeypatch):
+    monkeypatch.setattr(tool, "_request", lambda function, parameters: pytest.fail("requested"))
+    assert "TIME_SERIES_DAILY" in tool.analyze_stock("NVDA", "GLOBAL_QUOTE")["error"]
+    assert "error" in tool.analyze_stock("NVDA", "TIME_SERIES_INTRADAY")
+
+
+def test_analyze_stock_arguments(tool, monkeypatch):
+    def request(function, parameters):
+        tool.requests.append(parameters)
+        return daily([100, 110, 121])
+
+    monkeypatch.setattr(tool, "_request", request)
+    assert tool.analyze_stock("NVDA", window="2")["sma_2"] == pytest.approx(115.5)
+    assert "at least 1" in tool.analyze_stock("NVDA", window=0)["error"]
+    assert "window" in tool.analyze_stock("NVDA", window="a")["error"]
+    assert "YYYY-MM-DD" in tool.analyze_stock("NVDA", end_date="2025-13-01")["error"]
+    assert "No data points" in tool.analyze_stock("NVDA", start_date="2025-02-01")["error"]
+
+    tool.analyze_stock("AMD", end_date="2025-01-03")
+    assert tool.requests[-1]["outputsize"] == "full"
+
+
+def test_threads_share_one_timeseries_store(tool, monkeypatch):
+    class SlowStore(TimeSeriesStore):
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.1)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(alphavantage_retreaver, "TimeSeriesStore", SlowStore)
+    stores = []
+    threads = [threading.Thread(target=lambda: stores.append(tool.timeseries_store())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(store) for store in stores}) == 1
+
+
+if __name__ == '__main__':
+    pytest.main()
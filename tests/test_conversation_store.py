@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from llama_index.core.agent.workflow import AgentWorkflow, ReActAgent
+from llama_index.core.base.llms.types import ChatMessage
+from alfred.utils.conversation_store import ConversationStore, run_turn
+from tests.fake_llm import FakeLLM
+
+
+def turn(question, answer):
+    return [ChatMessage(role="user", content=question), ChatMessage(role="assistant", content=answer)]
+
+
+def test_turns_are_appended_per_session(tmp_path):
+    path = str(tmp_path / "conversations.sqlite")
+    first, second = ConversationStore(path), ConversationStore(path)
+    first.append("broker", turn("Price of NVDA?", "It is 120 USD."))
+    second.append("travel", turn("Flights to Lisbon?", "The cheapest is 99 EUR."))
+    second.append("broker", turn("And AMD?", "It is 160 USD."))
+
+    assert [m.content for m in first.history("broker")] == ["Price of NVDA?", "It is 120 USD.", "And AMD?", "It is 160 USD."]
+    assert first.sessions() == ["broker", "travel"]
+    first.clear("travel")
+    assert second.history("travel") == []
+
+
+def test_old_turns_are_compacted_into_a_summary(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite"), token_budget=100)
+    summarized = []
+
+    def summarize(summary, messages):
+        summarized.append([m.content for m in messages])
+        return f"{len(messages)} messages about stocks"
+
+    for i in range(10):
+        store.append("broker", turn(f"Question {i} " + "x" * 60, f"Answer {i} " + "y" * 60))
+        store.compact("broker", summarize)
+
+    history = store.history("broker")
+    assert history[0].role.value == "system" and "messages about stocks" in history[0].content
+    assert history[-2].content.startswith("Question 9") and history[-1].content.startswith("Answer 9")
+    assert store.tokens("broker") <= 100
+    assert summarized[0][0].startswith("Question 0")
+
+
+def test_token_budget_comes_from_the_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("conversation_token_budget", "123")
+    assert ConversationStore(str(tmp_path / "conversations.sqlite")).token_budget == 123
+
+
+def test_run_turn_hands_the_history_to_the_agent(tmp_path):
+    agent = ReActAgent(name="counter", description="Counts the questions", system_prompt="Count the questions.", tools=[], llm=FakeLLM())
+    workflow = AgentWorkflow(agents=[agent], root_agent="counter")
+    path = str(tmp_path / "conversations.sqlite")
+
+    async def ask(question):
+        return await run_turn(workflow, ConversationStore(path), "counter", question)
+
+    assert asyncio.run(ask("first")) == "1"
+    assert asyncio.run(ask("second")) == "2"
+    assert len(ConversationStore(path).history("counter")) == 4
+
+
+if __name__ == '__main__':
+    pytest.main()
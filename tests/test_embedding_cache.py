@@ -0,0 +1,53 @@
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+from alfred.utils.embedding_cache import CachedEmbedding, EmbeddingStore, cache_embeddings
+
+
+class CountingEmbedding(MockEmbedding):
+    ''' Mock embedding that counts how many texts reach the model '''
+    calls: int = 0
+
+    def _get_text_embeddings(self, texts):
+        self.calls += len(texts)
+        return [[float(len(t))] * self.embed_dim for t in texts]
+
+    def _get_query_embedding(self, query):
+        self.calls += 1
+        return [float(len(query))] * self.embed_dim
+
+
+def test_repeated_texts_hit_the_cache(tmp_path):
+    model = CountingEmbedding(embed_dim=4)
+    cached = cache_embeddings(model, 4, path=str(tmp_path / "cache.sqlite"))
+
+    first = cached.get_text_embedding_batch(["alpha", "beta", "alpha"])
+    second = cached.get_text_embedding_batch(["beta", "alpha"])
+    cached.get_query_embedding("alpha")
+
+    assert first[0] == first[2] == second[1]
+    assert model.calls == 3
+    assert cached.cache_info()["hits"] == 3
+    assert cached.cache_info()["misses"] == 3
+
+
+def test_disk_store_survives_a_new_wrapper(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache_embeddings(CountingEmbedding(embed_dim=4), 4, path=path).get_text_embedding("gamma")
+
+    model = CountingEmbedding(embed_dim=4)
+    cached = cache_embeddings(model, 4, path=path)
+    assert cached.get_text_embedding("gamma") == [5.0] * 4
+    assert model.calls == 0
+
+
+def test_memory_and_disk_are_size_bounded(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cached = CachedEmbedding(CountingEmbedding(embed_dim=2), 2, store=store, max_memory_entries=1)
+    cached.get_text_embedding_batch(["a", "bb", "ccc"])
+
+    assert cached.cache_info()["memory_entries"] == 1
+    assert len(store) == 2
+
+
+if __name__ == '__main__':
+    pytest.main()
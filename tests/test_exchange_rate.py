@@ -0,0 +1,82 @@
+import asyncio
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from alfred.tools.exchange_rate import RATES_CACHE, ExchangeRateError, ExchangeRateTool
+
+
+class RatesHandler(BaseHTTPRequestHandler):
+    ''' Answers /latest/<base> with a rate table, any other path without one '''
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if "/latest/" in url.path:
+            self.server.rate_downloads += 1
+            body = {"base": url.path.rsplit("/", 1)[-1], "rates": {"EUR": 0.5, "USD": 1.0}}
+        else:
+            body = {"path": url.path}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RatesHandler)
+    server.rate_downloads = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server
+    server.shutdown()
+
+
+@pytest.fixture
+def tool(server):
+    RATES_CACHE.clear()
+    server[1].rate_downloads = 0
+    tool = ExchangeRateTool()
+    tool.api_url = f"{server[0]}/latest/"
+    return tool
+
+
+def test_exchange_rates_are_downloaded_once_for_every_pair(tool, server):
+    assert tool.convert_many([10, 20], "EUR", "USD") == [20.0, 40.0]
+    assert tool.get_exchange_rates("eur") == {"EUR": 1.0, "USD": 2.0}
+    assert tool.convert(1, "USD", "EUR") == 0.5
+    with pytest.raises(ValueError):
+        tool.convert(1, "USD", "XYZ")
+
+    assert server[1].rate_downloads == 1
+
+
+def test_failed_rate_downloads_are_reported_and_retried(tool, server):
+    # Answered without a rate table
+    tool.api_url = f"{server[0]}/broken/"
+    with pytest.raises(ExchangeRateError, match="without rates"):
+        tool.convert(1, "USD", "EUR")
+    with pytest.raises(ExchangeRateError):
+        asyncio.run(tool.aconvert_many([1], "USD", "EUR"))
+
+    tool.api_url = f"{server[0]}/latest/"
+    assert tool.convert(3, "USD", "EUR") == 1.5
+    assert asyncio.run(tool.aconvert(1 / 3, "USD", "EUR")) == 0.17
+
+
+def test_ttl_is_read_when_the_rates_are_stored(tool, server, monkeypatch):
+    monkeypatch.setenv("exchange_rates_ttl", "0")
+    tool.convert(1, "USD", "EUR")
+    tool.convert(1, "USD", "EUR")
+    assert server[1].rate_downloads == 2
+
+
+if __name__ == '__main__':
+    pytest.main()
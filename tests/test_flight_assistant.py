@@ -0,0 +1,58 @@
+import pytest
+from alfred.tools.flight_assistant import FlightAssistantTool
+
+# Price calendars of January and February: the cheapest days are on both sides of the month boundary
+CALENDARS = {
+    ("FRA", "LIS", "2025-01"): {"data": {"flights": {"days": [
+        {"day": "2025-01-30", "price": 120}, {"day": "2025-01-31", "price": 45}, {"price": 45},
+    ]}}},
+    ("FRA", "LIS", "2025-02"): {"data": {"flights": {"days": [
+        {"day": "2025-02-01", "price": 45}, {"day": "2025-02-02", "price": 99},
+    ]}}},
+    ("MUC", "LIS", "2025-01"): {"data": {"PriceGrids": {"Grid": [[{"DirectOutbound": {"Price": 60}}]]}}},
+    ("MUC", "LIS", "2025-02"): {"message": "You have exceeded the rate limit"},
+}
+
+
+class FakeCalendarTool(FlightAssistantTool):
+    ''' Answers the price calendar searches from CALENDARS and records them '''
+
+    def __init__(self):
+        super().__init__()
+        self.searches = []
+
+    async def _aget(self, endpoint, querystring):
+        key = (querystring["fromEntityId"], querystring["toEntityId"], querystring["yearMonth"])
+        self.searches.append(key)
+        return CALENDARS[key]
+
+
+def test_cheapest_flexible_flights_across_months_and_airports():
+    tool = FakeCalendarTool()
+    options = tool.cheapest_flexible_flights(["FRA", "MUC"], "LIS", "2025-01", "2025-02", limit=4)
+
+    assert sorted(tool.searches) == sorted(CALENDARS)
+    assert [(o["date"], o["price"], o["from"]) for o in options] == [
+        ("2025-01-31", 45, "FRA"), ("2025-02-01", 45, "FRA"), ("2025-01-01", 60, "MUC"), ("2025-02-02", 99, "FRA"),
+    ]
+    assert options[2]["direct"] is True and options[0]["currency"] == "EUR"
+
+
+def test_same_airport_is_not_searched():
+    tool = FakeCalendarTool()
+    assert tool.cheapest_flexible_flights("FRA,LIS", "LIS", "2025-01", "2025-01", limit=1) == [
+        {"date": "2025-01-31", "price": 45, "from": "FRA", "to": "LIS", "direct": None, "currency": "EUR"}
+    ]
+    assert tool.searches == [("FRA", "LIS", "2025-01")]
+
+
+def test_limit_is_coerced_and_bad_month_ranges_are_reported():
+    tool = FakeCalendarTool()
+    assert len(tool.cheapest_flexible_flights("FRA", "LIS", "2025-01", "2025-02", limit="2")) == 2
+    for from_month, to_month in (("2025-02", "2025-01"), ("January", "2025-02"), ("2025-13", "2026-01")):
+        assert "error" in tool.cheapest_flexible_flights("FRA", "LIS", from_month, to_month)
+    assert len(tool.searches) == 2
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import sys
+import pytest
+from alfred.tools import flight_parsing
+from alfred.tools.flight_parsing import cheapest_itineraries, acheapest_itineraries, iter_calendar_prices, month_range
+
+
+def itinerary(i, price):
+    return {
+        "id": f"it-{i}",
+        "price": {"raw": price, "formatted": f"€{price}"},
+        "legs": [{
+            "origin": {"displayCode": "FRA"},
+            "destination": {"displayCode": "STR"},
+            "departure": "2025-05-01T08:00:00",
+            "arrival": "2025-05-01T09:00:00",
+            "durationInMinutes": 60,
+            "stopCount": 0,
+            "carriers": {"marketing": [{"name": "Lufthansa", "logoUrl": "x" * 200}]},
+            "segments": [{"flightNumber": str(i)}] * 5,
+        }],
+        "farePolicy": {"isChangeAllowed": False},
+    }
+
+
+def chunks(payload, size=512):
+    data = json.dumps(payload).encode()
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+PAYLOAD = {"data": {"itineraries": [itinerary(i, 500 - (i * 37) % 400) for i in range(200)]}, "status": True}
+EXPECTED = sorted(it["price"]["raw"] for it in PAYLOAD["data"]["itineraries"])[:5]
+
+
+@pytest.fixture(params=["ijson", "json"])
+def parser(request, monkeypatch):
+    # ijson is a dependency, the json path is the fallback of installs without it
+    if request.param == "json":
+        monkeypatch.setitem(sys.modules, "ijson", None)
+    fallbacks = []
+    monkeypatch.setattr(flight_parsing, "_without_ijson", lambda: fallbacks.append(True))
+    yield request.param
+    assert bool(fallbacks) == (request.param == "json")
+
+
+def test_only_the_cheapest_itineraries_are_kept(parser):
+    result = cheapest_itineraries(chunks(PAYLOAD), limit=5)
+
+    assert [it["price"] for it in result["itineraries"]] == EXPECTED
+    assert result["total_itineraries"] == 200
+    assert result["itineraries"][0]["legs"][0] == {
+        "from": "FRA", "to": "STR",
+        "departure": "2025-05-01T08:00:00", "arrival": "2025-05-01T09:00:00",
+        "duration_minutes": 60, "stops": 0, "carriers": ["Lufthansa"],
+    }
+
+
+def test_async_parsing_and_error_payloads(parser):
+    async def stream(payload):
+        for chunk in chunks(payload):
+            yield chunk
+
+    result = asyncio.run(acheapest_itineraries(stream(PAYLOAD), limit=5))
+    assert [it["price"] for it in result["itineraries"]] == EXPECTED
+
+    error = cheapest_itineraries(chunks({"status": False, "message": "invalid entity"}))
+    assert error == {"itineraries": [], "total_itineraries": 0, "status": False, "message": "invalid entity"}
+
+
+def test_month_range_crosses_years():
+    assert month_range("2024-11", "2025-02") == ["2024-11", "2024-12", "2025-01", "2025-02"]
+    assert month_range("2025-03-15", "2025-03") == ["2025-03"]
+    assert month_range("2025-04", "2025-03") == []
+    with pytest.raises(ValueError):
+        month_range("2025-13", "2026-01")
+
+
+def test_calendar_prices_of_both_layouts():
+    days = {"data": {"flights": {"days": [{"day": "2025-01-31", "price": 80}, {"day": "2025-01-30", "price": None}, {"price": 70}]}}}
+    assert list(iter_calendar_prices(days, "2025-01")) == [("2025-01-31", 80, None), (None, 70, None)]
+
+    grid = {"data": {"PriceGrids": {"Grid": [[
+        {"DirectOutbound": {"Price": 90}, "IndirectOutbound": {"Price": 60}},
+        {},
+        {"Direct": {"Price": 50}},
+    ]]}}}
+    assert list(iter_calendar_prices(grid, "2025-02")) == [("2025-02-01", 60, False), ("2025-02-03", 50, True)]
+    assert list(iter_calendar_prices({"message": "quota exceeded"}, "2025-02")) == []
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,65 @@
+import json
+import pytest
+import numpy as np
+from alfred.utils.function_catalog import FunctionCatalog
+
+
+class WordEmbedding:
+    ''' Deterministic bag-of-words embedding, good enough to rank short descriptions '''
+    model_name = "words"
+
+    def _embed(self, text):
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[sum(map(ord, word)) % 64] += 1.0
+        return vector.tolist()
+
+    def get_text_embedding_batch(self, texts):
+        return [self._embed(t) for t in texts]
+
+    async def aget_text_embedding_batch(self, texts):
+        return self.get_text_embedding_batch(texts)
+
+    def get_query_embedding(self, query):
+        return self._embed(query)
+
+
+@pytest.fixture
+def fcts_path(tmp_path):
+    functions = [
+        {"function": "GLOBAL_QUOTE", "description": "latest price and volume of a ticker", "parameters": {}},
+        {"function": "OVERVIEW", "description": "company information financial ratios", "parameters": {}},
+        {"function": "FX_DAILY", "description": "daily exchange rate currency pair", "parameters": {}},
+    ]
+    path = tmp_path / "functions.json"
+    path.write_text(json.dumps(functions))
+    return str(path)
+
+
+def test_load_builds_and_memory_maps(fcts_path, tmp_path):
+    embed_model = WordEmbedding()
+    catalog = FunctionCatalog.load(fcts_path, embed_model, catalog_dir=str(tmp_path / "catalog"))
+    assert len(catalog) == 3
+
+    reloaded = FunctionCatalog.load(fcts_path, embed_model, catalog_dir=str(tmp_path / "catalog"), build=False)
+    assert isinstance(reloaded.embeddings, np.memmap)
+    assert reloaded.embeddings.dtype == np.float16
+
+
+def test_search_ranks_best_match_first(fcts_path, tmp_path):
+    embed_model = WordEmbedding()
+    catalog = FunctionCatalog.load(fcts_path, embed_model, catalog_dir=str(tmp_path / "catalog"))
+
+    result = catalog.search(embed_model.get_query_embedding("daily exchange rate"), k=2)
+    assert [r["function"] for r in result][0] == "FX_DAILY"
+    assert len(result) == 2
+
+    batch = catalog.search(
+        [embed_model.get_query_embedding("latest price"), embed_model.get_query_embedding("company ratios")],
+        k=1,
+    )
+    assert [r[0]["function"] for r in batch] == ["GLOBAL_QUOTE", "OVERVIEW"]
+
+
+if __name__ == '__main__':
+    pytest.main()
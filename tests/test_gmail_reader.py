@@ -0,0 +1,158 @@
+import pytest
+from alfred.tools.gmail_reader import GmailReader
+from tests.fake_gmail import FakeGmail, make_message
+
+
+def test_batched_fetch_returns_every_message_in_order():
+    ''' Messages are fetched in batches of batch_size and keep the listing order '''
+    messages = [make_message(f"m{i:03d}", text=f"Body {i}") for i in range(25)]
+    with FakeGmail(messages, page_size=10) as gmail:
+        reader = GmailReader(service=gmail.service(), query="", batch_size=10)
+        result = reader.search_messages()
+
+    assert [m["id"] for m in result] == [m["id"] for m in messages]
+    assert "Body 7" in result[7]["body"]
+    assert gmail.calls["batch"] == 3
+    assert gmail.calls["get"] == 25
+
+
+def test_throttled_messages_are_retried(monkeypatch):
+    ''' Parts answered with 429 are sent again in a later batch instead of being dropped '''
+    monkeypatch.setattr("alfred.tools.gmail_reader.time.sleep", lambda seconds: None)
+    messages = [make_message(f"m{i}") for i in range(6)]
+    with FakeGmail(messages, throttle={"m1", "m4"}) as gmail:
+        reader = GmailReader(service=gmail.service(), query="", batch_size=50)
+        result = reader.search_messages()
+
+    assert sorted(m["id"] for m in result) == [m["id"] for m in messages]
+    assert gmail.calls["batch"] == 2
+    assert gmail.calls["get"] == 8
+
+
+def test_missing_messages_are_skipped():
+    ''' A message deleted between listing and fetching is skipped, not retried '''
+    with FakeGmail([make_message("a"), make_message("b")]) as gmail:
+        reader = GmailReader(service=gmail.service(), query="")
+        fetched = list(reader.fetch_messages(["a", "gone", "b"]))
+
+    assert [m["id"] for m in fetched] == ["a", "b"]
+    assert gmail.calls["batch"] == 1
+
+
+def test_lazy_load_yields_documents_and_honours_max_results():
+    messages = [make_message(f"m{i:03d}", text=f"Body {i}") for i in range(30)]
+    with FakeGmail(messages) as gmail:
+        reader = GmailReader(service=gmail.service(), query="", max_results=12, results_per_page=5)
+        documents = list(reader.lazy_load_data())
+
+    assert [d.metadata["id"] for d in documents] == [f"m{i:03d}" for i in range(12)]
+    assert "Body 3" in documents[3].text
+    assert gmail.calls["list"] == 3
+    assert gmail.calls["get"] == 12
+
+
+def test_lazy_load_fetches_ahead_within_the_window():
+    ''' Stopping early leaves the rest of the mailbox unfetched '''
+    messages = [make_message(f"m{i:03d}") for i in range(200)]
+    with FakeGmail(messages, page_size=20) as gmail:
+        reader = GmailReader(service=gmail.service(), query="", batch_size=10, max_in_flight=10)
+        documents = reader.lazy_load_data()
+        first = [next(documents) for _ in range(3)]
+        documents.close()
+
+    assert [d.metadata["id"] for d in first] == ["m000", "m001", "m002"]
+    assert gmail.calls["get"] <= 30
+
+
+def test_fast_parser_across_processes():
+    ''' The default parser also reads HTML only messages, and gives the same result in a process pool '''
+    messages = [make_message("html", text=None, html="<p>Only <b>HTML</b></p>"), make_message("plain", text="Plain")]
+    with FakeGmail(messages) as gmail:
+        inline = GmailReader(service=gmail.service(), query="").load_data()
+        pooled = GmailReader(service=gmail.service(), query="", parse_processes=2).load_data()
+
+    assert [d.text for d in inline] == [d.text for d in pooled]
+    assert inline[0].text == "Only HTML"
+    assert inline[1].text.strip() == "Plain"
+
+
+def test_sync_only_fetches_changes(tmp_path):
+    ''' After a first full sync, only the messages added since are downloaded and deleted ones dropped '''
+    store_path = str(tmp_path / "gmail.sqlite")
+    with FakeGmail([make_message(f"m{i}", internal_date=1700000000000 + i) for i in range(5)]) as gmail:
+        reader = GmailReader(service=gmail.service(), query="", sync=True, store_path=store_path)
+        assert len(list(reader.sync_messages())) == 5
+        assert gmail.calls["get"] == 5
+
+        gmail.add_message(make_message("new", text="Fresh news", internal_date=1800000000000))
+        gmail.delete_message("m2")
+        messages = list(reader.sync_messages())
+
+        assert [m["id"] for m in messages] == ["new", "m4", "m3", "m1", "m0"]
+        assert "Fresh news" in messages[0]["body"]
+        assert gmail.calls["get"] == 6
+        assert gmail.calls["list"] == 1
+
+        # Nothing changed: one history call, no download
+        reader.sync_messages()
+        assert gmail.calls["get"] == 6
+
+
+def test_sync_with_expired_history_resyncs(tmp_path):
+    ''' A 404 on the stored historyId falls back to a full sync '''
+    store_path = str(tmp_path / "gmail.sqlite")
+    with FakeGmail([make_message("a"), make_message("b")]) as gmail:
+        reader = GmailReader(service=gmail.service(), query="", sync=True, store_path=store_path)
+        reader.sync_messages()
+        gmail.delete_message("a")
+        gmail.expire_history()
+
+        assert [m["id"] for m in reader.sync_messages()] == ["b"]
+        assert gmail.calls["list"] == 2
+
+
+def test_sync_drops_trashed_messages_and_restores_them(tmp_path):
+    ''' A message moved to the trash leaves the store, and comes back once restored '''
+    store_path = str(tmp_path / "gmail.sqlite")
+    with FakeGmail([make_message("a"), make_message("b")]) as gmail:
+        reader = GmailReader(service=gmail.service(), query="", sync=True, store_path=store_path)
+        reader.sync_messages()
+
+        gmail.modify_labels("a", add=["TRASH"])
+        assert [m["id"] for m in reader.sync_messages()] == ["b"]
+
+        gmail.modify_labels("a", remove=["TRASH"])
+        assert [m["id"] for m in reader.sync_messages()] == ["b", "a"]
+        assert gmail.calls["get"] == 3
+
+
+def test_sync_follows_label_changes_of_the_query(tmp_path):
+    ''' Messages gaining or losing the queried label are added or dropped, old ones included '''
+    store_path = str(tmp_path / "gmail.sqlite")
+    messages = [make_message("old", internal_date=1000), make_message("read"), make_message("unread", labels=("INBOX", "UNREAD"))]
+    with FakeGmail(messages) as gmail:
+        reader = GmailReader(service=gmail.service(), query="is:unread", sync=True, store_path=store_path)
+        assert [m["id"] for m in reader.sync_messages()] == ["unread"]
+
+        gmail.modify_labels("unread", remove=["UNREAD"])
+        gmail.modify_labels("old", add=["UNREAD"])
+        assert [m["id"] for m in reader.sync_messages()] == ["old"]
+
+        gmail.modify_labels("old", add=["SPAM"])
+        assert list(reader.sync_messages()) == []
+
+
+def test_sync_writes_and_reads_the_store_page_by_page(tmp_path, monkeypatch):
+    ''' The full sync is written and the stored messages are read a page at a time, in order '''
+    monkeypatch.setattr("alfred.tools.gmail_store.PAGE_SIZE", 2)
+    store_path = str(tmp_path / "gmail.sqlite")
+    messages = [make_message(f"m{i}", internal_date=1700000000000 + i % 3) for i in range(7)]
+    with FakeGmail(messages) as gmail:
+        reader = GmailReader(service=gmail.service(), query="", sync=True, store_path=store_path, batch_size=3)
+        stored = reader.sync_messages()
+        assert not isinstance(stored, list)
+        assert [m["id"] for m in stored] == ["m5", "m2", "m4", "m1", "m6", "m3", "m0"]
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from alfred.utils.http_client import close_clients, get_client, get_async_client, http_get, ahttp_get
+from alfred.tools.exchange_rate import ExchangeRateTool
+from alfred.tools.flight_assistant import FlightAssistantTool
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    ''' Answers every GET with the path, query and client port it received '''
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.ports.add(self.client_address[1])
+        if "/latest/" in url.path:
+            body = {"base": url.path.rsplit("/", 1)[-1], "rates": {"EUR": 0.5, "USD": 1.0}}
+        else:
+            body = {"path": url.path, "query": parse_qs(url.query)}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.ports = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server
+    server.shutdown()
+
+
+def test_sync_requests_share_one_kept_alive_connection(server):
+    url, stub = server
+    stub.ports.clear()
+    assert get_client() is get_client()
+
+    for _ in range(5):
+        response = http_get(f"{url}/ping", params={"a": 1, "b": None})
+        assert response.json()["query"] == {"a": ["1"]}
+
+    assert len(stub.ports) == 1
+
+
+def test_async_requests_run_concurrently_on_a_pooled_client(server):
+    url, _ = server
+
+    async def run():
+        assert get_async_client() is get_async_client()
+        responses = await asyncio.gather(*(ahttp_get(f"{url}/item/{i}") for i in range(10)))
+        return [r.json()["path"] for r in responses]
+
+    assert asyncio.run(run()) == [f"/item/{i}" for i in range(10)]
+
+
+def test_tools_expose_sync_and_async_variants(server):
+    url, _ = server
+    tool = ExchangeRateTool()
+    tool.api_url = f"{url}/latest/"
+    assert tool.convert(10, "USD", "EUR") == 5.0
+    assert asyncio.run(tool.aconvert(10, "USD", "EUR")) == 5.0
+
+    flights = FlightAssistantTool()
+    flights.url = f"{url}/flights/"
+    result = asyncio.run(flights.aoneway_flights_month("FRA", "STR", "2025-05"))
+    assert result["path"] == "/flights/price-calendar-web"
+    assert result["query"]["yearMonth"] == ["2025-05"]
+
+    tools = {t.metadata.name: t for t in flights.to_tool_list()}
+    assert tools["one_way_flight"].async_fn.__name__ == "aone_way_flight"
+
+
+def test_settings_are_read_when_the_client_is_created(monkeypatch):
+    close_clients()
+    monkeypatch.setenv("http_timeout", "7")
+    monkeypatch.setenv("http_connect_timeout", "2")
+    try:
+        timeout = get_client().timeout
+        assert (timeout.read, timeout.connect) == (7, 2)
+    finally:
+        close_clients()
+
+
+if __name__ == '__main__':
+    pytest.main()
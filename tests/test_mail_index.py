@@ -0,0 +1,126 @@
+from typing import Any, Dict
+import numpy as np
+import pytest
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.schema import Document
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStoreQueryResult
+from alfred.tools import mail_index
+from alfred.tools.mail_index import MailIndex, MailSearchToolSpec
+from alfred.utils.common import register_embedding
+
+
+class WordEmbedding(BaseEmbedding):
+    ''' Deterministic bag-of-words embedding counting the embedded texts '''
+    embedded: int = 0
+
+    def _embed(self, text):
+        vector = np.zeros(64)
+        for word in text.lower().split():
+            vector[sum(map(ord, word.strip(".,"))) % 64] += 1.0
+        return vector.tolist()
+
+    def _get_text_embedding(self, text):
+        self.embedded += 1
+        return self._embed(text)
+
+    async def _aget_text_embedding(self, text):
+        return self._get_text_embedding(text)
+
+    def _get_query_embedding(self, query):
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._embed(query)
+
+
+class MemoryVectorStore(BasePydanticVectorStore):
+    ''' In-memory vector store keeping the nodes, like Chroma or Milvus do '''
+    stores_text: bool = True
+    nodes: Dict[str, Any] = {}
+
+    @property
+    def client(self):
+        return None
+
+    def add(self, nodes, **kwargs):
+        for node in nodes:
+            self.nodes[node.node_id] = node
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id, **kwargs):
+        self.nodes = {i: n for i, n in self.nodes.items() if n.ref_doc_id != ref_doc_id}
+
+    def query(self, query, **kwargs):
+        nodes = list(self.nodes.values())
+        vectors = np.array([n.embedding for n in nodes])
+        q = np.array(query.query_embedding)
+        scores = vectors @ q / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(q) + 1e-9)
+        order = np.argsort(-scores)[: query.similarity_top_k]
+        return VectorStoreQueryResult(nodes=[nodes[i] for i in order], similarities=[float(scores[i]) for i in order])
+
+
+def mail(message_id, text):
+    metadata = {"id": message_id, "threadId": f"t-{message_id}", "snippet": text[:20], "internalDate": "1700000000000"}
+    return Document(id_=message_id, text=text, metadata=metadata)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return MailIndex(MemoryVectorStore(), WordEmbedding(), index_dir=str(tmp_path))
+
+
+def test_reingest_skips_unchanged_and_replaces_changed(index):
+    documents = [
+        mail("a", "Your flight to Lisbon departs at noon."),
+        mail("b", "Invoice for the hotel booking in Paris."),
+        mail("c", "Team lunch is moved to Friday."),
+    ]
+    assert index.ingest(documents, batch_size=2) == {"added": 3, "updated": 0, "unchanged": 0, "chunks": 3}
+    embedded = index.embed_model.embedded
+
+    stats = index.ingest([mail("a", "Your flight to Lisbon is delayed by two hours."), documents[1], documents[2]])
+    assert stats == {"added": 0, "updated": 1, "unchanged": 2, "chunks": 1}
+    assert index.embed_model.embedded == embedded + 1
+    assert len(index.vector_store.nodes) == 3
+    assert len(index) == 3
+
+
+def test_search_returns_one_entry_per_message(index):
+    index.ingest([mail("a", "Your flight to Lisbon departs at noon."), mail("b", "Invoice for the hotel booking in Paris.")])
+    tool = MailSearchToolSpec(index)
+
+    matches = tool.search_mail("hotel invoice Paris", k=1)
+    assert [m["id"] for m in matches] == ["b"]
+    assert matches[0]["threadId"] == "t-b"
+    assert matches[0]["date"].startswith("2023-11-14")
+
+    index.remove(["b"])
+    assert [m["id"] for m in tool.search_mail("hotel invoice Paris", k=2)] == ["a"]
+
+
+def test_hashes_are_kept_per_store_and_embedding_model(tmp_path):
+    documents = [mail("a", "Your flight to Lisbon departs at noon."), mail("b", "Team lunch is moved to Friday.")]
+    first = MailIndex(MemoryVectorStore(), WordEmbedding(model_name="words"), index_dir=str(tmp_path))
+    first.ingest(documents)
+
+    other_model = MailIndex(MemoryVectorStore(), WordEmbedding(model_name="other"), index_dir=str(tmp_path))
+    assert other_model.ingest(documents)["added"] == 2
+    assert len(other_model.vector_store.nodes) == 2
+    assert MailIndex(MemoryVectorStore(), WordEmbedding(model_name="words"), index_dir=str(tmp_path)).ingest(documents)["unchanged"] == 2
+
+
+def test_search_tool_index_has_the_dimension_of_the_embedding_model(tmp_path, monkeypatch):
+    register_embedding("wide", lambda: (WordEmbedding(model_name="wide"), 1536))
+    monkeypatch.setenv("embed_provider", "wide")
+    monkeypatch.setenv("mail_index_dir", str(tmp_path))
+    monkeypatch.setenv("embed_cache_path", str(tmp_path / "embeddings.sqlite"))
+    dimensions = []
+    monkeypatch.setattr(mail_index, "mail_vector_store", lambda backend=None, dimension=1024: dimensions.append(dimension) or MemoryVectorStore())
+
+    index = MailSearchToolSpec().index
+    assert dimensions == [1536]
+    assert index.scope.endswith("/wide")
+
+
+if __name__ == '__main__':
+    pytest.main()
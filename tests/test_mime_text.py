@@ -0,0 +1,49 @@
+import base64
+from concurrent.futures import ProcessPoolExecutor
+from email.message import EmailMessage
+import pytest
+from alfred.tools.mime_text import extract_message_texts, extract_text, html_to_text
+from tests.fake_gmail import make_message
+
+HTML = """<html><head><title>Ignored</title><style>p {color: red}</style></head>
+<body><h1>Weekly&nbsp;report</h1><p>Revenue is <b>up</b> &amp; costs are down.</p>
+<script>alert("no")</script><ul><li>First</li><li>Second</li></ul></body></html>"""
+
+
+def test_html_to_text_keeps_blocks_and_drops_scripts():
+    text = html_to_text(HTML)
+    assert text.splitlines() == ["Weekly report", "", "Revenue is up & costs are down.", "", "First", "Second"]
+
+
+def test_plain_part_is_preferred_over_html():
+    mime = EmailMessage()
+    mime.set_content("The plain version")
+    mime.add_alternative(HTML, subtype="html")
+    assert extract_text(mime.as_bytes()).strip() == "The plain version"
+
+
+def test_html_only_message_and_attachments_are_skipped():
+    mime = EmailMessage()
+    mime.add_alternative(HTML, subtype="html")
+    mime.add_attachment("attached notes, not the body", filename="notes.txt")
+    mime.add_attachment(b"%PDF-1.4" * 1000, maintype="application", subtype="pdf", filename="report.pdf")
+    text = extract_text(mime.as_bytes())
+    assert text.startswith("Weekly report")
+    assert "attached notes" not in text
+
+
+def test_declared_charset_is_used():
+    mime = EmailMessage()
+    mime.set_content("Grüße aus Zürich", charset="iso-8859-1", cte="quoted-printable")
+    assert extract_text(mime.as_bytes()).strip() == "Grüße aus Zürich"
+
+
+def test_process_pool_gives_the_same_texts():
+    messages = [make_message(f"m{i}", text=f"Body {i}") for i in range(40)]
+    messages.append({"id": "broken", "raw": base64.urlsafe_b64encode(b"\xff\xfe").decode()})
+    with ProcessPoolExecutor(2) as pool:
+        assert extract_message_texts(messages, pool) == extract_message_texts(messages)
+
+
+if __name__ == '__main__':
+    pytest.main()
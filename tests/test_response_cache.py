@@ -0,0 +1,60 @@
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from alfred.utils.rate_limit import TokenBucket
+from alfred.utils.response_cache import ResponseCache
+
+
+def test_concurrent_identical_calls_are_coalesced():
+    cache = ResponseCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"price": 1}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: cache.get_or_fetch("NVDA", 60, fetch), range(8)))
+
+    assert len(calls) == 1
+    assert all(r == {"price": 1} for r in results)
+
+
+def test_caller_arriving_after_the_leader_finished_is_not_fetching_again(monkeypatch):
+    cache = ResponseCache()
+    cache.set("NVDA", {"price": 1}, 60)
+    # The unlocked check missed: the leader stored its result right after it
+    monkeypatch.setattr(cache, "get", lambda key: None)
+
+    assert cache.get_or_fetch("NVDA", 60, lambda: pytest.fail("fetched again")) == {"price": 1}
+
+
+def test_expired_and_uncacheable_responses_are_fetched_again():
+    cache = ResponseCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"Note": "quota"}
+
+    cache.get_or_fetch("a", 60, fetch, cacheable=lambda data: "Note" not in data)
+    cache.get_or_fetch("a", 60, fetch, cacheable=lambda data: "Note" not in data)
+    cache.get_or_fetch("b", 0.01, lambda: calls.append(1) or {"ok": 1})
+    time.sleep(0.02)
+    cache.get_or_fetch("b", 0.01, lambda: calls.append(1) or {"ok": 1})
+
+    assert len(calls) == 4
+
+
+def test_token_bucket_queues_callers_beyond_the_burst():
+    bucket = TokenBucket(rate_per_minute=600, capacity=2)  # one token every 100ms
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert time.monotonic() - start == pytest.approx(0.2, abs=0.05)
+
+
+if __name__ == '__main__':
+    pytest.main()
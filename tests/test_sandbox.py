@@ -0,0 +1,95 @@
+import os
+import pytest
+from alfred.tools.sandbox import LocalSession, SandboxPool, format_result
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(factory=LocalSession, size=1, max_runs=3)
+    yield pool
+    pool.close()
+
+
+def test_state_is_kept_within_a_session(pool):
+    assert pool.run("a", "import math\nx = 21")["error"] is None
+    result = pool.run("a", "print('twice', x * 2)\nmath.sqrt(x * x)")
+    assert result["stdout"] == "twice 42\n21.0\n"
+    assert "x" in pool.run("b", "x")["error"]
+
+
+def test_errors_keep_the_session_and_timeouts_restart_it(pool):
+    pool.run("a", "y = 1")
+    result = pool.run("a", "import sys\nprint('oops', file=sys.stderr)\n1 / 0")
+    assert result["stderr"] == "oops\n"
+    assert "ZeroDivisionError" in result["error"] and "sandbox_runner" not in result["error"]
+    assert not result["restarted"]
+
+    result = pool.run("a", "while True: pass", timeout=0.5)
+    assert result["timed_out"] and result["restarted"]
+    assert "restarted" in format_result(result)
+    assert "NameError" in pool.run("a", "y")["error"]
+
+
+def test_sandbox_is_replaced_after_max_runs(pool):
+    for i in range(3):
+        result = pool.run("a", f"n = {i}")
+    assert result["restarted"]
+    assert "NameError" in pool.run("a", "n")["error"]
+
+
+def test_settings_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("code_interpreter_max_runs", "2")
+    monkeypatch.setenv("code_interpreter_timeout", "0.5")
+    pool = SandboxPool(factory=LocalSession, size=0)
+    try:
+        assert pool.run("a", "while True: pass")["timed_out"]
+        pool.run("a", "n = 1")
+        assert pool.run("a", "n")["restarted"]
+    finally:
+        pool.close()
+
+
+def test_local_session_is_confined_and_streams_output():
+    session = LocalSession(memory_mb=256)
+    try:
+        chunks = []
+        result = session.execute("import os\nfor i in range(3): print(i)\nos.getcwd()", on_output=lambda s, t: chunks.append(t))
+        workdir = result["stdout"].splitlines()[-1].strip("'")
+        assert os.path.samefile(workdir, session.workdir)
+        assert chunks[:3] == ["0\n", "1\n", "2\n"]
+        assert "MemoryError" in session.execute("b = bytearray(512 * 1024 * 1024)")["error"]
+    finally:
+        session.close()
+    assert not os.path.exists(workdir)
+
+
+def test_local_session_does_not_see_the_secrets(monkeypatch):
+    monkeypatch.setenv("azure_api_key", "secret-key")
+    monkeypatch.setenv("ALPHA_VANTAGE_KEY", "secret-key")
+    session = LocalSession(memory_mb=256)
+    try:
+        result = session.execute("import os\nprint(' '.join(os.environ))\nprint('secret-key' in repr(os.environ))")
+    finally:
+        session.close()
+    names, leaked = result["stdout"].splitlines()
+    # Python may add LC_CTYPE itself when it coerces a C locale
+    assert set(names.split()) - {"LC_CTYPE"} == {"PATH", "HOME", "TMPDIR", "LANG", "artifacts_dir"}
+    assert leaked == "False"
+
+
+def test_local_session_limits_are_set_by_the_runner():
+    session = LocalSession(memory_mb=256, max_file_mb=1, max_files=64)
+    try:
+        result = session.execute(
+            "import resource\n"
+            "[resource.getrlimit(r)[0] for r in (resource.RLIMIT_AS, resource.RLIMIT_FSIZE, resource.RLIMIT_NOFILE)]"
+        )
+        assert "Error" in str(session.execute("open('big', 'wb').write(b'x' * 2 * 1024 * 1024)")["error"])
+    finally:
+        session.close()
+    assert result["stdout"].strip() == str([256 * 1024 * 1024, 1024 * 1024, 64])
+    assert session.process.args[-4:] == [str(256 * 1024 * 1024), str(1024 * 1024), "64", "0"]
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,24 @@
+import pytest
+from alfred.utils.series_analytics import series_to_columns, summarize
+
+
+def test_summary_of_a_small_series():
+    closes = {"2025-01-06": 100, "2025-01-07": 110, "2025-01-08": 88, "2025-01-09": 99}
+    payload = {
+        "Meta Data": {},
+        "Time Series (Daily)": {d: {"4. close": str(c), "5. volume": "10"} for d, c in closes.items()},
+    }
+    dates, columns = series_to_columns(payload)
+    summary = summarize(dates, columns, window=2)
+
+    assert summary["data_points"] == 4
+    assert summary["total_return_pct"] == -1.0
+    assert summary["max_drawdown_pct"] == -20.0
+    assert summary["max_drawdown_from"] == "2025-01-07"
+    assert summary["last_change_pct"] == 12.5
+    assert summary["sma_2"] == 93.5
+    assert summarize(dates, columns, start_date="2025-01-08")["data_points"] == 2
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,92 @@
+import pytest
+from alfred.tools import alphavantage_retreaver
+from alfred.tools.alphavantage_retreaver import AlphaVantageToolSpec
+from alfred.utils.timeseries_store import TimeSeriesStore
+
+
+def daily(dates):
+    return {
+        "Meta Data": {"2. Symbol": "NVDA"},
+        "Time Series (Daily)": {d: {"4. close": str(i)} for i, d in enumerate(dates)},
+    }
+
+
+@pytest.fixture
+def tool(tmp_path):
+    alphavantage_retreaver.RESPONSE_CACHE.clear()
+    tool = AlphaVantageToolSpec()
+    tool._timeseries = TimeSeriesStore(str(tmp_path / "timeseries.sqlite"))
+    return tool
+
+
+def test_only_the_compact_delta_is_fetched_once_stored(tool, monkeypatch):
+    requests = []
+    responses = iter([daily(["2025-01-02", "2025-01-03"]), daily(["2025-01-03", "2025-01-06"])])
+
+    def request(function, parameters):
+        requests.append(parameters["outputsize"])
+        return next(responses)
+
+    monkeypatch.setattr(tool, "_request", request)
+    tool.execute_function("TIME_SERIES_DAILY", {"symbol": "nvda", "outputsize": "full"})
+    alphavantage_retreaver.RESPONSE_CACHE.clear()
+    result = tool.execute_function("TIME_SERIES_DAILY", {"symbol": "NVDA", "outputsize": "full"})
+
+    assert requests == ["full", "compact"]
+    assert list(result["Time Series (Daily)"]) == ["2025-01-06", "2025-01-03", "2025-01-02"]
+
+
+def test_stored_bars_are_served_when_the_refresh_fails(tool, monkeypatch):
+    responses = iter([daily(["2025-01-02"]), {"Note": "quota"}])
+    monkeypatch.setattr(tool, "_request", lambda function, parameters: next(responses))
+
+    tool.execute_function("TIME_SERIES_DAILY", {"symbol": "NVDA"})
+    alphavantage_retreaver.RESPONSE_CACHE.clear()
+    result = tool.execute_function("TIME_SERIES_DAILY", {"symbol": "NVDA"})
+
+    assert list(result["Time Series (Daily)"]) == ["2025-01-02"]
+
+
+def adjusted(closes, split=None):
+    bars = {}
+    for date, close in closes.items():
+        bars[date] = {"4. close": "100", "5. adjusted close": str(close), "7. dividend amount": "0.0000",
+                      "8. split coefficient": "2.0" if date == split else "1.0"}
+    return {"Meta Data": {"2. Symbol": "NVDA"}, "Time Series (Daily)": bars}
+
+
+def test_adjusted_history_is_replaced_after_a_split(tool, monkeypatch):
+    requests = []
+    responses = iter([
+        adjusted({"2025-01-02": 100, "2025-01-03": 102}),
+        # The split of 2025-01-06 halves every adjusted close before it
+        adjusted({"2025-01-03": 51, "2025-01-06": 52}, split="2025-01-06"),
+        adjusted({"2025-01-02": 50, "2025-01-03": 51, "2025-01-06": 52}, split="2025-01-06"),
+    ])
+
+    def request(function, parameters):
+        requests.append(parameters["outputsize"])
+        return next(responses)
+
+    monkeypatch.setattr(tool, "_request", request)
+    tool.execute_function("TIME_SERIES_DAILY_ADJUSTED", {"symbol": "NVDA", "outputsize": "full"})
+    alphavantage_retreaver.RESPONSE_CACHE.clear()
+    result = tool.execute_function("TIME_SERIES_DAILY_ADJUSTED", {"symbol": "NVDA", "outputsize": "full"})
+
+    assert requests == ["full", "compact", "full"]
+    closes = {date: bar["5. adjusted close"] for date, bar in result["Time Series (Daily)"].items()}
+    assert closes == {"2025-01-06": "52", "2025-01-03": "51", "2025-01-02": "50"}
+
+
+def test_revised_past_bars_are_detected(tmp_path):
+    store = TimeSeriesStore(str(tmp_path / "timeseries.sqlite"))
+    store.upsert("TIME_SERIES_DAILY_ADJUSTED", "NVDA", adjusted({"2025-01-02": 100, "2025-01-03": 102}), full=True)
+
+    # The latest stored bar is revised until the session closes
+    assert not store.is_revised("TIME_SERIES_DAILY_ADJUSTED", "NVDA", adjusted({"2025-01-02": 100, "2025-01-03": 103, "2025-01-06": 104}))
+    assert store.is_revised("TIME_SERIES_DAILY_ADJUSTED", "NVDA", adjusted({"2025-01-02": 99, "2025-01-06": 104}))
+    assert store.is_revised("TIME_SERIES_DAILY_ADJUSTED", "NVDA", adjusted({"2025-01-06": 104}, split="2025-01-06"))
+
+
+if __name__ == '__main__':
+    pytest.main()